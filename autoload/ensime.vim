@@ -87,6 +87,10 @@ function! ensime#fun_en_package_decl() abort
     return s:call_plugin('fun_en_package_decl', [[], []])
 endfunction
 
+function! ensime#fun_en_package_toggle() abort
+    return s:call_plugin('fun_en_package_toggle', [[], []])
+endfunction
+
 function! ensime#com_en_symbol_by_name(args, range) abort
     return s:call_plugin('com_en_symbol_by_name', [a:args, a:range])
 endfunction
@@ -155,6 +159,18 @@ function! ensime#com_en_clients(args, range) abort
     return s:call_plugin('com_en_clients', [a:args, a:range])
 endfunction
 
+function! ensime#com_en_stats(args, range) abort
+    return s:call_plugin('com_en_stats', [a:args, a:range])
+endfunction
+
+function! ensime#com_en_rpc_profile(args, range) abort
+    return s:call_plugin('com_en_rpc_profile', [a:args, a:range])
+endfunction
+
+function! ensime#com_en_mem_profile(args, range) abort
+    return s:call_plugin('com_en_mem_profile', [a:args, a:range])
+endfunction
+
 function! ensime#au_cursor_hold(filename) abort
     return s:call_plugin('au_cursor_hold', [a:filename])
 endfunction
@@ -1,6 +1,5 @@
 # coding: utf-8
 
-import inspect
 import os
 import sys
 
@@ -8,7 +7,8 @@ import vim
 
 
 def ensime_init_path():
-    path = os.path.abspath(inspect.getfile(inspect.currentframe()))
+    # Not inspect.getfile(), importing inspect takes longer than the rest
+    path = os.path.abspath(sys._getframe().f_code.co_filename)
     expected_nvim_path_end = os.path.join('rplugin', 'python3', 'ensime.py')
     expected_vim_path_end = os.path.join('autoload', 'ensime.vim.py')
     if path.endswith(expected_nvim_path_end):  # nvim rplugin
@@ -0,0 +1,57 @@
+import os
+import sys
+
+import pytest
+from mock import Mock
+
+# See test/conftest.py, we're not an installable package.
+parent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, parent)
+
+from benchmarks import dotensime  # noqa: E402
+from benchmarks.fakeserver import FakeEnsimeServer  # noqa: E402
+from benchmarks.fakevim import FakeVim  # noqa: E402
+from ensime_shared.client import EnsimeClientV2  # noqa: E402
+from ensime_shared.editor import Editor  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def large_dotensime(tmpdir_factory):
+    """Path of a synthetic ``.ensime`` for a 200-module project."""
+    root = tmpdir_factory.mktemp('large-project')
+    return dotensime.write(root.strpath, modules=200)
+
+
+@pytest.fixture
+def fake_server(request):
+    """A :class:`FakeEnsimeServer` speaking protocol v2."""
+    server = FakeEnsimeServer('v2')
+    request.addfinalizer(server.close)
+    return server
+
+
+@pytest.fixture
+def source_lines():
+    """A Scala source file of 500 lines."""
+    lines = ['package com.example.bench', '']
+    for n in range(166):
+        lines += ['  def method{}(x: Int): Int ='.format(n),
+                  '    x + {}  // foo.bar'.format(n), '']
+    return lines
+
+
+@pytest.fixture
+def client(request, tmpdir, fake_server, source_lines):
+    """An :class:`EnsimeClientV2` with a real editor on a fake Vim, connected
+    to ``fake_server``."""
+    vim = FakeVim(source_lines, tmpdir.join('Bench.scala').strpath)
+    launcher = Mock(name='launcher')
+    launcher.config = {
+        'root-dir': tmpdir.strpath,
+        'cache-dir': tmpdir.join('.ensime_cache').strpath,
+        'name': 'bench',
+    }
+    client = EnsimeClientV2(Editor(vim), launcher)
+    fake_server.connect(client)
+    request.addfinalizer(client.teardown)
+    return client
@@ -0,0 +1,74 @@
+# coding: utf-8
+
+"""
+Generator of synthetic ``.ensime`` configs, shaped like those written by
+sbt-ensime for large multi-module builds.
+"""
+
+import os
+
+
+def sexp(value):
+    """Render a Python value as an S-expression."""
+    if isinstance(value, dict):
+        return '(' + ' '.join(':{} {}'.format(k, sexp(v)) for k, v in value.items()) + ')'
+    elif isinstance(value, (list, tuple)):
+        return '(' + ' '.join(sexp(v) for v in value) + ')'
+    elif value is True:
+        return 't'
+    elif value is None:
+        return 'nil'
+    elif isinstance(value, int):
+        return str(value)
+    return '"{}"'.format(value.replace('\\', '\\\\').replace('"', '\\"'))
+
+
+def config(root, modules=200, jars_per_module=40):
+    """Build a config dict for a project in ``root`` with ``modules`` modules."""
+    ivy = os.path.join(root, 'ivy2', 'cache')
+
+    def jars(kind, n, count):
+        return [os.path.join(ivy, 'org.example{}'.format(j), 'lib{}'.format(j), kind,
+                             'lib{}_2.11-1.{}.{}.jar'.format(j, n % 10, j))
+                for j in range(count)]
+
+    subprojects = []
+    for n in range(modules):
+        name = 'module{}'.format(n)
+        base = os.path.join(root, name)
+        subprojects.append({
+            'name': name,
+            'source-roots': [os.path.join(base, 'src', 'main', 'scala'),
+                             os.path.join(base, 'src', 'main', 'java')],
+            'depends-on-modules': ['module{}'.format(d) for d in range(max(0, n - 3), n)],
+            'target': os.path.join(base, 'target', 'scala-2.11', 'classes'),
+            'test-target': os.path.join(base, 'target', 'scala-2.11', 'test-classes'),
+            'compile-deps': jars('jars', n, jars_per_module),
+            'test-deps': jars('jars', n, jars_per_module // 4),
+            'reference-source-roots': jars('srcs', n, jars_per_module),
+            'scalac-options': ['-feature', '-deprecation', '-Xlint', '-Ywarn-unused-import'],
+        })
+
+    return {
+        'root-dir': root,
+        'cache-dir': os.path.join(root, '.ensime_cache'),
+        'scala-compiler-jars': jars('compiler', 0, 4),
+        'ensime-server-jars': jars('server', 0, 60),
+        'name': 'synthetic',
+        'java-home': '/usr/lib/jvm/java-8-openjdk',
+        'java-flags': ['-Xss2m', '-Xms512m', '-Xmx4g'],
+        'java-sources': [],
+        'java-compiler-args': [],
+        'reference-source-roots': [],
+        'scala-version': '2.11.8',
+        'compiler-args': ['-feature', '-deprecation'],
+        'subprojects': subprojects,
+    }
+
+
+def write(root, **kwargs):
+    """Write a synthetic ``.ensime`` in directory ``root``, returning its path."""
+    path = os.path.join(root, '.ensime')
+    with open(path, 'w') as f:
+        f.write(sexp(config(root, **kwargs)))
+    return path
@@ -0,0 +1,120 @@
+# coding: utf-8
+
+"""
+A stand-in ENSIME server, scripted with the replies to each type of request.
+
+It speaks the Jerky envelope of both protocol versions: requests come as
+``{"callId": ..., "req": {"typehint": ...}}`` and replies go back as
+``{"callId": ..., "payload": {"typehint": ...}}``, events without a
+``callId``::
+
+    with FakeEnsimeServer() as server:
+        server.respond('SymbolAtPointReq', {'typehint': 'FalseResponse'})
+        server.respond('TypecheckFilesReq', lambda req: Reply(
+            {'typehint': 'VoidResponse'},
+            events=[{'typehint': 'FullTypeCheckCompleteEvent'}]))
+        server.connect(client)
+
+Requests without a script get a ``VoidResponse``.
+"""
+
+import json
+import threading
+from collections import Counter, namedtuple
+
+import websocket
+
+from benchmarks.wsserver import WebSocketServer
+
+PATHS = {'v1': 'jerky', 'v2': 'websocket'}
+SUBPROTOCOLS = {'v1': None, 'v2': ['jerky']}
+
+VOID = {'typehint': 'VoidResponse'}
+
+
+class Reply(namedtuple('Reply', ['payload', 'events'])):
+    """A reply payload, followed by event payloads sent after it."""
+
+    def __new__(cls, payload, events=()):
+        return super(Reply, cls).__new__(cls, payload, events)
+
+
+class FakeEnsimeServer(object):
+    """Serves scripted replies on a local port.
+
+    Args:
+        protocol (str): Version of the protocol, ``v1`` or ``v2``.
+
+    Attributes:
+        requests (Counter): Count of requests received per type.
+    """
+
+    def __init__(self, protocol='v2'):
+        self.protocol = protocol
+        self.requests = Counter()
+        self._scripts = {}
+        self._connections = []
+        self._lock = threading.Lock()
+        self._server = WebSocketServer(self._serve, subprotocol='jerky')
+
+    def respond(self, typehint, response):
+        """Script the response to a type of request.
+
+        Args:
+            typehint (str): Type of the request.
+            response: A reply payload, a :class:`Reply`, ``None`` for no reply,
+                or a function of the request returning one of those.
+        """
+        self._scripts[typehint] = response
+
+    def emit(self, payload):
+        """Send an event to all clients."""
+        message = json.dumps({'payload': payload})
+        with self._lock:
+            connections = list(self._connections)
+        for connection in connections:
+            connection.send(message)
+
+    def connect(self, client):
+        """Connect a client, as its connector thread does with a real server."""
+        client.ws = websocket.create_connection(
+            self._server.url(PATHS[self.protocol]),
+            subprotocols=SUBPROTOCOLS[self.protocol], enable_multithread=True)
+        client._connected.set()
+
+    def _serve(self, connection):
+        with self._lock:
+            self._connections.append(connection)
+        try:
+            for message in iter(connection.recv, None):
+                self._handle(connection, json.loads(message))
+        finally:
+            with self._lock:
+                self._connections.remove(connection)
+
+    def _handle(self, connection, message):
+        request = message['req']
+        typehint = request['typehint']
+        self.requests[typehint] += 1
+
+        response = self._scripts.get(typehint, VOID)
+        if callable(response):
+            response = response(request)
+        if response is None:
+            return
+        if not isinstance(response, Reply):
+            response = Reply(response)
+
+        connection.send(json.dumps({'callId': message['callId'],
+                                    'payload': response.payload}))
+        for event in response.events:
+            connection.send(json.dumps({'payload': event}))
+
+    def close(self):
+        self._server.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
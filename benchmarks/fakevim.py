@@ -0,0 +1,86 @@
+# coding: utf-8
+
+"""
+A stand-in for the ``vim`` module, with just enough behavior for
+:class:`ensime_shared.editor.Editor` to run without an editor.
+
+Unlike a mock it's cheap to call, so it doesn't drown the cost of the code
+being measured. Commands are counted but not run, except that splitting opens
+a new buffer, and expressions evaluate to ``'0'`` unless given a result in
+:attr:`FakeVim.results`.
+"""
+
+import re
+
+SPLIT = re.compile(r'\d*v?(?:split|new)\b ?(.*)')
+
+
+class Buffer(list):
+    """A buffer: a list of lines with a name and variables."""
+
+    def __init__(self, lines=(), name='', number=1):
+        super(Buffer, self).__init__(lines)
+        self.name = name
+        self.number = number
+        self.vars = {}
+        self.options = {'modifiable': True}
+
+    def append(self, text, afterline=None):
+        lines = [text] if isinstance(text, str) else list(text)
+        index = len(self) if afterline is None else afterline
+        self[index:index] = lines
+
+    def mark(self, name):
+        return (1, 0)
+
+
+class Window(object):
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.cursor = (1, 0)
+        self.width = 120
+
+
+class Current(object):
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.window = Window(buffer)
+
+    @property
+    def line(self):
+        return self.buffer[self.window.cursor[0] - 1]
+
+
+class FakeVim(object):
+    """The ``vim`` module of a Vim editing one buffer.
+
+    Args:
+        lines (Sequence[str]): Content of the buffer.
+        name (str): Path of the buffer.
+
+    Attributes:
+        commands (int): Count of Ex commands run.
+        results (dict): Results of expressions, by expression.
+    """
+
+    def __init__(self, lines=(), name=''):
+        buffer = Buffer(lines, name)
+        self.current = Current(buffer)
+        self.buffers = {buffer.number: buffer}
+        self.vars = {}
+        self.results = {}
+        self.commands = 0
+
+    def command(self, cmd):
+        self.commands += 1
+        split = SPLIT.match(cmd)
+        if split:
+            buffer = Buffer(name=split.group(1), number=len(self.buffers) + 1)
+            self.buffers[buffer.number] = buffer
+            self.current = Current(buffer)
+
+    def eval(self, expr):
+        return self.results.get(expr, '0')
+
+    def async_call(self, func, *args):
+        func(*args)
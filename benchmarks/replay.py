@@ -0,0 +1,250 @@
+# coding: utf-8
+
+"""
+Replay of a traffic recording, as made with ``g:ensime_record_traffic``.
+
+A local websocket server plays the server's part: it sends the recorded frames
+on their original schedule, except that a reply is never sent before the
+request it answers. A real client with a stub editor plays the plugin's part:
+it sends the recorded requests on schedule and handles messages on ticks as
+the plugin does. Then its latency per request type is printed, as by
+``:EnStats``.
+
+Usage::
+
+    python -m benchmarks.replay [--speed N] [--profile] RECORDING
+
+``--speed 10`` plays back ten times faster, ``--speed 0`` as fast as possible.
+``--profile`` runs the client under cProfile and prints its hottest functions.
+"""
+
+import argparse
+import cProfile
+import json
+import os
+import pstats
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+
+import websocket
+from mock import Mock
+
+# Runnable as a script as well as a module
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.wsserver import WebSocketServer  # noqa: E402
+from ensime_shared.client import EnsimeClientV1, EnsimeClientV2  # noqa: E402
+from ensime_shared.recorder import clock, INCOMING, OUTGOING, read_recording  # noqa: E402
+
+CLIENTS = {
+    'v1': (EnsimeClientV1, 'jerky', None),
+    'v2': (EnsimeClientV2, 'websocket', ['jerky']),
+}
+"""Client class, server path and subprotocols per protocol version."""
+
+
+def call_id_of(data):
+    try:
+        return json.loads(data).get('callId')
+    except (ValueError, AttributeError):
+        return None
+
+
+def sleep_until(moment):
+    remaining = moment - clock()
+    if remaining > 0:
+        time.sleep(remaining)
+
+
+class RecordedServer(object):
+    """Connection handler sending recorded frames.
+
+    Args:
+        frames (List[dict]): Incoming messages of a recording.
+        scale (float): Factor applied to recorded times, 0 to not wait.
+        reply_timeout (float): Seconds to wait for the request a reply answers,
+            after which it's sent anyway.
+
+    Attributes:
+        done (threading.Event): Set once all frames are sent.
+    """
+
+    def __init__(self, frames, scale, reply_timeout=10):
+        self.frames = frames
+        self.scale = scale
+        self.reply_timeout = reply_timeout
+        self.done = threading.Event()
+
+    def __call__(self, connection):
+        requested = set()
+        arrived = threading.Condition()
+
+        def receive():
+            for message in iter(connection.recv, None):
+                with arrived:
+                    requested.add(call_id_of(message))
+                    arrived.notify_all()
+            with arrived:
+                arrived.notify_all()
+
+        receiver = threading.Thread(name='replay-receiver', target=receive)
+        receiver.daemon = True
+        receiver.start()
+
+        start = clock()
+        for frame in self.frames:
+            sleep_until(start + frame['t'] * self.scale)
+            call_id = call_id_of(frame['data'])
+            if call_id is not None:
+                deadline = clock() + self.reply_timeout
+                with arrived:
+                    while (call_id not in requested and not connection.closed and
+                           clock() < deadline):
+                        arrived.wait(deadline - clock())
+            if connection.closed:
+                break
+            connection.send(frame['data'])
+        self.done.set()
+        receiver.join()
+
+
+class Replay(object):
+    """Plays back a recording against a client.
+
+    Args:
+        path (str): Path of the recording.
+        speed (float): Playback speed, 0 for as fast as possible.
+        tick_interval (float): Seconds between client ticks, as the plugin's
+            ticker.
+        drain_timeout (float): Seconds to wait for frames the server has sent
+            to arrive, after which the replay ends without them.
+    """
+
+    def __init__(self, path, speed=1.0, tick_interval=0.01, drain_timeout=10):
+        self.header, messages = read_recording(path)
+        self.outgoing = [m for m in messages if m['dir'] == OUTGOING]
+        self.incoming = [m for m in messages if m['dir'] == INCOMING]
+        self.replied = set(call_id_of(m['data']) for m in self.incoming)
+        self.scale = 1.0 / speed if speed else 0
+        self.tick_interval = tick_interval
+        self.drain_timeout = drain_timeout
+
+    def run(self, profile=None):
+        """Play back the recording.
+
+        Args:
+            profile (Optional[cProfile.Profile]): Profiler enabled while the
+                client sends and ticks.
+
+        Returns:
+            (EnsimeClient, float): The client, torn down, and the seconds the
+            replay took.
+        """
+        client_class, path, subprotocols = CLIENTS[self.header['protocol']]
+        server = RecordedServer(self.incoming, self.scale)
+        root = tempfile.mkdtemp(prefix='ensime-replay')
+        try:
+            with WebSocketServer(server) as wsserver:
+                client = self._client(client_class, root)
+                client.ws = websocket.create_connection(
+                    wsserver.url(path), subprotocols=subprotocols,
+                    enable_multithread=True)
+                client._connected.set()
+                if profile:
+                    profile.enable()
+                try:
+                    elapsed = self._play(client, server)
+                finally:
+                    if profile:
+                        profile.disable()
+                client.teardown()
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+        return client, elapsed
+
+    @staticmethod
+    def _client(client_class, root):
+        editor = Mock(name='editor')
+        editor.path.return_value = os.path.join(root, 'Replay.scala')
+        launcher = Mock(name='launcher')
+        launcher.config = {
+            'root-dir': root,
+            'cache-dir': os.path.join(root, '.ensime_cache'),
+            'name': 'replay',
+        }
+        return client_class(editor, launcher)
+
+    def _play(self, client, server):
+        pending = deque(self.outgoing)
+        filename = client.editor.path()
+        # Frames queued by the poller as received; on_activity won't do, as
+        # sending requests notifies it too
+        received = []
+        put = client.queue.put
+
+        def put_received(item, *args, **kwargs):
+            put(item, *args, **kwargs)
+            received.append(None)
+        client.queue.put = put_received
+        drain_deadline = None
+
+        start = clock()
+        while pending or len(received) < len(self.incoming) or client.is_busy():
+            now = clock()
+            while pending and start + pending[0]['t'] * self.scale <= now:
+                self._send(client, pending.popleft()['data'])
+            if server.done.is_set() and len(received) < len(self.incoming):
+                # Sent frames may still be on their way, unless the connection
+                # broke and they never will be
+                if drain_deadline is None:
+                    drain_deadline = now + self.drain_timeout
+                elif now > drain_deadline:
+                    break
+            client.tick(filename)
+            time.sleep(self.tick_interval)
+        return clock() - start
+
+    def _send(self, client, data):
+        # Sent as a request, with its original call ID, to be timed as one
+        try:
+            message = json.loads(data)
+            call_id, request = message['callId'], message['req']
+        except (ValueError, KeyError, TypeError):
+            client.send(data)
+            return
+        client.call_id = call_id
+        client.send_request(request)
+        if call_id not in self.replied:
+            # Recorded without a reply, so none will come
+            client.pending_calls.pop(call_id, None)
+            client.request_stats.forget(call_id)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay an ensime-vim traffic recording.')
+    parser.add_argument('recording', help='path of the recording')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='playback speed, 0 for as fast as possible (default: 1)')
+    parser.add_argument('--profile', action='store_true',
+                        help='profile the client and print its hottest functions')
+    args = parser.parse_args(argv)
+
+    replay = Replay(args.recording, speed=args.speed)
+    profile = cProfile.Profile() if args.profile else None
+    client, elapsed = replay.run(profile)
+
+    print('Replayed {} requests and {} frames in {:.2f}s\n'.format(
+        len(replay.outgoing), len(replay.incoming), elapsed))
+    for line in client.request_stats.report():
+        print(line)
+    if profile:
+        print('')
+        pstats.Stats(profile).sort_stats('cumulative').print_stats(30)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# coding: utf-8
+
+import os
+
+import sexpdata
+
+from ensime_shared.config import PARSE_SKIP_KEYS, PARSED_CACHE_FILE, ProjectConfig
+from ensime_shared.util import Util
+
+
+def parse_with_sexpdata(path):
+    """The original two-pass parse: sexpdata tree, then conversion to dicts.
+
+    Kept as the reference for parity and speed of ``ProjectConfig.parse``.
+    """
+    def paired(iterable):
+        cursor = iter(iterable)
+        return zip(cursor, cursor)
+
+    def unwrap_if_sexp_symbol(datum):
+        return datum.value() if isinstance(datum, sexpdata.Symbol) else datum
+
+    def sexp2dict(sexps):
+        newdict = {}
+        for key, value in paired(sexps):
+            key = str(unwrap_if_sexp_symbol(key)).lstrip(':')
+            if isinstance(value, list) and value:
+                if isinstance(value[0], list):
+                    newdict[key] = [sexp2dict(val) for val in value]
+                elif isinstance(value[0], sexpdata.Symbol):
+                    newdict[key] = sexp2dict(value)
+                else:
+                    newdict[key] = value
+            else:
+                newdict[key] = value
+        return newdict
+
+    return sexp2dict(sexpdata.loads(Util.read_file(path)))
+
+
+def without_keys(config, keys):
+    if isinstance(config, dict):
+        return dict((k, without_keys(v, keys)) for k, v in config.items() if k not in keys)
+    elif isinstance(config, list):
+        return [without_keys(v, keys) for v in config]
+    return config
+
+
+def test_parse_large_config_with_sexpdata(benchmark, large_dotensime):
+    config = benchmark(parse_with_sexpdata, large_dotensime)
+    assert len(config['subprojects']) == 200
+
+
+def test_parse_large_config(benchmark, large_dotensime):
+    config = benchmark(ProjectConfig.parse, large_dotensime)
+    assert config == parse_with_sexpdata(large_dotensime)
+
+
+def test_parse_large_config_skipping_unused(benchmark, large_dotensime):
+    config = benchmark(ProjectConfig.parse, large_dotensime, skip_keys=PARSE_SKIP_KEYS)
+    assert config == without_keys(parse_with_sexpdata(large_dotensime), PARSE_SKIP_KEYS)
+
+
+def test_load_large_config_cached(benchmark, large_dotensime):
+    ProjectConfig.load(large_dotensime)  # Populate the cache
+    parsed = ProjectConfig.parse(large_dotensime, skip_keys=PARSE_SKIP_KEYS)
+    cache_file = os.path.join(parsed['cache-dir'], PARSED_CACHE_FILE)
+    assert os.path.isfile(cache_file)
+
+    config = benchmark(ProjectConfig.load, large_dotensime)
+    assert config == parsed
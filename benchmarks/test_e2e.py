@@ -0,0 +1,165 @@
+# coding: utf-8
+
+"""
+End-to-end scenarios: a client with a real editor on a fake Vim, talking to a
+fake server over a local websocket.
+
+Each round is one user action, timed from the request to its reply being
+handled, so the mean is the latency and OPS the throughput of the action.
+"""
+
+import time
+
+import pytest
+
+from benchmarks.fakeserver import Reply, VOID
+
+USAGES = 10000
+NOTE_EVENTS = 50
+NOTES_PER_EVENT = 20
+
+
+def completions(count):
+    return {
+        'typehint': 'CompletionInfoList',
+        'prefix': 'me',
+        'completions': [{
+            'name': 'method{}'.format(n),
+            'typeInfo': {
+                'typehint': 'ArrowTypeInfo',
+                'name': '(x: Int)Int',
+                'resultType': {'typehint': 'BasicTypeInfo', 'name': 'Int'},
+                'paramSections': [{'isImplicit': False,
+                                   'params': [['x', {'name': 'Int'}]]}],
+            },
+            'relevance': 90,
+            'isInfix': False,
+        } for n in range(count)],
+    }
+
+
+def source_positions(path, count):
+    return {
+        'typehint': 'SourcePositions',
+        'positions': [{
+            'position': {'typehint': 'LineSourcePosition', 'file': path,
+                         'line': n % 500 + 1},
+            'preview': '    x + {}  // foo.bar'.format(n),
+        } for n in range(count)],
+    }
+
+
+def notes(path, count):
+    return {
+        'typehint': 'NewScalaNotesEvent',
+        'isFull': False,
+        'notes': [{
+            'file': path, 'msg': 'type mismatch; found: String required: Int',
+            'line': n % 500 + 1, 'col': 5, 'beg': n * 10, 'end': n * 10 + 6,
+            'severity': {'typehint': 'NoteError'},
+        } for n in range(count)],
+    }
+
+
+def symbols(path, count):
+    return {
+        'typehint': 'SymbolSearchResults',
+        'syms': [{
+            'typehint': 'TypeSearchResult',
+            'name': 'com.example.bench.Foo{}'.format(n),
+            'localName': 'Foo{}'.format(n),
+            'declAs': {'typehint': 'Class'},
+            'pos': {'typehint': 'LineSourcePosition', 'file': path, 'line': n + 1},
+        } for n in range(count)],
+    }
+
+
+def package(name, classes, members):
+    def type_info(type_name, children=()):
+        return {'typehint': 'BasicTypeInfo', 'name': type_name,
+                'fullName': '{}.{}'.format(name, type_name),
+                'declAs': {'typehint': 'Class'}, 'members': list(children)}
+
+    return {
+        'typehint': 'PackageInfo', 'name': name.rsplit('.', 1)[-1], 'fullName': name,
+        'members': [type_info('Class{}'.format(c),
+                              (type_info('Member{}'.format(m)) for m in range(members)))
+                    for c in range(classes)],
+    }
+
+
+def wait_until(condition, client, timeout=10):
+    """Tick the client as the plugin does until ``condition()`` holds."""
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, 'timed out'
+        client.unqueue(budget=client.tick_budget)
+        time.sleep(0.0005)
+
+
+def test_completion(benchmark, client, fake_server):
+    fake_server.respond('CompletionsReq', completions(100))
+    client.editor._vim.current.window.cursor = (3, 12)
+
+    def complete():
+        client.complete_func(1, '')
+        return client.complete_func(0, '')
+
+    suggestions = benchmark(complete)
+    assert len(suggestions) == 100
+
+
+def test_usages(benchmark, client, fake_server):
+    path = client.editor.path()
+    fake_server.respond('UsesOfSymbolAtPointReq', source_positions(path, USAGES))
+    benchmark.extra_info['positions'] = USAGES
+
+    def find_usages():
+        client.usages()
+        client.unqueue(should_wait=True)
+
+    benchmark(find_usages)
+    assert not client.pending_calls
+
+
+def test_typecheck_burst(benchmark, client, fake_server):
+    path = client.editor.path()
+    burst = [notes(path, NOTES_PER_EVENT)] * NOTE_EVENTS
+    fake_server.respond('TypecheckFilesReq', Reply(
+        VOID, events=burst + [{'typehint': 'FullTypeCheckCompleteEvent'}]))
+    benchmark.extra_info['events'] = NOTE_EVENTS + 1
+
+    def typecheck():
+        client.type_check_cmd([])
+        wait_until(lambda: not client.currently_buffering_typechecks, client)
+
+    benchmark(typecheck)
+    assert len(client.editor._errors) == NOTE_EVENTS * NOTES_PER_EVENT
+
+
+def test_symbol_search(benchmark, client, fake_server):
+    fake_server.respond('PublicSymbolSearchReq', symbols(client.editor.path(), 25))
+
+    def search():
+        client.symbol_search(['Foo'])
+        client.unqueue(should_wait=True)
+
+    benchmark(search)
+    assert fake_server.requests['PublicSymbolSearchReq'] >= 1
+
+
+@pytest.mark.parametrize('classes', [50, 500])
+def test_package_inspection(benchmark, client, fake_server, classes):
+    fake_server.respond('InspectPackageByPathReq',
+                        package('com.example.bench', classes, members=20))
+    vim = client.editor._vim
+    source = vim.current
+
+    def inspect():
+        vim.current = source
+        client.inspect_package(['com.example.bench'])
+        client.unqueue(should_wait=True)
+        return vim.current.buffer
+
+    inspector = benchmark(inspect)
+    assert len(inspector) == 1 + classes * 21
@@ -0,0 +1,88 @@
+# coding: utf-8
+
+"""
+Pure functions run on every keystroke or tick, with inputs from large projects.
+
+Parsing of ``.ensime`` configs is covered by ``test_config.py``.
+"""
+
+import pytest
+
+from benchmarks.fakevim import FakeVim
+from benchmarks.test_e2e import completions, package
+from ensime_shared.editor import Editor
+from ensime_shared.errors import Error
+from ensime_shared.inspector import PackageTree
+from ensime_shared.symbol_format import completion_to_suggest
+from ensime_shared.util import Util
+
+BUFFER_LINES = 20000
+ERRORS = 1000
+
+
+@pytest.fixture(scope='module')
+def large_source():
+    """Lines of a 20k line Scala file, with a nested package clause."""
+    lines = ['package com.example', 'package bench', '', 'import scala.util.Try', '']
+    while len(lines) < BUFFER_LINES:
+        n = len(lines)
+        lines += ['  def method{}(x: Int): Int ='.format(n), '    x + {}'.format(n), '']
+    return lines
+
+
+@pytest.fixture(scope='module')
+def inspector_lines():
+    """Lines of the package inspector for a package of 500 classes, as
+    written by ``handle_package_info``."""
+    lines = ['com.example.bench']
+    for c in range(500):
+        lines.append('  - Class: Class{}'.format(c))
+        lines.extend('    Class: Member{}'.format(m) for m in range(20))
+    return lines
+
+
+def test_completion_to_suggest(benchmark):
+    payload = completions(1000)['completions']
+    suggestions = benchmark(lambda: [completion_to_suggest(c) for c in payload])
+    assert suggestions[-1]['abbr'] == 'method999(x: Int)'
+
+
+def test_get_position(benchmark, client, large_source):
+    client.editor._vim.current.buffer[:] = large_source
+    row = BUFFER_LINES - 10
+    position = benchmark(client.get_position, row, 4)
+    assert position == sum(len(line) + 1 for line in large_source[:row - 1]) + 4
+
+
+def test_extract_package_name(benchmark, large_source):
+    assert benchmark(Util.extract_package_name, large_source) == 'com.example.bench'
+
+
+def test_error_at_cursor(benchmark, tmpdir):
+    path = tmpdir.join('Bench.scala').strpath
+    vim = FakeVim(name=path)
+    vim.results["expand('%:p')"] = path
+    editor = Editor(vim)
+    editor._errors = [Error(path, 'type mismatch', lnum, 4, 10)
+                      for lnum in range(1, ERRORS + 1)]
+
+    error = benchmark(editor.get_error_at, (ERRORS, 5))
+    assert error is editor._errors[-1]
+
+
+def test_truncated_message(benchmark):
+    error = Error('Bench.scala', 'type mismatch; found: String required: Int ' * 20, 1, 4, 200)
+    message = benchmark(error.get_truncated_message, (1, 150), 119)
+    assert len(message) == 118
+
+
+def test_symbol_for_inspector_line(benchmark, inspector_lines):
+    editor = Editor(FakeVim(inspector_lines))
+    symbol = benchmark(editor.symbol_for_inspector_line, len(inspector_lines))
+    assert symbol == 'com.example.bench.Class499.Member19'
+
+
+def test_package_tree_lines(benchmark):
+    payload = package('com.example.bench', 500, members=20)
+    lines = benchmark(lambda: PackageTree(payload).lines())
+    assert len(lines) == 1 + 500 * 21
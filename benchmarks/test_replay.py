@@ -0,0 +1,41 @@
+# coding: utf-8
+
+"""
+Replay of a synthetic recording: a burst of typecheck notes while completing.
+"""
+
+import json
+
+import pytest
+
+from benchmarks.replay import Replay
+from ensime_shared.recorder import TrafficRecorder
+
+COMPLETIONS = 50
+NOTE_EVENTS = 200
+
+
+@pytest.fixture(scope='module')
+def recording(tmpdir_factory):
+    path = tmpdir_factory.mktemp('recording').join('traffic.jsonl').strpath
+    recorder = TrafficRecorder(path, 'v2')
+    for call_id in range(COMPLETIONS):
+        recorder.sent(json.dumps({'callId': call_id, 'req': {'typehint': 'CompletionsReq'}}))
+        recorder.received(json.dumps({
+            'callId': call_id,
+            'payload': {'typehint': 'CompletionInfoList', 'prefix': 'fo',
+                        'completions': []}}))
+    for n in range(NOTE_EVENTS):
+        recorder.received(json.dumps({
+            'payload': {'typehint': 'NewScalaNotesEvent', 'isFull': False, 'notes': []}}))
+    recorder.close()
+    return path
+
+
+def test_replay(benchmark, recording):
+    replay = Replay(recording, speed=0, tick_interval=0)
+    client, elapsed = benchmark(replay.run)
+
+    stats = client.request_stats
+    assert stats.requests['CompletionsReq']['handling'].count == COMPLETIONS
+    assert stats.events['NewScalaNotesEvent']['handling'].count == NOTE_EVENTS
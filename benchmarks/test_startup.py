@@ -0,0 +1,65 @@
+# coding: utf-8
+
+"""
+JVM startup with and without a class data sharing archive.
+
+Runs against the JDK at ``$JAVA_HOME``, skipped if there's none or it's too
+old for dynamic archives. By default the workload is ``javac -version``, which
+loads a few thousand classes. To measure something closer to the server, set
+``ENSIME_BENCH_DOTENSIME`` to a project's ``.ensime``: its Scala compiler jars
+are then put on the classpath and ``scalac -version`` is run instead.
+"""
+
+import os
+import subprocess
+
+import pytest
+
+from ensime_shared.config import ProjectConfig
+from ensime_shared.launcher import (CDS_DUMP_FLAG, CDS_MIN_JAVA_VERSION,
+                                    class_data_sharing_flags, ClasspathManifest,
+                                    finish_archive_dump, java_major_version)
+
+JAVA_HOME = os.environ.get('JAVA_HOME', '')
+
+pytestmark = pytest.mark.skipif(
+    (java_major_version(JAVA_HOME) or 0) < CDS_MIN_JAVA_VERSION,
+    reason='needs $JAVA_HOME pointing at JDK {}+'.format(CDS_MIN_JAVA_VERSION))
+
+
+def workload():
+    """Classpath and main class arguments of the program to start."""
+    dotensime = os.environ.get('ENSIME_BENCH_DOTENSIME')
+    if dotensime:
+        jars = ProjectConfig(dotensime)['scala-compiler-jars']
+        return jars, ['scala.tools.nsc.Main', '-version']
+    return [], ['--module', 'jdk.compiler/com.sun.tools.javac.Main', '-version']
+
+
+def run_java(classpath, flags, main):
+    java = os.path.join(JAVA_HOME, 'bin', 'java')
+    cp = ['-cp', os.pathsep.join(classpath)] if classpath else []
+    with open(os.devnull, 'w') as null:
+        subprocess.check_call([java] + cp + flags + main, stdout=null, stderr=null)
+
+
+def test_startup_cold(benchmark):
+    classpath, main = workload()
+    benchmark(run_java, classpath, [], main)
+
+
+def test_startup_with_archive(benchmark, tmpdir):
+    classpath, main = workload()
+    cache_dir = tmpdir.strpath
+
+    # First launch dumps the archive, as for the first server with CDS enabled
+    manifest = ClasspathManifest(classpath)
+    dump = class_data_sharing_flags(JAVA_HOME, cache_dir, manifest)
+    assert dump[0].startswith(CDS_DUMP_FLAG)
+    run_java(classpath, dump, main)
+    # As when the server exits by itself
+    finish_archive_dump(dump[0][len(CDS_DUMP_FLAG):], 0)
+
+    use = class_data_sharing_flags(JAVA_HOME, cache_dir, manifest)
+    assert use[0].startswith('-XX:SharedArchiveFile=')
+    benchmark(run_java, classpath, use, main)
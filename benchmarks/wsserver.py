@@ -0,0 +1,210 @@
+# coding: utf-8
+
+"""
+A minimal websocket server, to stand in for an ENSIME server locally.
+
+It speaks just enough of RFC 6455 for websocket-client: the opening handshake,
+text frames, ping and close. Each connection is served on its own thread by a
+handler, which can send and receive as it likes::
+
+    def echo(connection):
+        for message in iter(connection.recv, None):
+            connection.send(message)
+
+    with WebSocketServer(echo) as server:
+        ws = websocket.create_connection(server.url('websocket'))
+"""
+
+import base64
+import hashlib
+import socket
+import struct
+import threading
+
+GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+OP_CONTINUATION = 0x0
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+
+class Connection(object):
+    """The server end of a websocket connection."""
+
+    def __init__(self, sock):
+        self._sock = sock
+        self._file = sock.makefile('rb')
+        self._send_lock = threading.Lock()
+        self.closed = False
+
+    def handshake(self, subprotocol=None):
+        """Read the client's opening handshake and accept it.
+
+        Returns:
+            str: The path requested.
+        """
+        request = self._file.readline().decode('latin-1')
+        path = request.split()[1]
+        headers = {}
+        for line in iter(self._file.readline, b'\r\n'):
+            if not line:
+                raise IOError('connection closed during handshake')
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        key = headers['sec-websocket-key'] + GUID
+        accept = base64.b64encode(hashlib.sha1(key.encode('ascii')).digest())
+        response = ['HTTP/1.1 101 Switching Protocols',
+                    'Upgrade: websocket',
+                    'Connection: Upgrade',
+                    'Sec-WebSocket-Accept: ' + accept.decode('ascii')]
+        offered = [p.strip() for p in headers.get('sec-websocket-protocol', '').split(',')]
+        if subprotocol and subprotocol in offered:
+            response.append('Sec-WebSocket-Protocol: ' + subprotocol)
+        self._sock.sendall(('\r\n'.join(response) + '\r\n\r\n').encode('latin-1'))
+        return path
+
+    def recv(self):
+        """Receive a message.
+
+        Returns:
+            Optional[str]: The message, ``None`` once the connection is closed.
+        """
+        chunks = []
+        while not self.closed:
+            frame = self._read_frame()
+            if frame is None:
+                self.closed = True
+                break
+            fin, opcode, payload = frame
+            if opcode == OP_CLOSE:
+                self._send_frame(OP_CLOSE, payload[:2])
+                self.closed = True
+            elif opcode == OP_PING:
+                self._send_frame(OP_PONG, payload)
+            elif opcode in (OP_TEXT, OP_BINARY, OP_CONTINUATION):
+                chunks.append(payload)
+                if fin:
+                    return b''.join(chunks).decode('utf-8')
+        return None
+
+    def send(self, message):
+        """Send a text message."""
+        self._send_frame(OP_TEXT, message.encode('utf-8'))
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            try:
+                self._send_frame(OP_CLOSE, struct.pack('!H', 1000))
+            except socket.error:
+                pass
+        self._sock.close()
+
+    def _read_exactly(self, n):
+        data = self._file.read(n)
+        if len(data) < n:
+            return None
+        return bytearray(data)
+
+    def _read_frame(self):
+        head = self._read_exactly(2)
+        if head is None:
+            return None
+        fin, opcode = head[0] & 0x80, head[0] & 0x0F
+        masked, length = head[1] & 0x80, head[1] & 0x7F
+        if length == 126:
+            length = struct.unpack('!H', bytes(self._read_exactly(2)))[0]
+        elif length == 127:
+            length = struct.unpack('!Q', bytes(self._read_exactly(8)))[0]
+        mask = self._read_exactly(4) if masked else None
+        payload = self._read_exactly(length) if length else bytearray()
+        if payload is None:
+            return None
+        if mask:
+            for i in range(length):
+                payload[i] ^= mask[i % 4]
+        return bool(fin), opcode, bytes(payload)
+
+    def _send_frame(self, opcode, payload):
+        length = len(payload)
+        if length < 126:
+            head = struct.pack('!BB', 0x80 | opcode, length)
+        elif length < 1 << 16:
+            head = struct.pack('!BBH', 0x80 | opcode, 126, length)
+        else:
+            head = struct.pack('!BBQ', 0x80 | opcode, 127, length)
+        with self._send_lock:
+            self._sock.sendall(head + payload)
+
+
+class WebSocketServer(object):
+    """Serves websocket connections on a local port, until closed.
+
+    Args:
+        handler (Callable[[Connection], None]): Serves a connection, which is
+            closed when it returns. Called on a thread per connection.
+        subprotocol (Optional[str]): Subprotocol to accept, if offered.
+        port (int): Port to listen on, by default any free one.
+
+    Attributes:
+        port (int): The port listened on.
+        paths (List[str]): Paths requested by the connections so far.
+    """
+
+    def __init__(self, handler, subprotocol='jerky', port=0):
+        self.handler = handler
+        self.subprotocol = subprotocol
+        self.paths = []
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind(('127.0.0.1', port))
+        self._sock.listen(5)
+        self.port = self._sock.getsockname()[1]
+        self._closed = False
+        thread = threading.Thread(name='wsserver', target=self._accept)
+        thread.daemon = True
+        thread.start()
+
+    def url(self, path=''):
+        return 'ws://127.0.0.1:{}/{}'.format(self.port, path)
+
+    def _accept(self):
+        while not self._closed:
+            try:
+                sock, _ = self._sock.accept()
+            except socket.error:
+                break
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            thread = threading.Thread(name='wsserver-connection',
+                                      target=self._serve, args=(sock,))
+            thread.daemon = True
+            thread.start()
+
+    def _serve(self, sock):
+        connection = Connection(sock)
+        try:
+            self.paths.append(connection.handshake(self.subprotocol))
+            self.handler(connection)
+        except (IOError, socket.error):
+            pass
+        finally:
+            connection.close()
+
+    def close(self):
+        self._closed = True
+        # Wakes up the accepting thread, closing alone doesn't on Linux
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass
+        self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
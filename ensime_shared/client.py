@@ -1,30 +1,38 @@
 # coding: utf-8
 
-import inspect
 import json
 import logging
 import os
 import shutil
+import socket
 import sys
 import tempfile
 import time
+from collections import deque
 from subprocess import PIPE, Popen
-from threading import Thread
+from threading import current_thread, Event, Thread
 
 import websocket
 
-from .config import feedback, gconfig, LOG_FORMAT
+from .config import feedback, gconfig
 from .debugger import DebuggerClient
 from .errors import InvalidJavaPathError
+from .logs import FileLog
+from .monitor import MIB, ResourceMonitor
 from .protocol import ProtocolHandler, ProtocolHandlerV1, ProtocolHandlerV2
+from .recorder import TrafficRecorder
+from .stats import RequestStats, RunningStats
 from .typecheck import TypecheckHandler
-from .util import catch, Pretty, Util
+from .util import catch, LOG_MAX_MESSAGE, Pretty, Util
 
 # Queue depends on python version
 if sys.version_info > (3, 0):
-    from queue import Queue
+    from queue import Empty, Queue
 else:
-    from Queue import Queue
+    from Queue import Empty, Queue
+
+SERVER_EXIT_TIMEOUT = 5
+"""Seconds a server being restarted gets to exit, before being killed."""
 
 
 class EnsimeClient(TypecheckHandler, DebuggerClient, ProtocolHandler):
@@ -60,7 +68,8 @@ class EnsimeClient(TypecheckHandler, DebuggerClient, ProtocolHandler):
             project = config.get('name', path.basename(projectdir))
             logger = logging.getLogger(__name__).getChild(project)
 
-            if os.environ.get('ENSIME_VIM_DEBUG'):
+            debug = os.environ.get('ENSIME_VIM_DEBUG')
+            if debug:
                 logger.setLevel(logging.DEBUG)
             else:
                 logger.setLevel(logging.INFO)
@@ -72,45 +81,85 @@ class EnsimeClient(TypecheckHandler, DebuggerClient, ProtocolHandler):
                 try:
                     os.mkdir(logdir)
                 except OSError:
-                    logger.addHandler(logging.NullHandler())
+                    if not logger.handlers:
+                        logger.addHandler(logging.NullHandler())
                     return logger
 
             logfile = path.join(logdir, 'ensime-vim.log')
-            handler = logging.FileHandler(logfile, mode='w')
-            handler.setFormatter(logging.Formatter(LOG_FORMAT))
-
-            logger.addHandler(handler)
+            self._file_log = FileLog(logger, logfile, LOG_MAX_MESSAGE)
             logger.info('Initializing project - %s', projectdir)
             return logger
 
         super(EnsimeClient, self).__init__()
         self.editor = editor
         self.launcher = launcher
+        self._file_log = None
 
         self.log = setup_logger()
         self.log.debug('__init__: in')
         self.editor.initialize()
 
         self.ws = None
+        # Set once a connection is opened, to wake up the poller
+        self._connected = Event()
         self.ensime = None
         self.ensime_server = None
+        # Payload of the server's reply to ConnectionInfoReq
+        self.connection_info = None
 
         self.call_id = 0
         self.call_options = {}
+        # Send times of requests still awaiting a response, keyed by call ID
+        self.pending_calls = {}
+        self.pending_call_timeout = 30  # seconds
         self.refactor_id = 1
         self.refactorings = {}
 
-        # Queue for messages received from the ensime server.
+        # Queue for messages received from the ensime server, with the time
+        # they were received.
         self.queue = Queue()
+        # Parsed messages taken off the queue but not yet handled, with the
+        # time they were received
+        self._replies = deque()
+        self._events = deque()
+        # Max seconds of message handling per tick, the rest waits a tick
+        self.tick_budget = 0.008
+        self.tick_stats = RunningStats()
+        self.request_stats = RequestStats()
+        # Records traffic with the server when enabled, see record_traffic()
+        self.recorder = None
         self.suggestions = None
         self.completion_timeout = 10  # seconds
         self.completion_started = False
 
+        # Members shown by each package inspector, by buffer number, see
+        # handle_package_info()
+        self.package_trees = {}
+
         self.full_types_enabled = False
         """Whether fully-qualified types are displayed by inspections or not"""
 
         self.toggle_teardown = True
-        self.connection_attempts = 0
+        # Seconds to wait for a launched server to accept connections
+        self.server_ready_timeout = 120
+        self._connector = None
+        # Background installation of the server, while in progress
+        self.install_job = None
+        self._install_status = None
+
+        # Server health: resident memory in MiB above which it's unhealthy (0
+        # for no limit), and whether to restart it when idle, or just warn
+        self.monitor = None
+        self.server_memory_limit = 0
+        self.server_auto_restart = False
+        self._server_warned = False
+        self._restart_pending = False
+        # Thread stopping the server being replaced, see restart_server()
+        self._server_stopper = None
+        # Session state held by the server, restored to a restarted one
+        self.breakpoints = []
+        self.typechecked_files = set()
+        self._restore_pending = False
         self.tmp_diff_folder = tempfile.mkdtemp(prefix='ensime-vim-diffs')
 
         # By default, don't connect to server more than once
@@ -119,6 +168,13 @@ class EnsimeClient(TypecheckHandler, DebuggerClient, ProtocolHandler):
         self.debug_thread_id = None
         self.running = True
 
+        # Called (from any thread) when there's new work for the main thread,
+        # so the plugin can tick promptly. See :meth:`Ticker.wakeup`.
+        self.on_activity = None
+        # Callables from background threads that must run on the main thread,
+        # where it's safe to use the editor. Run on each tick.
+        self.main_thread_calls = Queue()
+
         thread = Thread(name='queue-poller', target=self.queue_poll)
         thread.daemon = True
         thread.start()
@@ -131,7 +187,9 @@ class EnsimeClient(TypecheckHandler, DebuggerClient, ProtocolHandler):
         connection_alive = True
 
         while self.running:
-            if self.ws:
+            # The connection may be replaced meanwhile, by a server restart
+            ws = self.ws
+            if ws:
                 def logger_and_close(msg):
                     self.log.error('Websocket exception', exc_info=True)
                     if not self.running:
@@ -144,28 +202,38 @@ class EnsimeClient(TypecheckHandler, DebuggerClient, ProtocolHandler):
                             self.teardown()
                             self._display_ws_warning()
 
+                received = False
                 with catch(websocket.WebSocketException, logger_and_close):
-                    result = self.ws.recv()
-                    self.queue.put(result)
-
-            if connection_alive:
-                time.sleep(sleep_t)
+                    result = ws.recv()
+                    self.queue.put((time.time(), result))
+                    recorder = self.recorder
+                    if recorder:
+                        recorder.received(result)
+                    self._notify_activity()
+                    received = True
+                if received:
+                    # Receiving blocks, so a burst is taken in without delay
+                    continue
+                if connection_alive:
+                    time.sleep(sleep_t)
+            else:
+                self._connected.wait(sleep_t)
 
     def setup(self, quiet=False, bootstrap_server=False):
         """Check the classpath and connect to the server if necessary."""
         def lazy_initialize_ensime():
             if not self.ensime:
-                called_by = inspect.stack()[4][3]
-                self.log.debug(str(inspect.stack()))
-                self.log.debug('setup(quiet=%s, bootstrap_server=%s) called by %s()',
-                               quiet, bootstrap_server, called_by)
-
-                installed = self.launcher.strategy.isinstalled()
-                if not installed and not bootstrap_server:
-                    if not quiet:
-                        scala = self.launcher.config.get('scala-version')
-                        msg = feedback["prompt_server_install"].format(scala_version=scala)
-                        self.editor.raw_message(msg)
+                self.log.debug('setup(quiet=%s, bootstrap_server=%s)', quiet, bootstrap_server)
+
+                # A server already running for the project is shared, and
+                # needn't be installed by us
+                self.ensime = self.launcher.attach()
+                if self.ensime:
+                    self.log.info('Attached to running server, PID %s', self.ensime.pid)
+                    return True
+
+                if not self.launcher.strategy.isinstalled():
+                    self._server_not_installed(quiet, bootstrap_server)
                     return False
 
                 try:
@@ -176,12 +244,217 @@ class EnsimeClient(TypecheckHandler, DebuggerClient, ProtocolHandler):
             return bool(self.ensime)
 
         def ready_to_connect():
-            if not self.ws and self.ensime.is_ready():
-                self.connect_ensime_server()
+            if not self.ws and not self._connector:
+                self._connector = Thread(name='server-connector',
+                                         target=self._connect_when_ready)
+                self._connector.daemon = True
+                self._connector.start()
             return True
 
-        # True if ensime is up and connection is ok, otherwise False
-        return self.running and lazy_initialize_ensime() and ready_to_connect()
+        # True if ensime is up and connection is ok, otherwise False. While a
+        # restart stops the old server, setup resumes once it's gone
+        return self.running and not self._server_stopper \
+            and lazy_initialize_ensime() and ready_to_connect()
+
+    def _server_not_installed(self, quiet, bootstrap_server):
+        if bootstrap_server:
+            # Setup is resumed when installation completes
+            self._install_server()
+        elif not quiet:
+            scala = self.launcher.config.get('scala-version')
+            msg = feedback["prompt_server_install"].format(scala_version=scala)
+            self.editor.raw_message(msg)
+
+    def _install_server(self):
+        """Install the server in the background, then set up again."""
+        if self.install_job and self.install_job.running:
+            return
+
+        def on_output(line):
+            self.log.info('install: %s', line)
+            # Lines can come faster than ticks, only the latest is shown
+            self._install_status = line
+            self.call_on_main_thread(self._show_install_status)
+
+        def on_exit(success):
+            self.call_on_main_thread(self._install_finished, success)
+
+        self.editor.message('install_started')
+        self.install_job = self.launcher.strategy.start_install(on_output, on_exit)
+
+    def _show_install_status(self):
+        status, self._install_status = self._install_status, None
+        if status:
+            self.editor.raw_message(status)
+
+    def _install_finished(self, success):
+        job, self.install_job = self.install_job, None
+        if success:
+            self.editor.message('install_finished')
+            self.setup()
+        elif job and job.cancelled:
+            self.editor.message('install_cancelled')
+        else:
+            self.editor.message('install_failed')
+
+    def _check_server_health(self):
+        """Sample the server's resource use, acting on signs of trouble."""
+        if self.monitor is None or self.monitor.process is not self.ensime:
+            self.monitor = ResourceMonitor(self.ensime)
+        sample = self.monitor.poll()
+        if not sample:
+            return
+
+        limit = self.server_memory_limit * MIB
+        bloated = limit and sample.rss and sample.rss > limit
+        if not (bloated or sample.oom_errors or sample.gc_thrash):
+            return
+
+        self.log.warning('Server in trouble: %s', self.monitor)
+        if self.server_auto_restart and not self.ensime.shared:
+            self._restart_pending = True
+        elif not self._server_warned:
+            self._server_warned = True
+            self.editor.message('server_unhealthy')
+
+    def restart_server(self):
+        """Replace the server with a new one.
+
+        Breakpoints and typechecks are sent again once the new server's
+        analyzer is ready.
+        """
+        self.log.warning('restart_server: in')
+        self.editor.message('server_restarting')
+        self._restart_pending = False
+        self._server_warned = False
+
+        # Allows a connection to the new server, and keeps the poller from
+        # giving up on the closed one
+        self.number_try_connection = 1
+        ws, self.ws = self.ws, None
+        self._connected.clear()
+        if ws:
+            with catch(websocket.WebSocketException):
+                ws.close()
+        old, self.ensime = self.ensime, None
+        self._connector = None
+        self.pending_calls.clear()
+        self.request_stats.forget_all()
+
+        self._restore_pending = True
+        if old:
+            # Waiting for a server in trouble to exit would freeze the editor
+            self._server_stopper = Thread(name='server-stopper', target=self._stop_old_server,
+                                          args=(old,))
+            self._server_stopper.daemon = True
+            self._server_stopper.start()
+        else:
+            self.setup(quiet=True)
+
+    def _stop_old_server(self, server):
+        """Stop a replaced server, then set up its replacement on the main
+        thread. Until it's gone, the old server would be attached to again, or
+        compete with the new one."""
+        server.stop()
+        if not server.wait(max(SERVER_EXIT_TIMEOUT, server.exit_timeout)):
+            self.log.warning('restart_server: killing server %s', server.pid)
+            server.kill()
+        self.launcher.remove_server_files()
+        self.call_on_main_thread(self._old_server_stopped)
+
+    def _old_server_stopped(self):
+        self._server_stopper = None
+        self.setup(quiet=True)
+
+    def restore_session(self):
+        """Send state the server lost by restarting, if it did."""
+        if not self._restore_pending:
+            return
+        self._restore_pending = False
+        self.log.info('restore_session: %s breakpoints, %s files',
+                      len(self.breakpoints), len(self.typechecked_files))
+        for path, line in self.breakpoints:
+            self.send_request({"line": line,
+                               "maxResults": 10,
+                               "typehint": "DebugSetBreakReq",
+                               "file": path})
+        files = [f for f in sorted(self.typechecked_files) if os.path.isfile(f)]
+        if files:
+            self.send_request({"typehint": "TypecheckFilesReq", "files": files})
+
+    def _connect_when_ready(self):
+        """Wait for the server to be ready and connect. Blocking in a thread.
+
+        The editor is told once if the server isn't ready in time, after which
+        a server that's still running is waited for until it is.
+        """
+        server = self.ensime
+        cancelled = lambda: not self.running or self.ensime is not server  # noqa: E731
+        ready = server.wait_ready(self.server_ready_timeout, cancelled)
+        if not ready and not cancelled():
+            self.log.error('server not ready after %ss', self.server_ready_timeout)
+            self.call_on_main_thread(self.editor.message, 'server_not_ready')
+            if server.is_running():
+                ready = server.wait_ready(float('inf'), cancelled)
+
+        if ready and not cancelled():
+            self._open_connection()
+            self.call_on_main_thread(self._on_connection_opened)
+        elif self._connector is current_thread():
+            # The server died, let a later setup try again
+            self._connector = None
+
+    def _on_connection_opened(self):
+        if self.ws:
+            self.log.info('Connected to %s', self.ensime_server)
+            self.send_request({"typehint": "ConnectionInfoReq"})
+        else:
+            self.shutdown_server()
+            self._display_ws_warning()
+
+    def call_on_main_thread(self, func, *args):
+        """Schedule ``func(*args)`` to run on the next tick. Thread-safe."""
+        self.main_thread_calls.put((func, args))
+        self._notify_activity()
+
+    def _run_main_thread_calls(self):
+        while True:
+            try:
+                func, args = self.main_thread_calls.get_nowait()
+            except Empty:
+                return
+            func(*args)
+
+    def _notify_activity(self):
+        if self.on_activity:
+            self.on_activity()
+
+    def is_busy(self, displaying=True):
+        """Whether there are messages to handle or requests awaiting replies.
+
+        Requests that have been pending longer than ``pending_call_timeout`` are
+        presumed lost and forgotten, so a dropped reply can't keep us busy.
+
+        Args:
+            displaying (bool): Whether messages are being handled. If not, as
+                outside Scala and Java buffers, only calls deferred to the main
+                thread count.
+        """
+        if not self.main_thread_calls.empty():
+            return True
+        if not displaying:
+            return False
+        if not self.queue.empty() or self._replies or self._events:
+            return True
+
+        expired = time.time() - self.pending_call_timeout
+        for call_id, sent in list(self.pending_calls.items()):
+            if sent < expired:
+                self.log.debug('is_busy: giving up on reply to call %s', call_id)
+                del self.pending_calls[call_id]
+                self.request_stats.forget(call_id)
+
+        return bool(self.pending_calls)
 
     def _display_ws_warning(self):
         warning = "A WS exception happened, 'ensime-vim' has been disabled. " +\
@@ -198,6 +471,8 @@ class EnsimeClient(TypecheckHandler, DebuggerClient, ProtocolHandler):
 
         self.log.debug('send: in')
         if self.running and self.ws:
+            if self.recorder:
+                self.recorder.sent(msg)
             with catch(websocket.WebSocketException, reconnect):
                 self.log.debug('send: sending JSON on WebSocket')
                 self.ws.send(msg + "\n")
@@ -205,32 +480,38 @@ class EnsimeClient(TypecheckHandler, DebuggerClient, ProtocolHandler):
     def connect_ensime_server(self):
         """Start initial connection with the server."""
         self.log.debug('connect_ensime_server: in')
-        server_v2 = isinstance(self, EnsimeClientV2)
-
-        def disable_completely(e):
-            if e:
-                self.log.error('connection error: %s', e, exc_info=True)
-            self.shutdown_server()
-            self._display_ws_warning()
-
         if self.running and self.number_try_connection:
-            self.number_try_connection -= 1
-            if not self.ensime_server:
-                port = self.ensime.http_port()
-                uri = "websocket" if server_v2 else "jerky"
-                self.ensime_server = gconfig["ensime_server"].format(port, uri)
-            with catch(websocket.WebSocketException, disable_completely):
-                # Use the default timeout (no timeout).
-                options = {"subprotocols": ["jerky"]} if server_v2 else {}
-                options['enable_multithread'] = True
-                self.log.debug("About to connect to %s with options %s",
-                               self.ensime_server, options)
-                self.ws = websocket.create_connection(self.ensime_server, **options)
-            if self.ws:
-                self.send_request({"typehint": "ConnectionInfoReq"})
+            self._open_connection()
+            self._on_connection_opened()
         else:
             # If it hits this, number_try_connection is 0
-            disable_completely(None)
+            self.shutdown_server()
+            self._display_ws_warning()
+
+    def _open_connection(self):
+        """Open the websocket to the server, without touching the editor.
+
+        Safe to call from a background thread. ``self.ws`` remains ``None``
+        if the connection fails.
+        """
+        server_v2 = isinstance(self, EnsimeClientV2)
+
+        def log_error(e):
+            self.log.error('connection error: %s', e, exc_info=True)
+
+        self.number_try_connection -= 1
+        # The port may have changed if the server restarted
+        port = self.ensime.http_port()
+        uri = "websocket" if server_v2 else "jerky"
+        self.ensime_server = gconfig["ensime_server"].format(port, uri)
+        with catch((websocket.WebSocketException, socket.error), log_error):
+            # Use the default timeout (no timeout).
+            options = {"subprotocols": ["jerky"]} if server_v2 else {}
+            options['enable_multithread'] = True
+            self.log.debug("About to connect to %s with options %s",
+                           self.ensime_server, options)
+            self.ws = websocket.create_connection(self.ensime_server, **options)
+            self._connected.set()
 
     def shutdown_server(self):
         """Shut down server if it is alive."""
@@ -242,8 +523,47 @@ class EnsimeClient(TypecheckHandler, DebuggerClient, ProtocolHandler):
         """Tear down the server or keep it alive."""
         self.log.debug('teardown: in')
         self.running = False
+        if self.install_job:
+            self.install_job.cancel()
+        # Signal the server first, the connection closes faster if it's exiting
         self.shutdown_server()
+        if self.ws:
+            with catch((websocket.WebSocketException, socket.error)):
+                self.ws.close()
+        if self.recorder:
+            self.recorder.close()
         shutil.rmtree(self.tmp_diff_folder, ignore_errors=True)
+        if self._file_log:
+            self._file_log.close()
+            self._file_log = None
+
+    def record_traffic(self):
+        """Record all traffic with the server to a file in the cache directory,
+        for replay with ``benchmarks/replay.py``."""
+        protocol = 'v2' if isinstance(self, EnsimeClientV2) else 'v1'
+        cache_dir = self.launcher.config['cache-dir']
+        with catch((IOError, OSError), lambda e: self.log.error('Not recording: %s', e)):
+            self.recorder = TrafficRecorder.in_directory(cache_dir, protocol)
+            self.log.info('Recording traffic to %s', self.recorder.path)
+
+    def container_sizes(self):
+        """Sizes of the client's containers, by name, to find what grows in a
+        long session. See :EnMemProfile."""
+        sizes = [
+            ('call_options', len(self.call_options)),
+            ('pending_calls', len(self.pending_calls)),
+            ('request_stats pending', self.request_stats.pending),
+            ('refactorings', len(self.refactorings)),
+            ('queue', self.queue.qsize()),
+            ('replies', len(self._replies)),
+            ('events', len(self._events)),
+            ('main_thread_calls', self.main_thread_calls.qsize()),
+            ('buffered_notes', len(self.buffered_notes)),
+            ('breakpoints', len(self.breakpoints)),
+            ('typechecked_files', len(self.typechecked_files)),
+        ]
+        sizes.extend(('editor ' + name, size) for name, size in self.editor.container_sizes())
+        return sizes
 
     def send_at_position(self, what, useSelection, where="range"):
         """Ask the server to perform an operation on a range (sometimes named point)
@@ -258,7 +578,7 @@ class EnsimeClient(TypecheckHandler, DebuggerClient, ProtocolHandler):
         """
         self.log.debug('send_at_position: in')
         b, e = self.editor.selection_pos() if useSelection else self.editor.word_under_cursor_pos()
-        self.log.debug('useSelection: {}, beg: {}, end: {}'.format(useSelection, b, e))
+        self.log.debug('useSelection: %s, beg: %s, end: %s', useSelection, b, e)
         beg = self.get_position(b[0], b[1])
         end = self.get_position(e[0], e[1])
         self.send_request(
@@ -275,8 +595,7 @@ class EnsimeClient(TypecheckHandler, DebuggerClient, ProtocolHandler):
             self.editor.set_cursor(decl_pos['line'], 0)
         else:  # OffsetSourcePosition
             point = decl_pos["offset"]
-            row, col = self.editor.point2pos(point + 1)
-            self.editor.set_cursor(row, col)
+            self.editor.set_cursor_at_point(point + 1)
 
     def get_position(self, row, col):
         """Get char position in all the text from row and column."""
@@ -294,6 +613,17 @@ class EnsimeClient(TypecheckHandler, DebuggerClient, ProtocolHandler):
         self.symbol_by_name([symbol])
         self.unqueue(should_wait=True)
 
+    def toggle_inspector_member(self):
+        """Expand or collapse the member on the package inspector's current
+        line, rewriting only its lines."""
+        tree = self.package_trees.get(self.editor.bufnr())
+        if not tree:
+            return
+        patch = tree.toggle(self.editor.cursor()[0] - 1)
+        if patch:
+            start, end, lines = patch
+            self.editor.set_lines(lines, start, end)
+
     def symbol_by_name(self, args, range=None):
         self.log.debug('symbol_by_name: in')
         if not args:
@@ -342,18 +672,23 @@ class EnsimeClient(TypecheckHandler, DebuggerClient, ProtocolHandler):
         self.editor.message('typechecking')
 
     def en_install(self, args, range=None):
-        """Bootstrap ENSIME server installation.
+        """Bootstrap ENSIME server installation, or cancel it with ``cancel``.
 
-        Enabling the bootstrapping actually happens in the execute_with_client
-        decorator when this is called, so this function is a no-op endpoint for
-        the Vim command.
-        TODO: this is confusing...
+        Installation is usually started by the execute_with_client decorator
+        already, when it sets up a new client for this command.
         """
         self.log.debug('en_install: in')
+        if 'cancel' in args:
+            if self.install_job and self.install_job.running:
+                self.install_job.cancel()
+            else:
+                self.editor.message('install_not_running')
+        elif not self.ensime:
+            self.setup(bootstrap_server=True)
 
     def type(self, args, range=None):
         useSelection = 'selection' in args
-        self.log.debug('type: in, sel: {}'.format(useSelection))
+        self.log.debug('type: in, sel: %s', useSelection)
         self.send_at_position("Type", useSelection)
 
     def toggle_fulltype(self, args, range=None):
@@ -576,6 +911,10 @@ class EnsimeClient(TypecheckHandler, DebuggerClient, ProtocolHandler):
 
         call_id = self.call_id
         self.call_id += 1
+        now = time.time()
+        self.pending_calls[call_id] = now
+        self.request_stats.sent(call_id, request.get('typehint'), now)
+        self._notify_activity()
         return call_id
 
     def buffer_leave(self, filename):
@@ -589,52 +928,107 @@ class EnsimeClient(TypecheckHandler, DebuggerClient, ProtocolHandler):
         """Update type checking when user saves buffer."""
         self.log.debug('type_check: in')
         self.editor.clean_errors()
+        path = self.editor.path()
+        self.typechecked_files.add(path)
         self.send_request(
             {"typehint": "TypecheckFilesReq",
-             "files": [self.editor.path()]})
+             "files": [path]})
 
-    def unqueue(self, timeout=10, should_wait=False):
-        """Unqueue all the received ensime responses for a given file."""
-        start, now = time.time(), time.time()
-        wait = self.queue.empty() and should_wait
+    def unqueue(self, timeout=10, should_wait=False, budget=None):
+        """Handle messages received from the ensime server.
 
-        while (not self.queue.empty() or wait) and (now - start) < timeout:
-            if wait and self.queue.empty():
-                time.sleep(0.25)
-                now = time.time()
-            else:
-                result = self.queue.get(False)
-                self.log.debug('unqueue: result received\n%s', result)
-                if result and result != "nil":
-                    wait = None
-                    # Restart timeout
-                    start, now = time.time(), time.time()
-                    _json = json.loads(result)
-                    # Watch out, it may not have callId
-                    call_id = _json.get("callId")
-                    if _json["payload"]:
-                        self.handle_incoming_response(call_id, _json["payload"])
-                else:
-                    self.log.debug('unqueue: nil or None received')
-
-        if (now - start) >= timeout:
-            self.log.warning('unqueue: no reply from server for %ss', timeout)
+        Replies to our requests are handled before unsolicited events, so that
+        interactive features stay responsive during bursts of notifications.
+
+        Args:
+            timeout (float): Seconds to wait for a reply when ``should_wait``.
+            should_wait (bool): Block until a reply arrives if none is queued.
+            budget (Optional[float]): Seconds of handling time allowed for this
+                call. Messages left over when it's spent are kept for the next
+                call. At least one message is always handled.
+        """
+        if should_wait and not self._replies:
+            self._wait_for_reply(timeout)
+        self._drain_queue()
+
+        deadline = time.time() + budget if budget is not None else None
+        while self._replies or self._events:
+            message, received = \
+                self._replies.popleft() if self._replies else self._events.popleft()
+            # Watch out, it may not have callId
+            call_id = message.get("callId")
+            payload = message["payload"]
+            started = time.time()
+            if payload:
+                self.handle_incoming_response(call_id, payload)
+                self.request_stats.handled(call_id, payload.get("typehint"),
+                                           received, started, time.time())
+
+            if deadline is not None and time.time() >= deadline:
+                self.log.debug('unqueue: budget spent, deferring %d messages',
+                               len(self._replies) + len(self._events))
+                break
+
+    def _drain_queue(self):
+        """Move all received messages from the queue into the inboxes."""
+        while True:
+            try:
+                received, result = self.queue.get(False)
+            except Empty:
+                break
+            self._file_message(received, result)
+
+    def _wait_for_reply(self, timeout):
+        deadline = time.time() + timeout
+        while not self._replies:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                self.log.warning('unqueue: no reply from server for %ss', timeout)
+                return
+            try:
+                received, result = self.queue.get(timeout=remaining)
+            except Empty:
+                continue
+            self._file_message(received, result)
+
+    def _file_message(self, received, result):
+        """Parse a raw message and put it in the replies or events inbox."""
+        self.log.debug('unqueue: result received\n%s', result)
+        if not result or result == "nil":
+            self.log.debug('unqueue: nil or None received')
+            return
+
+        message = json.loads(result)
+        call_id = message.get("callId")
+        if call_id is None:
+            self._events.append((message, received))
+        else:
+            self.pending_calls.pop(call_id, None)
+            self._replies.append((message, received))
 
     def unqueue_and_display(self, filename):
         """Unqueue messages and give feedback to user (if necessary)."""
         if self.running and self.ws:
             self.editor.lazy_display_error(filename)
-            self.unqueue()
-
-    def tick(self, filename):
-        """Try to connect and display messages in queue."""
-        if self.connection_attempts < 10:
-            # Trick to connect ASAP when
-            # plugin is  started without
-            # user interaction (CursorMove)
-            self.setup(True, False)
-            self.connection_attempts += 1
-        self.unqueue_and_display(filename)
+            self.unqueue(budget=self.tick_budget)
+
+    def tick(self, filename, display=True):
+        """Run calls deferred to the main thread and display messages in queue.
+
+        Args:
+            filename (str): Path of the current buffer.
+            display (bool): Whether to handle the queued messages, which can
+                only be displayed in a Scala or Java buffer.
+        """
+        start = time.time()
+        self._run_main_thread_calls()
+        if display:
+            self.unqueue_and_display(filename)
+        if self.ensime:
+            self._check_server_health()
+            if self._restart_pending and not self.is_busy():
+                self.restart_server()
+        self.tick_stats.add(time.time() - start)
 
     def vim_enter(self, filename):
         """Set up EnsimeClient when vim enters.
@@ -1,15 +1,37 @@
 # coding: utf-8
 
 import collections
+import hashlib
+import json
 import os
+import re
+import time
 
 import sexpdata
 
-from ensime_shared.util import Util
+from ensime_shared.util import catch, Util
 
 BOOTSTRAPS_ROOT = os.path.join(os.environ['HOME'], '.config', 'ensime-vim')
 """Default directory where ENSIME server bootstrap projects will be created."""
 
+FIND_CACHE_TTL = 5
+"""Seconds for which results of :meth:`ProjectConfig.find_from` are trusted."""
+
+FIND_CACHE_SIZE = 256
+"""Paths whose :meth:`ProjectConfig.find_from` results are kept, the least
+recently used are dropped first."""
+
+PARSED_CACHE_FILE = 'ensime-vim-config.json'
+"""File name of the cached parse of ``.ensime``, within the project cache-dir."""
+PARSED_CACHE_VERSION = 2
+
+PARSE_SKIP_KEYS = ('reference-source-roots',)
+"""Keys of ``.ensime`` that ensime-vim has no use for, so aren't parsed."""
+
+# Memoized results of ProjectConfig.find_from, least recently used first:
+#   path -> (config path or None, expiry)
+_find_cache = collections.OrderedDict()
+
 LOG_FORMAT = '%(levelname)-8s <%(asctime)s> (%(filename)s:%(lineno)d) - %(message)s'
 
 gconfig = {
@@ -26,6 +48,13 @@ feedback = {
     "handler_not_implemented":
         "The feature {} is not supported by the current Ensime server version {}",
     "indexer_ready": "Indexer is ready",
+    "install_cancelled": "ENSIME server installation cancelled",
+    "install_failed":
+        "ENSIME server installation failed, check ensime-vim.log in your .ensime_cache",
+    "install_finished": "ENSIME server installed, starting it...",
+    "install_not_running": "No ENSIME server installation to cancel",
+    "install_started":
+        "Installing ENSIME server in the background, this may take a few minutes...",
     "invalid_java": "Java not found or not executable, verify :java-home in your .ensime config",
     "manual_doc": "Go to {}",
     "missing_debug_class": "You must specify a class to debug",
@@ -33,6 +62,11 @@ feedback = {
     "package_inspect_current": "Using currently focused package...",
     "prompt_server_install":
         "Please run :EnInstall to install the ENSIME server for Scala {scala_version}",
+    "server_not_ready":
+        "The ENSIME server did not start, check server.log in your .ensime_cache",
+    "server_restarting": "Restarting the ENSIME server to recover its memory...",
+    "server_unhealthy":
+        "The ENSIME server is short of memory, see :help g:ensime_server_auto_restart",
     "spawned_browser": "Opened tab {}",
     "start_message": "Server has been started...",
     "symbol_search_symbol_required": "Must provide symbols to search for!",
@@ -42,6 +76,40 @@ feedback = {
 }
 
 
+def _file_identity(path):
+    """[canonical path, mtime, size, SHA-1 of contents] of a file."""
+    realpath = os.path.realpath(path)
+    digest = hashlib.sha1()
+    with open(realpath, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    stat = os.stat(realpath)
+    return [realpath, stat.st_mtime, stat.st_size, digest.hexdigest()]
+
+
+def _read_parsed_cache(cache_path):
+    with catch((IOError, OSError, ValueError)):
+        with open(cache_path, 'r') as f:
+            cached = json.load(f)
+        if cached.get('version') == PARSED_CACHE_VERSION:
+            return cached
+    return None
+
+
+def _write_parsed_cache(cache_path, identity, config):
+    entry = {'version': PARSED_CACHE_VERSION, 'identity': identity, 'config': config}
+    tmp_path = '{}.{}'.format(cache_path, os.getpid())
+    # TypeError: values that can't be represented in JSON, just don't cache
+    with catch((IOError, OSError, TypeError, ValueError)):
+        Util.mkdir_p(os.path.dirname(cache_path))
+        with open(tmp_path, 'w') as f:
+            json.dump(entry, f)
+        os.rename(tmp_path, cache_path)
+    with catch((IOError, OSError)):
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
 class ProjectConfig(collections.Mapping):
     """A dict-like immutable representation of an ENSIME project configuration.
 
@@ -51,7 +119,7 @@ class ProjectConfig(collections.Mapping):
 
     def __init__(self, filepath):
         self._filepath = os.path.realpath(filepath)
-        self.__data = self.parse(filepath)
+        self.__data = self.load(filepath)
 
     # Provide the Mapping protocol requirements
 
@@ -79,64 +147,277 @@ class ProjectConfig(collections.Mapping):
     def find_from(path):
         """Find path of an .ensime config, searching recursively upward from path.
 
+        Results, including misses, are memoized per path for
+        ``FIND_CACHE_TTL`` seconds, for up to ``FIND_CACHE_SIZE`` paths. Once
+        expired the search is repeated, so configs created or removed in any
+        directory up the tree are noticed.
+
         Args:
             path (str): Path of a file or directory from where to start searching.
 
         Returns:
             str: Canonical path of nearest ``.ensime``, or ``None`` if not found.
         """
-        realpath = os.path.realpath(path)
-        config_path = os.path.join(realpath, '.ensime')
-
-        if os.path.isfile(config_path):
+        now = time.time()
+        cached = _find_cache.pop(path, None)
+        if cached and now < cached[1]:
+            config_path = cached[0]
+            _find_cache[path] = cached
             return config_path
-        elif realpath == os.path.abspath('/'):
-            return None
-        else:
-            dirname = os.path.dirname(realpath)
-            return ProjectConfig.find_from(dirname)
+
+        config_path = ProjectConfig._find_uncached(path)
+        _find_cache[path] = (config_path, now + FIND_CACHE_TTL)
+        while len(_find_cache) > FIND_CACHE_SIZE:
+            _find_cache.popitem(last=False)
+        return config_path
 
     @staticmethod
-    def parse(path):
+    def _find_uncached(path):
+        directory = os.path.realpath(path)
+        root = os.path.abspath('/')
+
+        while True:
+            config_path = os.path.join(directory, '.ensime')
+            if os.path.isfile(config_path):
+                return config_path
+            elif directory == root:
+                return None
+            directory = os.path.dirname(directory)
+
+    @staticmethod
+    def load(path):
+        """Parse an ``.ensime`` config file, reusing a cached parse if fresh.
+
+        Parsed configs are cached as JSON in the project's ``cache-dir``, keyed
+        by the config file's path, mtime, size and content hash. Since the
+        cache location has to be known before parsing, only projects using the
+        conventional ``.ensime_cache`` next to ``.ensime`` are cached.
+
+        Args:
+            path (str): Path of an ``.ensime`` file to parse.
+
+        Returns:
+            dict: Configuration values with string keys.
+        """
+        identity = _file_identity(path)
+        cache_path = os.path.join(os.path.dirname(identity[0]), '.ensime_cache', PARSED_CACHE_FILE)
+
+        cached = _read_parsed_cache(cache_path)
+        if cached and cached.get('identity') == identity:
+            return cached['config']
+
+        config = ProjectConfig.parse(path, skip_keys=PARSE_SKIP_KEYS)
+        cache_dir = config.get('cache-dir')
+        if cache_dir and os.path.realpath(cache_dir) == os.path.dirname(cache_path):
+            _write_parsed_cache(cache_path, identity, config)
+        return config
+
+    @staticmethod
+    def parse(path, skip_keys=()):
         """Parse an ``.ensime`` config file from S-expressions.
 
+        The file is tokenized and converted to dicts in a single streaming
+        pass, without building an intermediate S-expression tree.
+
         Args:
             path (str): Path of an ``.ensime`` file to parse.
+            skip_keys (Iterable[str]): Keys whose values are skipped over
+                without being parsed, at any depth.
 
         Returns:
             dict: Configuration values with string keys.
+
+        Raises:
+            sexpdata.ExpectClosingBracket: If the file has unbalanced brackets
+                or an unterminated string.
+            sexpdata.ExpectNothing: If there is data after the config.
         """
+        with open(path, 'r') as f:
+            return _ConfigParser(f, skip_keys).parse()
+
+
+# Escapes recognized in strings, as read by sexpdata
+_STRING_ESCAPES = {
+    '\\\\': '\\', '\\"': '"', '\\b': '\b', '\\f': '\f',
+    '\\n': '\n', '\\r': '\r', '\\t': '\t',
+}
+_ESCAPE_RE = re.compile(r'\\.', re.DOTALL)
+
+# Each match is one token, with any whitespace and comments before it
+_TOKEN_RE = re.compile(r'''
+    (?:\s|;[^\n]*)*
+    (?:
+        (?P<open>[(\[]) |
+        (?P<close>[)\]]) |
+        "(?P<string>[^"\\]*(?:\\.[^"\\]*)*)" |
+        (?P<atom>[^\s()\[\]";]+)
+    )
+''', re.VERBOSE)
+_SPACE_RE = re.compile(r'(?:\s|;[^\n]*)*')
+
+
+def _tokenize(f, chunk_size=1 << 16):
+    """Generate ``(kind, text)`` tokens from a file, reading it in chunks."""
+    buf = ''
+    pos = 0
+    eof = False
+    match = _TOKEN_RE.match
+
+    while True:
+        m = match(buf, pos)
+        # A token running up to the end of the buffer may continue in the
+        # next chunk, so only trust it once the whole file has been read.
+        if m is None or (m.end() == len(buf) and not eof):
+            if eof:
+                if _SPACE_RE.match(buf, pos).end() < len(buf):
+                    raise sexpdata.ExpectClosingBracket('"', None)
+                return
+            chunk = f.read(chunk_size)
+            buf = buf[pos:] + chunk
+            pos = 0
+            eof = not chunk
+            continue
+
+        pos = m.end()
+        kind = m.lastgroup
+        yield kind, m.group(kind)
+
+
+def _unescape(text):
+    if '\\' not in text:
+        return text
+    return _ESCAPE_RE.sub(lambda m: _STRING_ESCAPES.get(m.group(), m.group()), text)
+
+
+def _atom(text):
+    """Convert a bare token the way sexpdata does."""
+    if text[0] == ':':
+        return sexpdata.Symbol(text)
+    elif text == 'nil':
+        return []
+    elif text == 't':
+        return True
+    try:
+        return int(text)
+    except ValueError:
+        try:
+            return float(text)
+        except ValueError:
+            return sexpdata.Symbol(text)
+
+
+class _ConfigParser(object):
+    """Single-pass parser from an ``.ensime`` token stream to config dicts.
+
+    Lists are converted as they're read: a list starting with a symbol is a
+    property list and becomes a dict, a list of lists becomes a list of dicts,
+    and any other list is kept as a plain list.
+    """
+
+    def __init__(self, f, skip_keys=()):
+        self._tokens = _tokenize(f)
+        self._skip = frozenset(skip_keys)
+
+    def parse(self):
+        token = next(self._tokens, None)
+        if token is None:
+            return {}
+        elif token[0] != 'open':
+            raise sexpdata.ExpectClosingBracket(token[1], '(')
+
+        config = self._plist(self._next())
+        for _, text in self._tokens:
+            raise sexpdata.ExpectNothing(text)
+        return config
+
+    def _next(self):
+        token = next(self._tokens, None)
+        if token is None:
+            raise sexpdata.ExpectClosingBracket(None, ')')
+        return token
+
+    def _plist(self, token):
+        result = {}
+        while token[0] != 'close':
+            key = self._key(token)
+            token = self._next()
+            if token[0] == 'close':
+                break  # A trailing key without a value is dropped
+
+            if key in self._skip:
+                self._skip_value(token)
+            else:
+                result[key] = self._value(token)
+
+            token = self._next()
+        return result
+
+    def _key(self, token):
+        kind, text = token
+        if kind == 'atom':
+            key = _atom(text)
+            key = key.value() if isinstance(key, sexpdata.Symbol) else key
+        elif kind == 'string':
+            key = _unescape(text)
+        else:
+            key = self._raw(token)
+        return str(key).lstrip(':')
+
+    def _value(self, token):
+        kind, text = token
+        if kind != 'open':
+            return self._raw(token)
+
+        first = self._next()
+        if first[0] == 'close':
+            return []
+        elif first[0] == 'open':
+            items = [self._plist(self._next())]
+            token = self._next()
+            while token[0] != 'close':
+                items.append(self._plist(self._next()) if token[0] == 'open'
+                             else self._raw(token))
+                token = self._next()
+            return items
+        elif first[0] == 'atom' and isinstance(_atom(first[1]), sexpdata.Symbol):
+            return self._plist(first)
+        else:
+            return self._rawlist(first)
+
+    def _raw(self, token):
+        kind, text = token
+        if kind == 'string':
+            return _unescape(text)
+        elif kind == 'atom':
+            return _atom(text)
+        elif kind == 'open':
+            return self._rawlist(self._next())
+        raise sexpdata.ExpectNothing(text)
+
+    def _rawlist(self, token):
+        # The hot path: long lists of jar paths. Strings are handled inline.
+        items = []
+        append = items.append
+        tokens = self._tokens
+        while token[0] != 'close':
+            if token[0] == 'string':
+                text = token[1]
+                append(_unescape(text) if '\\' in text else text)
+            else:
+                append(self._raw(token))
+            token = next(tokens, None)
+            if token is None:
+                raise sexpdata.ExpectClosingBracket(None, ')')
+        return items
 
-        def paired(iterable):
-            """s -> (s0, s1), (s2, s3), (s4, s5), ..."""
-            cursor = iter(iterable)
-            return zip(cursor, cursor)
-
-        def unwrap_if_sexp_symbol(datum):
-            """Convert Symbol(':key') to ':key' (Symbol isn't hashable for dict keys).
-            """
-            return datum.value() if isinstance(datum, sexpdata.Symbol) else datum
-
-        def sexp2dict(sexps):
-            """Transforms a nested list structure from sexpdata to dict."""
-            newdict = {}
-
-            # Turn flat list into associative pairs
-            for key, value in paired(sexps):
-                key = str(unwrap_if_sexp_symbol(key)).lstrip(':')
-
-                # Recursively transform nested lists
-                if isinstance(value, list) and value:
-                    if isinstance(value[0], list):
-                        newdict[key] = [sexp2dict(val) for val in value]
-                    elif isinstance(value[0], sexpdata.Symbol):
-                        newdict[key] = sexp2dict(value)
-                    else:
-                        newdict[key] = value
-                else:
-                    newdict[key] = value
-
-            return newdict
-
-        conf = sexpdata.loads(Util.read_file(path))
-        return sexp2dict(conf)
+    def _skip_value(self, token):
+        depth = 1 if token[0] == 'open' else 0
+        tokens = self._tokens
+        while depth:
+            kind = next(tokens, ('eof', None))[0]
+            if kind == 'open':
+                depth += 1
+            elif kind == 'close':
+                depth -= 1
+            elif kind == 'eof':
+                raise sexpdata.ExpectClosingBracket(None, ')')
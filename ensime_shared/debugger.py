@@ -46,10 +46,12 @@ class DebuggerClient(object):
                "maxResults": 10,
                "typehint": "DebugSetBreakReq",
                "file": self.editor.path()}
+        self.breakpoints.append((req["file"], req["line"]))
         self.send_request(req)
 
     def debug_clear_breaks(self, args, range=None):
         self.log.debug('debug_clear_breaks: in')
+        del self.breakpoints[:]
         self.send_request({"typehint": "DebugClearAllBreaksReq"})
 
     def debug_start(self, args, range=None):
@@ -1,10 +1,130 @@
 # coding: utf-8
+from contextlib import contextmanager
 from os import path
 
 from .config import feedback
 from .errors import Error
 
 
+def vim_literal(value):
+    """Format a string, number or boolean as a Vim expression."""
+    if isinstance(value, bool):
+        return str(int(value))
+    elif isinstance(value, (int, float)):
+        return str(value)
+    return "'{}'".format(value.replace("'", "''"))
+
+
+class BatchResult(object):
+    """The result of an expression evaluated in a :class:`Batch`.
+
+    Its :attr:`value` sends the batch's calls queued so far, if the expression
+    hasn't been evaluated yet.
+    """
+
+    _PENDING = object()
+
+    def __init__(self, batch):
+        self._batch = batch
+        self._value = self._PENDING
+
+    @property
+    def value(self):
+        if self._value is self._PENDING:
+            self._batch.flush()
+        return self._value
+
+
+class Batch(object):
+    """Vim commands and expressions queued to be sent to Vim at once.
+
+    Under Neovim, the calls are sent in a single ``nvim_call_atomic`` request.
+    Under Vim, consecutive commands are run with a single ``execute()``. It
+    captures their messages, which are echoed after; errors abort it and are
+    raised as from ``vim.command``.
+
+    Args:
+        vim: The Vim API object.
+        isneovim (bool): Whether ``vim`` is Neovim's.
+        hasexecute (Callable[[], bool]): Whether Vim has ``execute()``, only
+            asked when there are commands to run at once.
+    """
+
+    def __init__(self, vim, isneovim, hasexecute):
+        self._vim = vim
+        self._isneovim = isneovim
+        self._hasexecute = hasexecute
+        self._calls = []
+
+    def command(self, cmd):
+        """Queue an Ex command."""
+        self._calls.append((cmd, None))
+
+    def eval(self, expr):
+        """Queue an expression to evaluate.
+
+        Returns:
+            BatchResult: The value of the expression, once sent.
+        """
+        result = BatchResult(self)
+        self._calls.append((expr, result))
+        return result
+
+    def flush(self):
+        """Send the calls queued so far."""
+        calls, self._calls = self._calls, []
+        if len(calls) == 1:
+            self._call(*calls[0])
+        elif self._isneovim:
+            self._call_atomic(calls)
+        elif calls:
+            self._execute(calls)
+
+    def _call(self, arg, result):
+        if result is None:
+            self._vim.command(arg)
+        else:
+            result._value = self._vim.eval(arg)
+
+    def _call_atomic(self, calls):
+        requests = [['nvim_command' if result is None else 'nvim_eval', [arg]]
+                    for arg, result in calls]
+        values, error = self._vim.api.call_atomic(requests)
+        for (_, result), value in zip(calls, values):
+            if result is not None:
+                result._value = value
+        if error:
+            index, _, message = error
+            raise self._vim.error('{}: {}'.format(calls[index][0], message))
+
+    def _execute(self, calls):
+        if not self._hasexecute():  # Before Vim 8
+            for call in calls:
+                self._call(*call)
+            return
+
+        commands = []
+        for arg, result in calls:
+            if result is None:
+                commands.append(arg)
+                continue
+            self._run(commands)
+            commands = []
+            self._call(arg, result)
+        self._run(commands)
+
+    def _run(self, commands):
+        if len(commands) > 1:
+            literal = '[{}]'.format(', '.join(vim_literal(cmd) for cmd in commands))
+            output = self._vim.eval('execute({})'.format(literal))
+            if output and output.strip():
+                lines = output.lstrip('\n').split('\n')
+                self._vim.command('echo join([{}], "\\n")'.format(
+                    ', '.join(vim_literal(line) for line in lines)))
+        elif commands:
+            self._vim.command(commands[0])
+
+
 class Editor(object):
 
     def __init__(self, driver):
@@ -13,11 +133,20 @@ class Editor(object):
 
         # Old API
         self._errors = []   # Line error structs reported from ENSIME notes
+        # Bumped whenever _errors changes, to invalidate lazy_display_error
+        self._notes_generation = 0
+        self._last_error_lookup = None
+        self._displayed_error = None
 
         # Vim highlight matches for errors, for clearing
         # TODO: this seems unneeded, clearmatches()
         self._matches = []
 
+        # Calls to Vim are queued here within batch()
+        self._batch = None
+        # Whether Vim has execute(), checked on the first batch needing it
+        self._hasexecute = None
+
     def append(self, text, afterline=None):
         """Append text to the current buffer.
 
@@ -37,6 +166,63 @@ class Editor(object):
         """bool: Whether the underlying editor is Neovim. Use this sparingly."""
         return self._isneovim
 
+    @property
+    def driver(self):
+        """The Vim API object used, normally the ``vim`` module.
+
+        Can be replaced by a stand-in, such as a
+        :class:`~ensime_shared.rpcprofile.ProfilingProxy`.
+        """
+        return self._vim
+
+    @driver.setter
+    def driver(self, driver):
+        self._vim = driver
+
+    @contextmanager
+    def batch(self):
+        """Send the Vim commands of editor operations within to Vim at once,
+        saving round trips to Neovim.
+
+        Expressions whose values are needed within are sent with the commands
+        queued before them. Batches nest, the outermost sends the calls.
+
+        Yields:
+            Batch: The queued calls.
+        """
+        if self._batch:
+            yield self._batch
+            return
+
+        self._batch = Batch(self._vim, self._isneovim, self._has_execute)
+        try:
+            yield self._batch
+        finally:
+            batch, self._batch = self._batch, None
+            batch.flush()
+
+    def _has_execute(self):
+        if self._hasexecute is None:
+            self._hasexecute = bool(int(self._vim.eval("exists('*execute')")))
+        return self._hasexecute
+
+    def _command(self, cmd):
+        if self._batch:
+            self._batch.command(cmd)
+        else:
+            self._vim.command(cmd)
+
+    def _eval(self, expr):
+        """Evaluate an expression, within a batch along with the calls queued.
+
+        The value is returned rather than a :class:`BatchResult`, so the batch
+        is sent right away: only commands are saved round trips, expressions
+        each cost one as before.
+        """
+        if self._batch:
+            return self._batch.eval(expr).value
+        return self._vim.eval(expr)
+
     # TODO: make this read-only property-like?
     def current_word(self):
         """Get the current word under the cursor."""
@@ -49,11 +235,11 @@ class Editor(object):
             *autocmds (str): Names of autocommands to trigger.
                 See ``:h autocmd-events``.
         """
-        self._vim.command('doautocmd ' + ','.join(autocmds))
+        self._command('doautocmd ' + ','.join(autocmds))
 
     def edit(self, fpath):
         """Edit a file with path ``fpath``, in the current window."""
-        self._vim.command('edit ' + fpath)
+        self._command('edit ' + fpath)
 
     def getline(self, lnum=None):
         """Get a line from the current buffer.
@@ -79,17 +265,53 @@ class Editor(object):
         buf = self._vim.buffers[bufnr] if bufnr else self._vim.current.buffer
         return buf[:]
 
+    def set_lines(self, lines, start=0, end=None):
+        """Replace lines of the current buffer, all of them by default.
+
+        A ``nomodifiable`` buffer is made modifiable for the change only.
+
+        Args:
+            lines (Sequence[str]): Lines to put in place of those replaced.
+            start (int): Zero-based index of the first line to replace.
+            end (Optional[int]): Index after the last line to replace, the end
+                of the buffer if ``None``.
+        """
+        buf = self._vim.current.buffer
+        modifiable = buf.options['modifiable']
+        if not modifiable:
+            buf.options['modifiable'] = True
+        try:
+            if end is None:
+                buf[start:] = lines
+            else:
+                buf[start:end] = lines
+        finally:
+            if not modifiable:
+                buf.options['modifiable'] = False
+
+    def bufnr(self):
+        """int: Number of the current buffer."""
+        return self._vim.current.buffer.number
+
+    def buffer_exists(self, bufnr):
+        """Whether a buffer exists, not having been wiped out.
+
+        Args:
+            bufnr (int): A Vim buffer number.
+        """
+        return bool(int(self._eval('bufexists({})'.format(bufnr))))
+
     def goto(self, offset):
         """Go to a specific byte offset in the current buffer.
 
         Operation is added to the jump list.
         """
-        self._vim.command('goto {}'.format(offset))
+        self._command('goto {}'.format(offset))
 
     def point2pos(self, point):
         """Converts a point or offset in a file to a (row, col) position."""
-        row = self._vim.eval('byte2line({})'.format(point))
-        col = self._vim.eval('{} - line2byte({})'.format(point, row))
+        row = self._eval('byte2line({})'.format(point))
+        col = self._eval('{} - line2byte({})'.format(point, row))
         return (int(row), int(col))
 
     def menu(self, prompt, choices):
@@ -135,15 +357,16 @@ class Editor(object):
                 or Python ``vim.current.buffer.number``. If ``None``, options
                 are set on the current buffer.
         """
-        buf = self._vim.buffers[bufnr] if bufnr else self._vim.current.buffer
+        buf = bufnr or "'%'"
+        with self.batch():
+            # Special case handling for filetype, see doc on ``set_filetype``
+            filetype = options.pop('filetype', None)
+            if filetype:
+                self.set_filetype(filetype)
 
-        # Special case handling for filetype, see doc on ``set_filetype``
-        filetype = options.pop('filetype', None)
-        if filetype:
-            self.set_filetype(filetype)
-
-        for opt, value in options.items():
-            buf.options[opt] = value
+            for opt, value in options.items():
+                self._command('call setbufvar({}, {}, {})'.format(
+                    buf, vim_literal('&' + opt), vim_literal(value)))
 
     # TODO: make this a R/W property?
     def set_filetype(self, filetype, bufnr=None):
@@ -158,9 +381,9 @@ class Editor(object):
             bufnr (Optional[int]): A Vim buffer number, current if ``None``.
         """
         if bufnr:
-            self._vim.command(str(bufnr) + 'bufdo set filetype=' + filetype)
+            self._command(str(bufnr) + 'bufdo set filetype=' + filetype)
         else:
-            self._vim.command('set filetype=' + filetype)
+            self._command('set filetype=' + filetype)
 
     def split_window(self, fpath, vertical=False, size=None, bufopts=None):
         """Open file in a new split window.
@@ -179,10 +402,10 @@ class Editor(object):
         if size:
             command = str(size) + command
 
-        self._vim.command(command)
-
-        if bufopts:
-            self.set_buffer_options(bufopts)
+        with self.batch():
+            self._command(command)
+            if bufopts:
+                self.set_buffer_options(bufopts)
 
     def write(self, noautocmd=False):
         """Writes the file of the current buffer.
@@ -195,7 +418,7 @@ class Editor(object):
             usage of noautocmd. See #298
         """
         cmd = 'noautocmd write' if noautocmd else 'write'
-        self._vim.command(cmd)
+        self._command(cmd)
 
     # -----------------------------------------------------------------------
     # -                               OLD API                               -
@@ -218,6 +441,8 @@ class Editor(object):
         # TODO: custom filetype ftplugin
         self._vim.command(
             'autocmd FileType package_info nnoremap <buffer> <Space> :call EnPackageDecl()<CR>')
+        self._vim.command(
+            'autocmd FileType package_info nnoremap <buffer> <CR> :call EnPackageToggle()<CR>')
         self._vim.command('autocmd FileType package_info setlocal splitright')
 
     # TODO: make this a R/W property?
@@ -232,7 +457,19 @@ class Editor(object):
 
         Operation is not added to the jump list.
         """
-        self._vim.current.window.cursor = (row, col)
+        if self._batch:
+            self._batch.command('call cursor({}, {})'.format(row, col + 1))
+        else:
+            self._vim.current.window.cursor = (row, col)
+
+    def set_cursor_at_point(self, point):
+        """Set cursor position to a point or offset in the current buffer, as
+        converted by :meth:`point2pos`, without waiting for the conversion.
+
+        Operation is not added to the jump list.
+        """
+        row = 'byte2line({})'.format(point)
+        self._command('call cursor({0}, {1} - line2byte({0}) + 1)'.format(row, point))
 
     # TODO: don't displace user's cursor; can something like ``getpos()`` do this?
     def word_under_cursor_pos(self):
@@ -279,36 +516,67 @@ class Editor(object):
                 "type": tpe}
 
     def write_quickfix_list(self, qflist, title):
-        if self._isneovim:
-            self._vim.command("call setqflist({!s}, 'r', 'Ensime - {}')".format(qflist, title))
-            self._vim.command('copen')
-        else:
-            self._vim.command("call setqflist({!s}, 'r')".format(qflist))
-            self._vim.command('copen')
-            self._vim.command("let w:quickfix_title='Ensime - {}'".format(title))
+        with self.batch():
+            if self._isneovim:
+                self._command("call setqflist({!s}, 'r', 'Ensime - {}')".format(qflist, title))
+                self._command('copen')
+            else:
+                self._command("call setqflist({!s}, 'r')".format(qflist))
+                self._command('copen')
+                self._command("let w:quickfix_title='Ensime - {}'".format(title))
 
     def lazy_display_error(self, filename):
-        """Display error when user is over it."""
+        """Display error when user is over it.
+
+        The message is only echoed when the cursor moves onto a different
+        error. The last (buffer, cursor, notes generation, width) seen is
+        remembered so that nothing is looked up while it's unchanged.
+        """
+        if not self._errors:
+            self._last_error_lookup = None
+            self._displayed_error = None
+            return
+
         position = self.cursor()
+        width = self.width()
+        lookup = (filename, tuple(position), self._notes_generation, width)
+        if lookup == self._last_error_lookup:
+            return
+        self._last_error_lookup = lookup
+
         error = self.get_error_at(position)
-        if error:
-            report = error.get_truncated_message(position, self.width() - 1)
+        if error and error is not self._displayed_error:
+            report = error.get_truncated_message(position, width - 1)
             self.raw_message(report)
+        self._displayed_error = error
 
     def get_error_at(self, cursor):
         """Return error at position `cursor`."""
+        if not self._errors:
+            return None
+        current_file = self._vim.eval("expand('%:p')")
         for error in self._errors:
-            if error.includes(self._vim.eval("expand('%:p')"), cursor):
+            if error.includes(current_file, cursor):
                 return error
         return None
 
+    def container_sizes(self):
+        """Sizes of the notes held for display, by name.
+
+        Only those held in Python, the Syntastic notes are in buffer variables
+        of whichever buffers were current, not of a client.
+        """
+        return [('errors', len(self._errors)),
+                ('matches', len(self._matches))]
+
     def clean_errors(self):
         """Clean errors and unhighlight them in vim."""
-        self._vim.eval('clearmatches()')
+        self._command('call clearmatches()')
         self._errors = []
         self._matches = []
+        self._notes_generation += 1
         # Reset Syntastic notes - TODO: bufdo?
-        self._vim.current.buffer.vars['ensime_notes'] = []
+        self._command('let b:ensime_notes = []')
 
     def message(self, key):
         """Display a message already defined in `feedback`."""
@@ -405,5 +673,6 @@ class Editor(object):
                 match = self._vim.eval(highlight_cmd.format(l, c, e))
                 self._errors.append(error)
                 self._matches.append(match)
+                self._notes_generation += 1
                 # add_match_msg = "added match {} at line {} column {} error {}"
                 # self.log.debug(add_match_msg.format(match, l, c, e))
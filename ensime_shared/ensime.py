@@ -1,13 +1,17 @@
 # coding: utf-8
 
 import os
+import time
+from threading import Thread
 
-from .client import EnsimeClientV1, EnsimeClientV2
 from .config import ProjectConfig
-from .editor import Editor
-from .launcher import EnsimeLauncher
+from .manager import ClientManager
+from .rpcprofile import ProfilingProxy, RpcProfiler
 from .ticker import Ticker
 
+TEARDOWN_TIMEOUT = 0.8
+"""Seconds that servers get to exit on teardown, before being killed."""
+
 
 def execute_with_client(quiet=False,
                         bootstrap_server=False,
@@ -16,12 +20,13 @@ def execute_with_client(quiet=False,
     def wrapper(f):
 
         def wrapper2(self, *args, **kwargs):
-            client = self.current_client(
-                quiet=quiet,
-                bootstrap_server=bootstrap_server,
-                create_client=create_client)
-            if client and client.running:
-                return f(self, client, *args, **kwargs)
+            with self.rpc_profiler.entry(f.__name__):
+                client = self.current_client(
+                    quiet=quiet,
+                    bootstrap_server=bootstrap_server,
+                    create_client=create_client)
+                if client and client.running:
+                    return f(self, client, *args, **kwargs)
         return wrapper2
 
     return wrapper
@@ -39,7 +44,7 @@ class Ensime(object):
         vim: The ``vim`` module/singleton from the Vim Python API.
 
     Attributes:
-        clients (Mapping[str, EnsimeClient]):
+        clients (ClientManager):
             Active client instances, keyed by the filesystem path to the
             ``.ensime`` configuration for their respective projects.
     """
@@ -50,7 +55,15 @@ class Ensime(object):
         # defined.
         self._vim = vim
         self._ticker = None
-        self.clients = {}
+        # Counts Vim API calls when enabled, see start_rpc_profile()
+        self.rpc_profiler = RpcProfiler()
+        self._unprofiled_vim = vim
+        # Created by :EnMemProfile, tracemalloc is slow to import
+        self._memory_profiler = None
+        self.clients = ClientManager()
+        # Buffer name -> path of its .ensime, so buffers of a live client
+        # resolve their project once
+        self._buffer_configs = {}
 
     @property
     def using_server_v2(self):
@@ -66,7 +79,7 @@ class Ensime(object):
 
     def client_status(self, config_path):
         """Get status of client for a project, given path to its config."""
-        c = self.client_for(config_path)
+        c = self.clients.get(os.path.abspath(config_path))
         status = "stopped"
         if not c or not c.ensime:
             status = 'unloaded'
@@ -78,15 +91,47 @@ class Ensime(object):
             status = 'aborted'
         return status
 
-    def teardown(self):
-        """Say goodbye..."""
-        for c in self.clients.values():
-            c.teardown()
+    def teardown(self, timeout=TEARDOWN_TIMEOUT):
+        """Say goodbye...
+
+        Clients are torn down concurrently, which signals their servers to
+        exit. Servers that haven't exited after ``timeout`` seconds, or their
+        longer ``exit_timeout``, are killed.
+        """
+        start = time.time()
+        deadline = start + timeout
+        clients = self.clients.values()
+
+        threads = []
+        for c in clients:
+            thread = Thread(name='teardown', target=c.teardown)
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join(max(0, deadline - time.time()))
+
+        # Unless a client was asked to keep its server alive
+        stopping = [c.ensime for c in clients if c.ensime and c.toggle_teardown]
+        for server in stopping:
+            server_deadline = max(deadline, start + server.exit_timeout)
+            if not server.wait(max(0, server_deadline - time.time())):
+                server.kill()
 
     def current_client(self, quiet, bootstrap_server, create_client):
         """Return the client for current file in the editor."""
         current_file = self._vim.current.buffer.name
-        config_path = ProjectConfig.find_from(current_file)
+        config_path = self._buffer_configs.get(current_file)
+        # Trusted while the project has a client and config, as the project may
+        # be gone or another .ensime created nearer since the client's eviction
+        if config_path and not (os.path.abspath(config_path) in self.clients
+                                and os.path.isfile(config_path)):
+            del self._buffer_configs[current_file]
+            config_path = None
+        if not config_path:
+            config_path = ProjectConfig.find_from(current_file)
+            if config_path:
+                self._buffer_configs[current_file] = config_path
         if config_path:
             return self.client_for(
                 config_path,
@@ -100,11 +145,15 @@ class Ensime(object):
         client = None
         abs_path = os.path.abspath(config_path)
         if abs_path in self.clients:
-            client = self.clients[abs_path]
+            client = self.clients.use(abs_path)
         elif create_client:
             client = self.create_client(config_path)
-            if client.setup(quiet=quiet, bootstrap_server=bootstrap_server):
-                self.clients[abs_path] = client
+            # Kept while installing the server too, setup resumes after it
+            if client.setup(quiet=quiet, bootstrap_server=bootstrap_server) \
+                    or client.install_job:
+                self.clients.max_servers = int(self.get_setting('max_servers', 0))
+                self.clients.max_rss = int(self.get_setting('max_servers_memory', 0))
+                self.clients.add(abs_path, client)
         return client
 
     def create_client(self, config_path):
@@ -112,16 +161,32 @@ class Ensime(object):
 
         This will launch the ENSIME server for the project as a side effect.
         """
+        # Deferred until the first Scala or Java buffer of a project, so that
+        # Vim sessions never opening one don't pay for importing websocket &co.
+        from .client import EnsimeClientV1, EnsimeClientV2
+        from .editor import Editor
+        from .launcher import EnsimeLauncher
+
         config = ProjectConfig(config_path)
         editor = Editor(self._vim)
-        launcher = EnsimeLauncher(self._vim, config)
+        launcher = EnsimeLauncher(
+            self._vim, config,
+            class_data_sharing=bool(self.get_setting('server_cds', 0)))
 
         if self.using_server_v2:
             client = EnsimeClientV2(editor, launcher)
         else:
             client = EnsimeClientV1(editor, launcher)
 
+        client.server_memory_limit = int(self.get_setting('server_memory_limit', 0))
+        client.server_auto_restart = bool(self.get_setting('server_auto_restart', 0))
+        if self.get_setting('record_traffic', 0):
+            client.record_traffic()
+        if self.get_setting('rpc_profile', 0):
+            self.start_rpc_profile()
+
         self._create_ticker()
+        client.on_activity = self._ticker.wakeup
 
         return client
 
@@ -158,13 +223,50 @@ class Ensime(object):
 
         return paths
 
-    def tick_clients(self):
-        """Trigger the periodic tick function in the client."""
+    def start_rpc_profile(self):
+        """Count and time Vim API calls from now on, see :mod:`.rpcprofile`."""
+        if not self.rpc_profiler.enabled:
+            self.rpc_profiler.enabled = True
+            self._use_driver(ProfilingProxy(self._unprofiled_vim, self.rpc_profiler))
+
+    def stop_rpc_profile(self):
+        """Stop counting Vim API calls, keeping the counts so far."""
+        if self.rpc_profiler.enabled:
+            self.rpc_profiler.enabled = False
+            self._use_driver(self._unprofiled_vim)
+
+    def _use_driver(self, vim):
+        self._vim = vim
+        if self._ticker:
+            self._ticker._vim = vim
+        for client in self.clients.values():
+            client.editor.driver = vim
+
+    def tick_clients(self, scheduled=True):
+        """Trigger the periodic tick function in the client, then schedule the
+        next tick sooner or later depending on whether any client is busy.
+
+        Args:
+            scheduled (bool): Whether this is the scheduled tick, rather than
+                one on an editor event that leaves the schedule as it is.
+        """
         if not self._ticker:
             self._create_ticker()
 
-        for client in self.clients.values():
-            self._ticker.tick(client)
+        # Clients whose messages were handled, they wait in other buffers
+        displaying = {}
+        try:
+            for client in self.clients.values():
+                displaying[client] = self._ticker.tick(client)
+            self.clients.check()
+        finally:
+            # Only work that ticks can do keeps them coming fast
+            busy = any(client.is_busy(displaying.get(client, True))
+                       for client in self.clients.values())
+            if scheduled:
+                self._ticker.reschedule(busy)
+            else:
+                self._ticker.unscheduled(busy)
 
     @execute_with_client()
     def com_en_toggle_teardown(self, client, args, range=None):
@@ -202,6 +304,10 @@ class Ensime(object):
     def fun_en_package_decl(self, client, args, range=None):
         client.open_decl_for_inspector_symbol()
 
+    @execute_with_client()
+    def fun_en_package_toggle(self, client, args, range=None):
+        client.toggle_inspector_member()
+
     @execute_with_client()
     def com_en_symbol(self, client, args, range=None):
         client.symbol(args, range)
@@ -276,9 +382,58 @@ class Ensime(object):
 
     @execute_with_client()
     def com_en_clients(self, client, args, range=None):
-        for path in self.clients.keys():
+        for path, c in self.clients.items():
             status = self.client_status(path)
-            client.editor.raw_message("{}: {}".format(path, status))
+            client.editor.raw_message(
+                "{}: {} (main thread per tick: {}; server: {})".format(
+                    path, status, c.tick_stats, c.monitor or 'not monitored'))
+        client.editor.raw_message(self.clients.stats())
+
+    @execute_with_client()
+    def com_en_stats(self, client, args, range=None):
+        for line in client.request_stats.report():
+            client.editor.raw_message(line)
+
+    @execute_with_client()
+    def com_en_rpc_profile(self, client, args, range=None):
+        action = args[0] if args else None
+        if action == 'start':
+            self.start_rpc_profile()
+        elif action == 'stop':
+            self.stop_rpc_profile()
+        elif action == 'reset':
+            self.rpc_profiler.reset()
+        else:
+            for line in self.rpc_profiler.report():
+                client.editor.raw_message(line)
+
+    @execute_with_client()
+    def com_en_mem_profile(self, client, args, range=None):
+        from .memprofile import container_report, MemoryProfiler
+
+        action = args[0] if args else None
+        if not self._memory_profiler:
+            self._memory_profiler = MemoryProfiler()
+        profiler = self._memory_profiler
+        if action == 'start':
+            if profiler.available:
+                profiler.start()
+            else:
+                client.editor.raw_message('Memory profiling needs tracemalloc, from Python 3.4')
+            return
+        elif action == 'stop':
+            profiler.stop()
+            return
+
+        lines = []
+        if action in ('snapshot', 'diff') and profiler.tracing:
+            lines = profiler.snapshot() if action == 'snapshot' else profiler.diff()
+        elif action is not None:
+            lines = ['Not tracing memory, start with :EnMemProfile start']
+        for path, c in self.clients.items():
+            lines.extend(container_report(path, c.container_sizes()))
+        for line in lines:
+            client.editor.raw_message(line)
 
     @execute_with_client()
     def com_en_sym_search(self, client, args, range=None):
@@ -298,14 +453,15 @@ class Ensime(object):
 
     @execute_with_client()
     def au_cursor_hold(self, client, filename):
-        self.tick_clients()
+        self.tick_clients(scheduled=False)
 
     @execute_with_client()
     def au_cursor_moved(self, client, filename):
-        self.tick_clients()
+        self.tick_clients(scheduled=False)
 
     def fun_en_tick(self, timer):
-        self.tick_clients()
+        with self.rpc_profiler.entry('fun_en_tick'):
+            self.tick_clients()
 
     @execute_with_client()
     def au_buf_enter(self, client, filename):
@@ -0,0 +1,91 @@
+# coding: utf-8
+
+"""
+The tree shown by the package inspector.
+
+The tree is rendered to lines in Python and written to the buffer at once.
+Members deeper than :data:`EXPANDED_LEVELS` are collapsed at first, and
+expanded on demand from the payload already received, patching only the lines
+of the toggled member.
+
+Each member is on a line of its own, indented two spaces per level, with its
+name last, as :meth:`Editor.symbol_for_inspector_line` expects. Members with
+members of their own are marked ``+`` when collapsed and ``-`` when expanded.
+"""
+
+EXPANDED_LEVELS = 1
+"""Levels of members expanded when the inspector is opened: the package's."""
+
+COLLAPSED = '+ '
+EXPANDED = '- '
+
+
+class PackageTree(object):
+    """The members of a package, as shown in the package inspector.
+
+    Args:
+        payload (dict): A ``PackageInfo`` from the server.
+    """
+
+    def __init__(self, payload):
+        self._root = payload
+        # IDs of the expanded members' payloads
+        self._expanded = set()
+        # (member, level) shown on each line of the buffer
+        self._rows = [(payload, 0)]
+        self._rows.extend(self._visible(payload, 0, EXPANDED_LEVELS))
+
+    def lines(self):
+        """All lines of the inspector buffer."""
+        return [self._line(member, level) for member, level in self._rows]
+
+    def toggle(self, index):
+        """Expand a collapsed member, or collapse an expanded one.
+
+        Args:
+            index (int): Zero-based index of the member's line.
+
+        Returns:
+            Optional[Tuple[int, int, List[str]]]: The ``start`` and ``end``
+            indexes of the lines to replace, and the lines to replace them
+            with; ``None`` if the line isn't of a member with members.
+        """
+        if not 0 < index < len(self._rows):
+            return None
+        member, level = self._rows[index]
+        if not member.get('members'):
+            return None
+
+        end = index + 1
+        while end < len(self._rows) and self._rows[end][1] > level:
+            end += 1
+
+        if id(member) in self._expanded:
+            self._expanded.discard(id(member))
+            rows = [(member, level)]
+        else:
+            self._expanded.add(id(member))
+            rows = [(member, level)] + list(self._visible(member, level, 0))
+        self._rows[index:end] = rows
+        return index, end, [self._line(m, l) for m, l in rows]
+
+    def _visible(self, member, level, expand_levels):
+        """Rows of the members shown under an expanded member, expanding
+        members ``expand_levels`` levels down."""
+        for child in member.get('members', ()):
+            yield child, level + 1
+            if level + 1 <= expand_levels:
+                self._expanded.add(id(child))
+            if id(child) in self._expanded:
+                for row in self._visible(child, level + 1, expand_levels):
+                    yield row
+
+    def _line(self, member, level):
+        if level == 0:
+            return str(member['fullName'])
+
+        marker = ''
+        if member.get('members'):
+            marker = EXPANDED if id(member) in self._expanded else COLLAPSED
+        typehint = member['declAs']['typehint'] if member['typehint'] == 'BasicTypeInfo' else ''
+        return '{}{}{}: {}'.format('  ' * level, marker, typehint, member['name'])
@@ -1,7 +1,10 @@
 # coding: utf-8
 
 import errno
+import hashlib
+import json
 import os
+import re
 import shutil
 import signal
 import socket
@@ -11,34 +14,128 @@ import time
 from abc import ABCMeta, abstractmethod
 from fnmatch import fnmatch
 from string import Template
+from threading import Lock, Thread
 
 from ensime_shared.config import BOOTSTRAPS_ROOT
 from ensime_shared.errors import InvalidJavaPathError, LaunchError
 from ensime_shared.util import catch, Util
+from ensime_shared.watcher import watch
+
+CDS_MIN_JAVA_VERSION = 13
+"""Oldest JDK supporting dynamic class data sharing archives (JEP 350)."""
+CDS_ARCHIVE_PREFIX = 'server-classes-'
+CDS_DUMP_SUFFIX = '.dumping'
+"""Of an archive being dumped, renamed without it once the dump is complete."""
+CDS_DUMP_FLAG = '-XX:ArchiveClassesAtExit='
+CDS_DUMP_GRACE = 5
+"""Seconds a server dumping an archive gets to exit, before being killed."""
+
+MANIFEST_TTL = 10
+"""Seconds a verified :class:`ClasspathManifest` is trusted without a recheck."""
 
 
 class EnsimeProcess(object):
+    """Handle for an ENSIME server process.
+
+    Args:
+        cache_dir (str): The project's ENSIME cache directory.
+        process (Optional[subprocess.Popen]): The server process if launched
+            by us. ``None`` for a server we attached to, which was started by
+            another editor session and is shared with it.
+        log_path (Optional[str]): Path of the server's log file.
+        cleanup (Callable[[], None]): Called when the server is stopped.
+        pid (Optional[int]): PID of an attached server.
+        on_exit (Optional[Callable[[int], None]]): Called with the exit status
+            of a launched server once it has exited, from any thread.
+        exit_timeout (float): Seconds the server may need to exit once
+            stopped, before it's killed on teardown.
+    """
 
-    def __init__(self, cache_dir, process, log_path, cleanup):
+    def __init__(self, cache_dir, process, log_path, cleanup, pid=None, on_exit=None,
+                 exit_timeout=0):
         self.log_path = log_path
         self.cache_dir = cache_dir
         self.process = process
+        self.pid = process.pid if process else pid
+        self.exit_timeout = exit_timeout
         self.__stopped_manually = False
         self.__cleanup = cleanup
+        self.__on_exit = on_exit
+        self.__exit_lock = Lock()
+        if process and on_exit:
+            # Also called by wait() and kill(), in case the editor exits first
+            thread = Thread(name='server-exit', target=self._wait_for_exit)
+            thread.daemon = True
+            thread.start()
+        # Read from the ``http`` file, which the server writes once listening
+        self._port = None
+
+    @property
+    def shared(self):
+        """bool: Whether the server was started elsewhere and must outlive us."""
+        return self.process is None
 
     def stop(self):
+        """Ask the server to exit, without waiting for it to."""
+        if self.process is None:
+            return
+        with catch(OSError):  # Already gone
+            os.kill(self.process.pid, signal.SIGTERM)
+        self._cleanup()
+        self.__stopped_manually = True
+
+    def wait(self, timeout):
+        """Block until the server process has exited, or ``timeout`` seconds pass.
+
+        Returns:
+            bool: Whether it has exited. Always true for a shared server, since
+            it's not ours to wait for.
+        """
+        if self.process is None:
+            return True
+        deadline = time.time() + timeout
+        while self.process.poll() is None:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+            time.sleep(min(0.02, remaining))
+        self._exited()
+        return True
+
+    def kill(self):
+        """Kill the server process, for when it doesn't exit on :meth:`stop`."""
         if self.process is None:
             return
-        os.kill(self.process.pid, signal.SIGTERM)
-        self.__cleanup()
+        with catch(OSError):
+            self.process.kill()
+            self.process.wait()
+        self._exited()
+        self._cleanup()
         self.__stopped_manually = True
 
+    def _wait_for_exit(self):
+        self.process.wait()
+        self._exited()
+
+    def _exited(self):
+        with self.__exit_lock:
+            on_exit, self.__on_exit = self.__on_exit, None
+        if on_exit and self.process.returncode is not None:
+            on_exit(self.process.returncode)
+
+    def _cleanup(self):
+        cleanup, self.__cleanup = self.__cleanup, None
+        if cleanup:
+            cleanup()
+
     def aborted(self):
         return not (self.__stopped_manually or self.is_running())
 
     def is_running(self):
+        if self.process is not None:
+            return self.process.poll() is None
         # What? If there's no process, it's running? This is mad confusing.
-        return self.process is None or self.process.poll() is None
+        return self.pid is None or pid_alive(self.pid)
 
     def is_ready(self):
         if not self.is_running():
@@ -50,16 +147,291 @@ class EnsimeProcess(object):
             s.close()
             return True
         except:
+            # Reread the port next time, in case the change went unnoticed
+            self._port = None
             return False
 
+    def rss(self):
+        """Resident memory of the server process in bytes.
+
+        Returns:
+            Optional[int]: The size, or ``None`` if unknown -- it's read from
+            ``/proc``, so only available on Linux.
+        """
+        try:
+            with open('/proc/{}/statm'.format(self.pid)) as statm:
+                pages = int(statm.read().split()[1])
+        except (IOError, OSError, IndexError, TypeError, ValueError):
+            return None
+        return pages * os.sysconf('SC_PAGE_SIZE')
+
+    def wait_ready(self, timeout, cancelled=lambda: False):
+        """Block until the server accepts connections.
+
+        Wakes up as soon as the server writes its port file, otherwise checks
+        :meth:`is_ready` with a growing interval so a dying server is noticed
+        without busy-looping through a JVM startup. Meant to run off the
+        editor's main thread. The file is only watched while waiting.
+
+        Args:
+            timeout (float): Seconds to wait at most.
+            cancelled (Callable[[], bool]): Checked between polls, waiting is
+                abandoned when it returns true.
+
+        Returns:
+            bool: Whether the server is ready. False on timeout, cancellation,
+            or if the process exited meanwhile.
+        """
+        deadline = time.time() + timeout
+        interval = 0.05
+        watcher = watch(self.cache_dir, ['http'])
+        try:
+            while not cancelled():
+                if self.is_ready():
+                    return True
+                remaining = deadline - time.time()
+                if remaining <= 0 or not self.is_running():
+                    break
+                watcher.wait(min(interval, remaining))
+                interval = min(interval * 2, 1.0)
+        finally:
+            watcher.close()
+        return False
+
     def http_port(self):
-        return int(Util.read_file(os.path.join(self.cache_dir, "http")))
+        """int: The server's HTTP port, read again once :meth:`is_ready` fails
+        to connect to it.
+
+        Raises:
+            IOError: If the server hasn't written the port file (yet).
+        """
+        if self._port is None:
+            self._port = int(Util.read_file(os.path.join(self.cache_dir, "http")))
+        return self._port
+
+
+def java_major_version(java_home):
+    """Major version of a JDK, read from its ``release`` file.
+
+    Returns:
+        Optional[int]: The version, e.g. 8 or 17, or ``None`` if unknown.
+    """
+    try:
+        with open(os.path.join(java_home, 'release')) as release:
+            for line in release:
+                if line.startswith('JAVA_VERSION='):
+                    match = re.match(r'"?(?:1\.)?(\d+)', line.split('=', 1)[1])
+                    return int(match.group(1)) if match else None
+    except (IOError, OSError):
+        pass
+    return None
+
+
+def _entry_identity(path):
+    """[path, size, mtime] of a file, or ``None`` if it doesn't exist."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [path, stat.st_size, stat.st_mtime]
+
+
+class ClasspathManifest(object):
+    """Identity of a classpath's entries, by their paths, sizes and mtimes.
+
+    Checking that all entries exist takes a stat per jar, which adds up for
+    classpaths of hundreds of jars checked on every setup. So a successful
+    :meth:`verify` is trusted for ``MANIFEST_TTL`` seconds.
+
+    Args:
+        classpath (list of str): Paths of jars and directories.
+    """
+
+    def __init__(self, classpath):
+        self.classpath = list(classpath)
+        self.digest = None
+        """str: Hex digest of the entries' identities when last verified."""
+        self._trusted_until = 0
+
+    def verify(self):
+        """Whether every entry of the classpath exists.
+
+        Within ``MANIFEST_TTL`` seconds of a successful verification this
+        returns ``True`` without touching the file system.
+        """
+        now = time.time()
+        if now < self._trusted_until:
+            return True
+
+        entries = [_entry_identity(path) for path in self.classpath]
+        digest = hashlib.sha1()
+        for path, entry in zip(self.classpath, entries):
+            identity = '{}\0{}\0{}\n'.format(*entry) if entry else '{}\0-\n'.format(path)
+            digest.update(identity.encode('utf-8'))
+        self.digest = digest.hexdigest()
+
+        if not all(entries):
+            return False
+        self._trusted_until = now + MANIFEST_TTL
+        return True
+
+
+def class_data_sharing_flags(java_home, cache_dir, manifest):
+    """JVM flags to use an application class data sharing (AppCDS) archive.
+
+    The archive for a classpath is dumped when the first server using it
+    exits, and mapped by later launches to skip loading and verifying those
+    classes again. It's keyed by the classpath manifest's digest and the JDK
+    release, so it's regenerated when the jars or the JDK change; archives for
+    other keys are removed.
+
+    The JVM dumps to a temporary name, and :func:`finish_archive_dump` gives
+    the archive its name only if the server exited by itself, since a server
+    killed while dumping leaves a truncated archive.
+
+    Args:
+        java_home (str): JDK to run the server with.
+        cache_dir (str): Directory where archives are kept.
+        manifest (ClasspathManifest): Of the server's classpath.
+
+    Returns:
+        list of str: Flags for ``java``, empty if the JDK doesn't support
+        dynamic archives.
+    """
+    version = java_major_version(java_home)
+    if version is None or version < CDS_MIN_JAVA_VERSION:
+        return []
+
+    if manifest.digest is None:
+        manifest.verify()
+    key = hashlib.sha1(manifest.digest.encode('utf-8'))
+    release = _entry_identity(os.path.join(java_home, 'release'))
+    key.update(json.dumps(release).encode('utf-8'))
+
+    archive_name = '{}{}.jsa'.format(CDS_ARCHIVE_PREFIX, key.hexdigest()[:16])
+    archive = os.path.join(cache_dir, archive_name)
+    if os.path.isfile(archive) and os.path.getsize(archive) > 0:
+        return ['-XX:SharedArchiveFile={}'.format(archive)]
+
+    # Including unfinished dumps
+    for name in os.listdir(cache_dir):
+        if name.startswith(CDS_ARCHIVE_PREFIX) and name != archive_name:
+            with catch(OSError):
+                os.remove(os.path.join(cache_dir, name))
+    return [CDS_DUMP_FLAG + archive + CDS_DUMP_SUFFIX]
+
+
+def finish_archive_dump(dump, status):
+    """Name a class data sharing archive dumped by a server that has exited,
+    or remove it if the server didn't exit by itself.
+
+    Args:
+        dump (str): Path the archive was dumped to.
+        status (int): Exit status of the server, negative if killed by a
+            signal.
+    """
+    with catch(OSError):
+        if status >= 0 and os.path.getsize(dump) > 0:
+            os.rename(dump, dump[:-len(CDS_DUMP_SUFFIX)])
+        else:
+            os.remove(dump)
+
+
+def pid_alive(pid):
+    """Whether a process with the given PID exists."""
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        # EPERM: it exists, but belongs to someone else
+        return e.errno == errno.EPERM
+    return True
+
+
+class InstallJob(object):
+    """A server installation command run on a background thread.
+
+    Args:
+        args (list of str): The command to run.
+        cwd (str): Directory to run it in.
+        on_output (Callable[[str], None]): Called with each line of output.
+        on_exit (Callable[[bool], None]): Called once the job is over, with
+            whether it succeeded.
+        finish (Callable[[], bool]): Runs after the command exits successfully,
+            returning whether the installation succeeded.
+
+    Callbacks are called on the job's thread.
+    """
+
+    def __init__(self, args, cwd, on_output, on_exit, finish=lambda: True):
+        self.args = args
+        self.cwd = cwd
+        self.on_output = on_output
+        self.on_exit = on_exit
+        self.finish = finish
+        self.process = None
+        self.cancelled = False
+        self.succeeded = False
+        self._thread = Thread(name='server-install', target=self._run)
+        self._thread.daemon = True
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    @property
+    def running(self):
+        """bool: Whether the job has yet to finish."""
+        return self._thread.is_alive()
+
+    def wait(self, timeout=None):
+        """Block until the job has finished, or ``timeout`` seconds pass."""
+        self._thread.join(timeout)
+
+    def cancel(self):
+        """Stop the job, it will finish unsuccessfully."""
+        self.cancelled = True
+        process = self.process
+        if process and process.poll() is None:
+            with catch(OSError):
+                process.terminate()
+
+    def _run(self):
+        try:
+            with open(os.devnull, 'r') as null:
+                self.process = subprocess.Popen(
+                    self.args,
+                    cwd=self.cwd,
+                    stdin=null,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                    universal_newlines=True)
+            if self.cancelled:
+                self.cancel()
+            for line in iter(self.process.stdout.readline, ''):
+                self.on_output(line.rstrip())
+            self.process.stdout.close()
+            returncode = self.process.wait()
+            if returncode != 0 and not self.cancelled:
+                self.on_output('{} exited with status {}'.format(self.args[0], returncode))
+            self.succeeded = returncode == 0 and not self.cancelled and self.finish()
+        except OSError as e:
+            self.on_output('Could not run {}: {}'.format(self.args[0], e))
+        finally:
+            self.on_exit(self.succeeded)
 
 
 class EnsimeLauncher(object):
-    """Launches ENSIME processes, installing the server if needed."""
+    """Launches ENSIME processes, installing the server if needed.
+
+    Args:
+        vim (neovim.Nvim): The editor.
+        config (ProjectConfig): Configuration of the server's project.
+        base_dir (str): Where bootstrap projects and assembly jars live.
+        class_data_sharing (bool): Whether to launch the server with an AppCDS
+            archive, see :func:`class_data_sharing_flags`.
+    """
 
-    def __init__(self, vim, config, base_dir=BOOTSTRAPS_ROOT):
+    def __init__(self, vim, config, base_dir=BOOTSTRAPS_ROOT, class_data_sharing=False):
         self.config = config
 
         # If an ENSIME assembly jar is in place, it takes launch precedence
@@ -71,6 +443,7 @@ class EnsimeLauncher(object):
             self.strategy = DotEnsimeLauncher(config)
         else:
             self.strategy = SbtBootstrap(vim, config, base_dir)
+        self.strategy.class_data_sharing = class_data_sharing
 
         self._remove_legacy_bootstrap()
 
@@ -80,10 +453,8 @@ class EnsimeLauncher(object):
     # of dealing with that. EnsimeClient needs a bunch of (worthwhile) refactoring
     # before this could happen, though.
     def launch(self):
-        # This is legacy -- what is it really accomplishing?
-        cache_dir = self.config['cache-dir'],
-        process = EnsimeProcess(cache_dir, None, None, lambda: None)
-        if process.is_ready():
+        process = self.attach()
+        if process:
             return process
 
         if not self.strategy.isinstalled():
@@ -92,6 +463,43 @@ class EnsimeLauncher(object):
 
         return self.strategy.launch()
 
+    def attach(self):
+        """Find a live server for the project, started by another session.
+
+        The server is discovered from the ``server.pid`` and ``http`` files in
+        the project's cache directory. Files left by a dead server are removed,
+        since the server refuses to start while they exist.
+
+        Returns:
+            Optional[EnsimeProcess]: A shared process handle if a server is
+            running and accepting connections, otherwise ``None``.
+        """
+        cache_dir = self.config['cache-dir']
+        pid_path = os.path.join(cache_dir, 'server.pid')
+        try:
+            pid = int(Util.read_file(pid_path))
+        except (IOError, OSError, ValueError):
+            return None
+
+        if not pid_alive(pid):
+            self.remove_server_files()
+            return None
+
+        log_path = os.path.join(cache_dir, 'server.log')
+        process = EnsimeProcess(cache_dir, None, log_path, lambda: None, pid=pid)
+        if process.is_ready():
+            return process
+        process.stop()  # Only releases resources, it's not ours to stop
+        return None
+
+    def remove_server_files(self):
+        """Remove the files a server leaves in the cache directory, once it's
+        gone. The server refuses to start while they exist."""
+        cache_dir = self.config['cache-dir']
+        for name in ('server.pid', 'http', 'port'):
+            with catch(OSError):
+                os.remove(os.path.join(cache_dir, name))
+
     @staticmethod
     def _remove_legacy_bootstrap():
         """Remove bootstrap projects from old path, they'd be really stale by now."""
@@ -116,6 +524,15 @@ class LaunchStrategy:
 
     def __init__(self, config):
         self.config = config
+        self.class_data_sharing = False
+        """Whether to start the server with a class data sharing archive."""
+        self._manifest = None
+
+    def classpath_manifest(self, classpath):
+        """The :class:`ClasspathManifest` for a classpath, kept between calls."""
+        if self._manifest is None or self._manifest.classpath != classpath:
+            self._manifest = ClasspathManifest(classpath)
+        return self._manifest
 
     @abstractmethod
     def isinstalled(self):
@@ -131,6 +548,22 @@ class LaunchStrategy:
         """
         raise NotImplementedError
 
+    def start_install(self, on_output, on_exit):
+        """Starts installing ENSIME server if needed, without blocking for long.
+
+        Strategies installing with quick local checks finish before returning.
+
+        Args:
+            on_output (Callable[[str], None]): Called with installation output.
+            on_exit (Callable[[bool], None]): Called with whether installation
+                succeeded, once it's over.
+
+        Returns:
+            Optional[InstallJob]: The background installation, if any.
+        """
+        on_exit(self.install())
+        return None
+
     @abstractmethod
     def launch(self):
         """Launches a server instance for the configured project.
@@ -171,8 +604,18 @@ class LaunchStrategy:
         elif not os.access(java, os.X_OK):
             raise InvalidJavaPathError(errno.EACCES, 'Permission denied', java)
 
+        cds_flags = []
+        on_exit = None
+        if self.class_data_sharing:
+            cds_flags = class_data_sharing_flags(
+                self.config['java-home'], cache_dir, self.classpath_manifest(classpath))
+            if cds_flags and cds_flags[0].startswith(CDS_DUMP_FLAG):
+                dump = cds_flags[0][len(CDS_DUMP_FLAG):]
+                on_exit = lambda status: finish_archive_dump(dump, status)  # noqa: E731
+
         args = (
             [java, "-cp", (';' if iswindows else ':').join(classpath)] +
+            cds_flags +
             [a for a in java_flags if a] +
             ["-Densime.config={}".format(self.config.filepath),
              "org.ensime.server.Server"])
@@ -190,7 +633,8 @@ class LaunchStrategy:
             with catch(Exception):
                 os.remove(pid_path)
 
-        return EnsimeProcess(cache_dir, process, log_path, on_stop)
+        return EnsimeProcess(cache_dir, process, log_path, on_stop, on_exit=on_exit,
+                             exit_timeout=CDS_DUMP_GRACE if on_exit else 0)
 
 
 class AssemblyJar(LaunchStrategy):
@@ -208,6 +652,9 @@ class AssemblyJar(LaunchStrategy):
         self.toolsjar = os.path.join(config['java-home'], 'lib', 'tools.jar')
 
     def isinstalled(self):
+        # Once found, the jar is checked without scanning the directory again
+        if self.jar_path and os.path.isfile(self.jar_path):
+            return True
         if not os.path.exists(self.base_dir):
             return False
         scala_minor = self.config['scala-version'][:4]
@@ -242,7 +689,7 @@ class DotEnsimeLauncher(LaunchStrategy):
         self.classpath = server_jars + compiler_jars
 
     def isinstalled(self):
-        return all([os.path.exists(jar) for jar in self.classpath])
+        return self.classpath_manifest(self.classpath).verify()
 
     def install(self):
         # Nothing to do, the build tool has done it if we're in this strategy
@@ -285,7 +732,7 @@ class SbtBootstrap(LaunchStrategy):
             raise LaunchError('Bootstrap classpath file does not exist at {}'
                               .format(self.classpath_file))
 
-        classpath = Util.read_file(self.classpath_file) + ':' + self.toolsjar
+        classpath = Util.read_file(self.classpath_file).strip().split(':') + [self.toolsjar]
         return self._start_process(classpath)
 
     # TODO: should maybe check if the build.sbt matches spec (versions, etc.)
@@ -293,7 +740,19 @@ class SbtBootstrap(LaunchStrategy):
         return os.path.exists(self.classpath_file)
 
     def install(self):
-        """Installs ENSIME server with a bootstrap sbt project and generates its classpath."""
+        """Installs ENSIME server with a bootstrap sbt project and generates its classpath.
+
+        Blocks until sbt is done, see :meth:`start_install` to avoid that.
+        """
+        job = self.start_install(on_output=lambda line: None, on_exit=lambda success: None)
+        job.wait()
+        return job.succeeded
+
+    def start_install(self, on_output, on_exit):
+        """Runs sbt on a bootstrap project in the background to fetch ENSIME.
+
+        The resulting classpath is reordered on the job's thread too.
+        """
         project_dir = os.path.dirname(self.classpath_file)
         sbt_plugin = """addSbtPlugin("{0}" % "{1}" % "{2}")"""
 
@@ -309,47 +768,14 @@ class SbtBootstrap(LaunchStrategy):
             os.path.join(project_dir, "project", "plugins.sbt"),
             sbt_plugin.format(*self.SBT_COURSIER_COORDS))
 
-        # Synchronous update of the classpath via sbt
-        # see https://github.com/ensime/ensime-vim/issues/29
-        cd_cmd = "cd {}".format(project_dir)
-        sbt_cmd = "sbt -Dsbt.log.noformat=true -batch saveClasspath"
-
-        if int(self.vim.eval("has('nvim')")):
-            import tempfile
-            import re
-            tmp_dir = tempfile.gettempdir()
-            flag_file = "{}/ensime-vim-classpath.flag".format(tmp_dir)
-            self.vim.command("echo 'Waiting for generation of classpath...'")
-            if re.match(".+fish$", self.vim.eval("&shell")):
-                sbt_cmd += "; echo $status > {}".format(flag_file)
-                self.vim.command("terminal {}; and {}".format(cd_cmd, sbt_cmd))
-            else:
-                sbt_cmd += "; echo $? > {}".format(flag_file)
-                self.vim.command("terminal ({} && {})".format(cd_cmd, sbt_cmd))
-
-            # Block execution when sbt is run
-            waiting_for_flag = True
-            while waiting_for_flag:
-                waiting_for_flag = not os.path.isfile(flag_file)
-                if not waiting_for_flag:
-                    with open(flag_file, "r") as f:
-                        rtcode = f.readline()
-                    os.remove(flag_file)
-                    if rtcode and int(rtcode) != 0:  # error
-                        self.vim.command(
-                            "echo 'Something wrong happened, check the "
-                            "execution log...'")
-                        return None
-                else:
-                    time.sleep(0.2)
-        else:
-            self.vim.command("!({} && {})".format(cd_cmd, sbt_cmd))
-
-        success = self.reorder_classpath(self.classpath_file)
-        if not success:
-            self.vim.command("echo 'Classpath ordering failed.'")
+        def finish():
+            success = self.reorder_classpath(self.classpath_file)
+            if not success:
+                on_output('Classpath ordering failed.')
+            return success
 
-        return True
+        sbt_cmd = ["sbt", "-Dsbt.log.noformat=true", "-batch", "saveClasspath"]
+        return InstallJob(sbt_cmd, project_dir, on_output, on_exit, finish).start()
 
     def build_sbt(self):
         src = r"""
@@ -0,0 +1,120 @@
+# coding: utf-8
+
+"""
+Client log files, written on a background thread.
+
+Log calls on Vim's main thread only queue the record: unless it has mutable
+arguments, its message is formatted and written to the file by a listener
+thread. Long messages, such as requests
+carrying the contents of a file, are truncated to :data:`MAX_MESSAGE`
+characters and tagged with a hash of the whole, so identical payloads can
+still be matched up.
+
+Python 2 lacks queue handlers, so there the file is written synchronously.
+"""
+
+import logging
+import os
+from logging.handlers import RotatingFileHandler
+
+from .config import LOG_FORMAT
+from .util import MAX_MESSAGE, truncate
+
+try:
+    from logging.handlers import QueueHandler, QueueListener
+except ImportError:  # Python 2
+    QueueHandler = QueueListener = None
+
+if QueueHandler:
+    from queue import Queue
+
+MAX_BYTES = 10 * 1024 * 1024
+"""Size of a log file at which it's rotated."""
+
+
+class TruncatingFormatter(logging.Formatter):
+    """Formatter cutting messages longer than ``max_message`` characters.
+
+    Args:
+        fmt (str): The format of records.
+        max_message (Optional[int]): Most characters of a message, ``None``
+            for no limit.
+    """
+
+    def __init__(self, fmt, max_message=MAX_MESSAGE):
+        super(TruncatingFormatter, self).__init__(fmt)
+        self.max_message = max_message
+
+    def format(self, record):
+        message = record.getMessage()
+        if self.max_message and len(message) > self.max_message:
+            record = logging.makeLogRecord(dict(
+                record.__dict__, msg=truncate(message, self.max_message), args=None))
+        return super(TruncatingFormatter, self).format(record)
+
+
+IMMUTABLE_ARGS = (str, bytes, int, float, type(None))
+"""Types of log arguments that can be formatted later, on another thread."""
+
+
+if QueueHandler:
+    class DeferringQueueHandler(QueueHandler):
+        """Queues records as they are, leaving formatting to the listener.
+
+        The standard handler formats the message before queuing it, on the
+        logging thread. That's only done here for records with arguments that
+        could change before the listener formats them, such as payloads.
+        """
+
+        def prepare(self, record):
+            args = record.args
+            if args and not (isinstance(args, tuple)
+                             and all(isinstance(arg, IMMUTABLE_ARGS) for arg in args)):
+                record = logging.makeLogRecord(dict(
+                    record.__dict__, msg=record.getMessage(), args=None))
+            return record
+
+
+class FileLog(object):
+    """A rotating log file for a logger.
+
+    The file is rotated when it reaches :data:`MAX_BYTES`, and when opened so
+    that the previous session's log is kept as ``<path>.1``.
+
+    Args:
+        logger (logging.Logger): Logger to write to the file.
+        path (str): Path of the file.
+        max_message (Optional[int]): Most characters of a message, ``None``
+            for no limit.
+    """
+
+    def __init__(self, logger, path, max_message=MAX_MESSAGE):
+        self.logger = logger
+        self._file_handler = RotatingFileHandler(path, maxBytes=MAX_BYTES, backupCount=1)
+        if os.path.getsize(path):
+            self._file_handler.doRollover()
+        self._file_handler.setFormatter(TruncatingFormatter(LOG_FORMAT, max_message))
+
+        if QueueHandler:
+            queue = Queue()
+            self.handler = DeferringQueueHandler(queue)
+            self._listener = QueueListener(queue, self._file_handler)
+            self._listener.start()
+        else:
+            self.handler = self._file_handler
+            self._listener = None
+        logger.addHandler(self.handler)
+
+    def close(self):
+        """Write out queued records and close the file.
+
+        Records logged later, e.g. by threads winding down, are dropped.
+        """
+        # Without any handler, warnings would go to stderr, over Vim's screen
+        self.logger.removeHandler(self.handler)
+        if not self.logger.handlers:
+            self.logger.addHandler(logging.NullHandler())
+        if self._listener:
+            self._listener.stop()
+            self._listener = None
+        self._file_handler.close()
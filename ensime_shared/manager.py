@@ -0,0 +1,118 @@
+# coding: utf-8
+
+import time
+from collections import OrderedDict
+
+from ensime_shared.monitor import MIB
+
+
+class ClientManager(object):
+    """Live :class:`EnsimeClient` instances, keyed by project config path.
+
+    Each client has its own server JVM, so with many projects touched in a
+    session memory runs out. The manager keeps clients in order of use, and
+    while there are more servers than ``max_servers`` or their total resident
+    memory exceeds ``max_rss`` MiB, it evicts the least recently used client
+    that's idle: its connection is closed and its server stopped. An evicted
+    project gets a new client and server when it's next used, as any other.
+
+    Limits of 0 mean unlimited.
+
+    Attributes:
+        evictions (int): Count of clients evicted.
+        relaunches (int): Count of evicted projects that got a new client.
+    """
+
+    check_interval = 30
+    """Seconds between checks of server memory while ticking."""
+
+    def __init__(self, max_servers=0, max_rss=0):
+        self.max_servers = max_servers
+        self.max_rss = max_rss
+        self.evictions = 0
+        self.relaunches = 0
+        self._clients = OrderedDict()
+        self._evicted = set()
+        self._next_check = 0
+
+    def __contains__(self, path):
+        return path in self._clients
+
+    def __len__(self):
+        return len(self._clients)
+
+    def get(self, path):
+        """Get the client for a project without counting it as a use."""
+        return self._clients.get(path)
+
+    def values(self):
+        return list(self._clients.values())
+
+    def items(self):
+        return list(self._clients.items())
+
+    def use(self, path):
+        """Get the client for a project, marking it most recently used."""
+        client = self._clients.pop(path)
+        self._clients[path] = client
+        return client
+
+    def add(self, path, client):
+        """Add a project's client as the most recently used, then evict others
+        as needed to respect the limits."""
+        if path in self._evicted:
+            self._evicted.discard(path)
+            self.relaunches += 1
+        self._clients.pop(path, None)
+        self._clients[path] = client
+        self.enforce_limits()
+
+    def clear(self):
+        self._clients.clear()
+
+    def enforce_limits(self):
+        """Evict idle clients, least recently used first, until within limits.
+
+        The most recently used client is never evicted.
+        """
+        self._next_check = time.time() + self.check_interval
+        while self._over_limits():
+            victim = next((path for path, client in list(self._clients.items())[:-1]
+                           if self._is_idle(client)), None)
+            if victim is None:
+                break
+            self.evict(victim)
+
+    def check(self):
+        """Like :meth:`enforce_limits`, but at most every ``check_interval`` s."""
+        if time.time() >= self._next_check:
+            self.enforce_limits()
+
+    def evict(self, path):
+        """Tear down a project's client, stopping its server."""
+        client = self._clients.pop(path)
+        client.log.info('Evicting client to free resources')
+        client.teardown()
+        self._evicted.add(path)
+        self.evictions += 1
+
+    def total_rss(self):
+        """int: Resident memory in bytes of the servers, where known."""
+        return sum(client.ensime.rss() or 0
+                   for client in self._clients.values() if client.ensime)
+
+    def stats(self):
+        """str: Limits and eviction counts, for reporting."""
+        return "servers: {}/{} memory: {}/{} MiB, evictions: {}, relaunches: {}".format(
+            len(self._clients), self.max_servers or 'unlimited',
+            self.total_rss() // MIB, self.max_rss or 'unlimited',
+            self.evictions, self.relaunches)
+
+    def _over_limits(self):
+        if self.max_servers and len(self._clients) > self.max_servers:
+            return True
+        return bool(self.max_rss) and self.total_rss() > self.max_rss * MIB
+
+    @staticmethod
+    def _is_idle(client):
+        return not (client.is_busy() or client.install_job or client.debug_thread_id)
@@ -0,0 +1,120 @@
+# coding: utf-8
+
+"""
+Memory profiling with :mod:`tracemalloc`, to track down growth in long
+sessions.
+
+Tracing is started on demand, as it slows down allocation and costs memory of
+its own. Each snapshot is kept as the baseline for the next diff, which shows
+the allocation sites that grew the most in between.
+
+Python 2 lacks tracemalloc, so there only container sizes are reported.
+"""
+
+import os
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+FRAMES = 1
+"""Frames of traceback kept per allocation, only the innermost is reported."""
+
+TOP_SITES = 15
+"""Allocation sites in a report."""
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class MemoryProfiler(object):
+    """Snapshots of memory allocated from Python, and diffs between them."""
+
+    def __init__(self):
+        self._baseline = None
+
+    @property
+    def available(self):
+        """bool: Whether tracemalloc is available."""
+        return tracemalloc is not None
+
+    @property
+    def tracing(self):
+        """bool: Whether allocations are being traced."""
+        return self.available and tracemalloc.is_tracing()
+
+    def start(self, frames=FRAMES):
+        """Start tracing allocations, dropping any baseline."""
+        if not self.tracing:
+            tracemalloc.start(frames)
+        self._baseline = None
+
+    def stop(self):
+        """Stop tracing allocations, freeing the memory used for it."""
+        if self.tracing:
+            tracemalloc.stop()
+        self._baseline = None
+
+    def snapshot(self, limit=TOP_SITES):
+        """Take a snapshot, kept as the baseline for :meth:`diff`.
+
+        Returns:
+            list: Lines of a report of the sites holding the most memory.
+        """
+        self._baseline = self._take()
+        stats = self._baseline.statistics('lineno')
+        lines = [_row('size KiB', 'blocks', 'allocation site')]
+        lines.extend(_row(_kib(s.size), s.count, _site(s.traceback)) for s in stats[:limit])
+        return lines
+
+    def diff(self, limit=TOP_SITES):
+        """Take a snapshot and compare it to the baseline, which it replaces.
+
+        Returns:
+            list: Lines of a report of the sites that grew the most.
+        """
+        if self._baseline is None:
+            return self.snapshot(limit)
+
+        snapshot = self._take()
+        stats = snapshot.compare_to(self._baseline, 'lineno')
+        self._baseline = snapshot
+        lines = [_row('+KiB', '+blocks', 'allocation site')]
+        lines.extend(_row(_kib(s.size_diff, sign=True), '{:+d}'.format(s.count_diff),
+                          _site(s.traceback))
+                     for s in stats[:limit] if s.size_diff)
+        return lines
+
+    def _take(self):
+        # Leave out allocations by tracemalloc and the import machinery
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+            tracemalloc.Filter(False, '<unknown>'),
+        ))
+
+
+def container_report(name, sizes):
+    """Lines listing the sizes of a client's containers.
+
+    Args:
+        name (str): Name of the client.
+        sizes (Iterable[Tuple[str, int]]): Name and size of each container.
+    """
+    return [name] + ['  {:<32} {:>8}'.format(container, size) for container, size in sizes]
+
+
+def _row(size, count, site):
+    return '{:>10} {:>8}  {}'.format(size, count, site)
+
+
+def _kib(size, sign=False):
+    return ('{:+.1f}' if sign else '{:.1f}').format(size / 1024.0)
+
+
+def _site(traceback):
+    frame = traceback[0]
+    filename = frame.filename
+    if filename.startswith(PACKAGE_DIR + os.sep):
+        filename = os.path.relpath(filename, PACKAGE_DIR)
+    return '{}:{}'.format(filename, frame.lineno)
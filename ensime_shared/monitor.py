@@ -0,0 +1,149 @@
+# coding: utf-8
+
+"""
+Sampling of ENSIME server resource use, to notice servers in trouble.
+
+Memory and CPU are read from ``/proc``, so they're only known on Linux. The
+server log is scanned for signs of memory exhaustion on every platform.
+"""
+
+import os
+import time
+from collections import namedtuple
+
+MIB = 1024 * 1024
+
+OOM_MARKER = 'java.lang.OutOfMemoryError'
+GC_THRASH_MARKER = 'GC overhead limit exceeded'
+
+Sample = namedtuple('Sample', ['time', 'rss', 'cpu', 'oom_errors', 'gc_thrash'])
+"""A measurement of a server.
+
+Fields:
+    time (float): When it was taken.
+    rss (Optional[int]): Resident memory in bytes.
+    cpu (Optional[float]): CPU use since the previous sample, in percent of one
+        core.
+    oom_errors (int): ``OutOfMemoryError`` reports logged since the previous
+        sample.
+    gc_thrash (int): GC overhead limit reports logged since the previous sample.
+"""
+
+
+def cpu_seconds(pid):
+    """User plus system CPU time used by a process, ``None`` if unknown."""
+    try:
+        with open('/proc/{}/stat'.format(pid)) as f:
+            stat = f.read()
+    except (IOError, OSError):
+        return None
+    # Fields after the parenthesized command name, which may contain spaces,
+    # start at the 3rd: utime and stime are the 14th and 15th.
+    fields = stat.rsplit(')', 1)[-1].split()
+    try:
+        ticks = int(fields[11]) + int(fields[12])
+    except (IndexError, ValueError):
+        return None
+    return ticks / float(os.sysconf('SC_CLK_TCK'))
+
+
+class ResourceMonitor(object):
+    """Samples a server's memory and CPU use, and scans its log for trouble.
+
+    Args:
+        process (EnsimeProcess): The server to monitor.
+        interval (float): Least seconds between samples taken by :meth:`poll`.
+
+    Attributes:
+        last (Optional[Sample]): The latest sample.
+        peak_rss (int): Most resident memory seen, in bytes.
+        oom_errors (int): ``OutOfMemoryError`` reports seen in the log.
+        gc_thrash (int): GC overhead limit reports seen in the log.
+    """
+
+    max_log_read = MIB
+    """Most bytes of new log output scanned per sample, the rest is skipped."""
+
+    def __init__(self, process, interval=10):
+        self.process = process
+        self.interval = interval
+        self.last = None
+        self.peak_rss = 0
+        self.oom_errors = 0
+        self.gc_thrash = 0
+        self._next_sample = 0
+        self._cpu = (time.time(), cpu_seconds(process.pid))
+        # Only reports from now on matter, an attached server's log has history
+        self._log_offset = self._log_size()
+
+    def poll(self):
+        """Take a sample if ``interval`` seconds passed since the last one.
+
+        Returns:
+            Optional[Sample]: The new sample, if one was taken.
+        """
+        now = time.time()
+        if now < self._next_sample:
+            return None
+        self._next_sample = now + self.interval
+        return self.sample()
+
+    def sample(self):
+        """Take a sample now.
+
+        Returns:
+            Sample: The new sample, also kept as :attr:`last`.
+        """
+        now = time.time()
+        rss = self.process.rss()
+        if rss:
+            self.peak_rss = max(self.peak_rss, rss)
+
+        cpu = None
+        seconds = cpu_seconds(self.process.pid)
+        then, previous = self._cpu
+        if seconds is not None and previous is not None and now > then:
+            cpu = 100 * (seconds - previous) / (now - then)
+        self._cpu = (now, seconds)
+
+        oom_errors, gc_thrash = self._scan_log()
+        self.oom_errors += oom_errors
+        self.gc_thrash += gc_thrash
+
+        self.last = Sample(now, rss, cpu, oom_errors, gc_thrash)
+        return self.last
+
+    def _log_size(self):
+        try:
+            return os.path.getsize(self.process.log_path)
+        except (OSError, TypeError):
+            return 0
+
+    def _scan_log(self):
+        size = self._log_size()
+        if size < self._log_offset:
+            # Truncated, by a new server writing to it
+            self._log_offset = 0
+        if size == self._log_offset:
+            return 0, 0
+
+        start = max(self._log_offset, size - self.max_log_read)
+        try:
+            with open(self.process.log_path, 'rb') as log:
+                log.seek(start)
+                chunk = log.read(size - start)
+        except (IOError, OSError):
+            return 0, 0
+        # A marker split between two reads is missed, fine for a recurring symptom
+        self._log_offset = start + len(chunk)
+        return (chunk.count(OOM_MARKER.encode('ascii')),
+                chunk.count(GC_THRASH_MARKER.encode('ascii')))
+
+    def __str__(self):
+        sample = self.last
+        if not sample:
+            return "no samples"
+        rss = '?' if sample.rss is None else sample.rss // MIB
+        cpu = '?' if sample.cpu is None else '{:.0f}'.format(sample.cpu)
+        return "rss={}MiB peak={}MiB cpu={}% oom={} gc-thrash={}".format(
+            rss, self.peak_rss // MIB, cpu, self.oom_errors, self.gc_thrash)
@@ -1,9 +1,9 @@
 # coding: utf-8
 
-import webbrowser
 from operator import itemgetter
 
 from .config import feedback, gconfig
+from .inspector import PackageTree
 from .symbol_format import completion_to_suggest
 from .util import catch, Pretty
 
@@ -45,6 +45,7 @@ class ProtocolHandler(object):
         self.handlers["ImportSuggestions"] = self.handle_import_suggestions
         self.handlers["PackageInfo"] = self.handle_package_info
         self.handlers["FalseResponse"] = self.handle_false_response
+        self.handlers["ConnectionInfo"] = self.handle_connection_info
 
     def handle_incoming_response(self, call_id, payload):
         """Get a registered handler for a given response and execute it."""
@@ -103,6 +104,9 @@ class ProtocolHandler(object):
     def handle_false_response(self, call_id, payload):
         raise NotImplementedError()
 
+    def handle_connection_info(self, call_id, payload):
+        raise NotImplementedError()
+
 
 class ProtocolHandlerV1(ProtocolHandler):
     """Implements response handlers for the v1 ENSIME Jerky protocol."""
@@ -112,6 +116,7 @@ class ProtocolHandlerV1(ProtocolHandler):
 
     def handle_analyzer_ready(self, call_id, payload):
         self.editor.message("analyzer_ready")
+        self.restore_session()
 
     def handle_debug_vm_error(self, call_id, payload):
         self.editor.raw_message('Error. Check ensime-vim log for details.')
@@ -124,6 +129,23 @@ class ProtocolHandlerV1(ProtocolHandler):
         else:
             self.editor.message('false_response')
 
+    def handle_connection_info(self, call_id, payload):
+        """Handler for ``ConnectionInfo``, verifying we're talking to ENSIME.
+
+        This is especially important when attaching to a server discovered
+        from files in the cache directory, which may be stale.
+        """
+        implementation = payload.get("implementation", {}).get("name")
+        if implementation != "ENSIME":
+            self.log.error('Unexpected server implementation: %s', Pretty(payload))
+            self.teardown()
+            self._display_ws_warning()
+            return
+
+        self.connection_info = payload
+        self.log.info('Connected to %s server, protocol version %s',
+                      implementation, payload.get("version"))
+
     def handle_import_suggestions(self, call_id, payload):
         imports = list()
         for suggestions in payload['symLists']:
@@ -140,25 +162,18 @@ class ProtocolHandlerV1(ProtocolHandler):
             self.add_import(choice)
 
     def handle_package_info(self, call_id, payload):
-        package = payload["fullName"]
-
-        def add(member, indentLevel):
-            indent = "  " * indentLevel
-            t = member["declAs"]["typehint"] if member["typehint"] == "BasicTypeInfo" else ""
-            line = "{}{}: {}".format(indent, t, member["name"])
-            self.editor.append(line)
-            if indentLevel < 4:
-                for m in member["members"]:
-                    add(m, indentLevel + 1)
+        tree = PackageTree(payload)
 
         # Create a new buffer 45 columns wide
         opts = {'buftype': 'nofile', 'bufhidden': 'wipe', 'buflisted': False,
-                'filetype': 'package_info', 'swapfile': False}
+                'filetype': 'package_info', 'swapfile': False, 'modifiable': False}
         self.editor.split_window('package_info', vertical=True, size=45, bufopts=opts)
 
-        self.editor.append(str(package))
-        for member in payload["members"]:
-            add(member, 1)
+        # Inspectors are wiped out once hidden, their trees can go
+        self.package_trees = {bufnr: t for bufnr, t in self.package_trees.items()
+                              if self.editor.buffer_exists(bufnr)}
+        self.package_trees[self.editor.bufnr()] = tree
+        self.editor.set_lines(tree.lines())
 
     def handle_symbol_search(self, call_id, payload):
         """Handler for symbol search results"""
@@ -189,15 +204,17 @@ class ProtocolHandlerV1(ProtocolHandler):
 
             open_definition = call_options.get("open_definition")
             if open_definition and f:
-                self.editor.clean_errors()
-                self.editor.doautocmd('BufLeave')
-                if call_options.get("split"):
-                    vert = call_options.get("vert")
-                    self.editor.split_window(f, vertical=vert)
-                else:
-                    self.editor.edit(f)
-                self.editor.doautocmd('BufReadPre', 'BufRead', 'BufEnter')
-                self.set_position(decl_pos)
+                # In a single round trip to Neovim
+                with self.editor.batch():
+                    self.editor.clean_errors()
+                    self.editor.doautocmd('BufLeave')
+                    if call_options.get("split"):
+                        vert = call_options.get("vert")
+                        self.editor.split_window(f, vertical=vert)
+                    else:
+                        self.editor.edit(f)
+                    self.editor.doautocmd('BufReadPre', 'BufRead', 'BufEnter')
+                    self.set_position(decl_pos)
                 del self.call_options[call_id]
 
     def handle_string_response(self, call_id, payload):
@@ -226,6 +243,8 @@ class ProtocolHandlerV1(ProtocolHandler):
             return url
 
     def _browse_doc(self, url):
+        import webbrowser  # Slow to import, and seldom used
+
         self.log.debug('_browse_doc: %s', url)
         try:
             if webbrowser.open(url):
@@ -0,0 +1,105 @@
+# coding: utf-8
+
+"""
+Recording of the traffic between a client and its server.
+
+A recording is a JSON Lines file. The first line is a header naming the
+protocol, each following line is a message with the seconds elapsed since the
+recording started, its direction and its text::
+
+    {"recording": 1, "protocol": "v2", "started": 1500000000.0}
+    {"t": 0.0012, "dir": "out", "data": "{\\"callId\\": 0, ...}"}
+    {"t": 0.0874, "dir": "in", "data": "{\\"callId\\": 0, ...}"}
+
+See ``benchmarks/replay.py`` to play one back.
+"""
+
+import json
+import os
+import threading
+import time
+
+FORMAT_VERSION = 1
+
+OUTGOING = 'out'
+INCOMING = 'in'
+
+# Python 2 has no monotonic clock, wall time is fine for a short session
+clock = getattr(time, 'monotonic', time.time)
+
+
+class TrafficRecorder(object):
+    """Appends every message sent and received to a recording file.
+
+    Safe to use from multiple threads: messages are received on the poller
+    thread and sent from the main one. Writes are buffered and flushed at most
+    every ``flush_interval`` seconds, and on :meth:`close`.
+
+    Args:
+        path (str): Path of the recording, truncated if it exists.
+        protocol (str): Version of the server protocol, ``v1`` or ``v2``.
+    """
+
+    flush_interval = 1.0
+
+    def __init__(self, path, protocol):
+        self.path = path
+        self._file = open(path, 'w')
+        self._lock = threading.Lock()
+        self._start = clock()
+        self._next_flush = self._start + self.flush_interval
+        header = {'recording': FORMAT_VERSION, 'protocol': protocol,
+                  'started': time.time()}
+        self._file.write(json.dumps(header) + '\n')
+
+    @classmethod
+    def in_directory(cls, directory, protocol):
+        """Create a recorder writing to a new timestamped file in ``directory``."""
+        name = time.strftime('traffic-%Y%m%d-%H%M%S.jsonl')
+        return cls(os.path.join(directory, name), protocol)
+
+    def sent(self, data):
+        """Record a message sent to the server."""
+        self._record(OUTGOING, data)
+
+    def received(self, data):
+        """Record a frame received from the server."""
+        self._record(INCOMING, data)
+
+    def _record(self, direction, data):
+        now = clock()
+        line = json.dumps({'t': round(now - self._start, 6), 'dir': direction,
+                           'data': data})
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line + '\n')
+            if now >= self._next_flush:
+                self._file.flush()
+                self._next_flush = now + self.flush_interval
+
+    def close(self):
+        with self._lock:
+            f, self._file = self._file, None
+        if f is not None:
+            f.close()
+
+
+def read_recording(path):
+    """Read a recording.
+
+    Returns:
+        (dict, list): The header, and the messages as dicts with keys ``t``,
+        ``dir`` and ``data``, in the order they were recorded.
+
+    Raises:
+        ValueError: If the file isn't a recording this version can read.
+    """
+    with open(path) as f:
+        lines = [line for line in f if line.strip()]
+    if not lines:
+        raise ValueError('{}: empty recording'.format(path))
+    header = json.loads(lines[0])
+    if header.get('recording') != FORMAT_VERSION:
+        raise ValueError('{}: not a version {} recording'.format(path, FORMAT_VERSION))
+    return header, [json.loads(line) for line in lines[1:]]
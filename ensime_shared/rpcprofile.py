@@ -0,0 +1,161 @@
+# coding: utf-8
+
+"""
+Accounting of calls to the Vim API, per plugin entry point.
+
+Under Neovim each call is a round trip to the editor, and even under Vim they
+add up in chatty code paths. While profiling, the plugin talks to Vim through
+a :class:`ProfilingProxy` that times every call, attribute access and item
+access on the ``vim`` object and the objects reached from it. Calls are
+attributed to the outermost :meth:`RpcProfiler.entry` they happen in, such as
+a command or the tick.
+"""
+
+import threading
+import time
+import types
+from contextlib import contextmanager
+
+# Values of exactly these types are plain data, not handles to Vim objects
+PLAIN_TYPES = (type(None), bool, int, float, type(u''), bytes, list, tuple, dict)
+
+# Getting one of these isn't a call to Vim, calling it is
+ROUTINE_TYPES = (types.BuiltinFunctionType, types.FunctionType, types.MethodType)
+
+NO_ENTRY = '(other)'
+"""Entry point of calls made outside of any."""
+
+
+class RpcProfiler(object):
+    """Counts and times calls to the Vim API, per entry point.
+
+    Attributes:
+        enabled (bool): Whether the plugin is using a :class:`ProfilingProxy`.
+        calls (dict): ``[count, seconds]`` by ``(entry point, kind of call)``.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.calls = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def entry(self, name):
+        """Attribute calls made within to the entry point ``name``, unless
+        already within another entry point."""
+        outer = getattr(self._local, 'entry', None)
+        if outer is None:
+            self._local.entry = name
+        try:
+            yield
+        finally:
+            if outer is None:
+                self._local.entry = None
+
+    def record(self, kind, seconds):
+        key = (getattr(self._local, 'entry', None) or NO_ENTRY, kind)
+        with self._lock:
+            stats = self.calls.get(key)
+            if stats is None:
+                self.calls[key] = [1, seconds]
+            else:
+                stats[0] += 1
+                stats[1] += seconds
+
+    def reset(self):
+        with self._lock:
+            self.calls.clear()
+
+    def report(self):
+        """Lines of a table of calls per entry point and kind, the entry points
+        and kinds taking the most time first."""
+        with self._lock:
+            calls = dict((key, list(stats)) for key, stats in self.calls.items())
+        if not calls:
+            return ['No Vim API calls recorded']
+
+        totals = {}
+        for (entry, _), (count, seconds) in calls.items():
+            total = totals.setdefault(entry, [0, 0.0])
+            total[0] += count
+            total[1] += seconds
+
+        row = '{:<36} {:>8} {:>10} {:>10}'
+        lines = [row.format('entry point / call', 'calls', 'total ms', 'mean us')]
+        for entry in sorted(totals, key=lambda e: -totals[e][1]):
+            count, seconds = totals[entry]
+            lines.append(row.format(entry, count, '{:.1f}'.format(seconds * 1e3),
+                                    '{:.0f}'.format(seconds / count * 1e6)))
+            kinds = sorted(((kind, stats) for (e, kind), stats in calls.items() if e == entry),
+                           key=lambda item: -item[1][1])
+            for kind, (count, seconds) in kinds:
+                lines.append(row.format('  ' + kind, count, '{:.1f}'.format(seconds * 1e3),
+                                        '{:.0f}'.format(seconds / count * 1e6)))
+        return lines
+
+
+class ProfilingProxy(object):
+    """Stands in for a Vim API object, recording each use in a profiler.
+
+    Args:
+        target: The object to stand in for, e.g. the ``vim`` module.
+        profiler (RpcProfiler): Where to record uses.
+        path (str): Name of the object in records, e.g. ``vim.current``.
+    """
+
+    def __init__(self, target, profiler, path='vim'):
+        object.__setattr__(self, '_target', target)
+        object.__setattr__(self, '_profiler', profiler)
+        object.__setattr__(self, '_path', path)
+
+    def _timed(self, kind, func, *args):
+        start = time.time()
+        try:
+            return func(*args)
+        finally:
+            self._profiler.record(kind, time.time() - start)
+
+    def _wrap(self, value, path):
+        if type(value) in PLAIN_TYPES:
+            return value
+        return ProfilingProxy(value, self._profiler, path)
+
+    def __getattr__(self, name):
+        path = self._path + '.' + name
+        start = time.time()
+        value = getattr(self._target, name)
+        if not isinstance(value, ROUTINE_TYPES):
+            self._profiler.record(path, time.time() - start)
+        return self._wrap(value, path)
+
+    def __call__(self, *args, **kwargs):
+        path = self._path + '()'
+        start = time.time()
+        try:
+            result = self._target(*args, **kwargs)
+        finally:
+            self._profiler.record(path, time.time() - start)
+        return self._wrap(result, path)
+
+    def __setattr__(self, name, value):
+        self._timed(self._path + '.' + name + ' =', setattr, self._target, name, value)
+
+    def __getitem__(self, key):
+        path = self._path + '[]'
+        return self._wrap(self._timed(path, self._target.__getitem__, key), path)
+
+    def __setitem__(self, key, value):
+        self._timed(self._path + '[] =', self._target.__setitem__, key, value)
+
+    def __delitem__(self, key):
+        self._timed(self._path + '[] del', self._target.__delitem__, key)
+
+    def __contains__(self, item):
+        return self._timed(self._path + ' in', self._target.__contains__, item)
+
+    def __len__(self):
+        return self._timed(self._path + ' len', len, self._target)
+
+    def __iter__(self):
+        return iter(self._timed(self._path + ' iter', list, self._target))
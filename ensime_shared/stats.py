@@ -0,0 +1,168 @@
+# coding: utf-8
+
+"""
+Lightweight runtime statistics for reporting where the plugin spends time.
+"""
+
+import math
+
+
+class RunningStats(object):
+    """Count, total, mean and maximum of a series of durations in seconds."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def add(self, value):
+        """Record one measurement."""
+        self.count += 1
+        self.total += value
+        self.last = value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def mean(self):
+        """float: Mean of recorded values, 0 if there are none."""
+        return self.total / self.count if self.count else 0.0
+
+    def __str__(self):
+        return "n={} mean={:.1f}ms max={:.1f}ms last={:.1f}ms".format(
+            self.count, self.mean * 1000, self.max * 1000, self.last * 1000)
+
+
+class Histogram(object):
+    """Counts of durations in logarithmic buckets, in the manner of HdrHistogram.
+
+    Bucket bounds grow by a factor of ``2 ** (1 / resolution)``, so memory is
+    bounded while percentiles keep a relative precision of a few percent
+    across any range of values.
+
+    Args:
+        resolution (int): Buckets per doubling of the duration.
+        unit (float): Smallest duration told apart, in seconds.
+    """
+
+    def __init__(self, resolution=16, unit=1e-6):
+        self.resolution = resolution
+        self.unit = unit
+        self.count = 0
+        self.max = 0.0
+        self._buckets = {}
+
+    def add(self, value):
+        """Record a duration in seconds."""
+        self.count += 1
+        if value > self.max:
+            self.max = value
+        index = 0
+        if value > self.unit:
+            index = int(math.ceil(math.log(value / self.unit, 2) * self.resolution))
+        self._buckets[index] = self._buckets.get(index, 0) + 1
+
+    def percentile(self, percent):
+        """Upper bound of the given percentile of recorded durations, 0 if none."""
+        if not self.count:
+            return 0.0
+        rank = percent / 100.0 * self.count
+        seen = 0
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+            if seen >= rank:
+                break
+        return min(self.unit * 2 ** (float(index) / self.resolution), self.max)
+
+
+class RequestStats(object):
+    """Latency of requests to the server, broken down per request type.
+
+    A request's life is split in phases, each with a :class:`Histogram`:
+
+    ``network``
+        From sending the request to its reply being received by the poller
+        thread: the server's work and the transport.
+    ``queue``
+        From receipt to the main thread picking the reply up.
+    ``handling``
+        Running the reply's handler on the main thread, mostly editor calls.
+
+    Events, messages the server sends unprompted, have no ``network`` phase.
+    """
+    PHASES = ('network', 'queue', 'handling')
+
+    def __init__(self):
+        self.requests = {}
+        """Mapping of request typehint to a mapping of phase to Histogram."""
+        self.events = {}
+        """Mapping of event typehint to a mapping of phase to Histogram."""
+        self._sent = {}
+
+    def sent(self, call_id, typehint, when):
+        """Record a request being sent."""
+        self._sent[call_id] = (typehint, when)
+
+    def forget(self, call_id):
+        """Stop waiting for the reply to a request."""
+        self._sent.pop(call_id, None)
+
+    def forget_all(self):
+        """Stop waiting for the replies to all requests."""
+        self._sent.clear()
+
+    @property
+    def pending(self):
+        """int: Count of requests sent and awaiting a reply."""
+        return len(self._sent)
+
+    def handled(self, call_id, typehint, received, started, finished):
+        """Record the handling of a message from the server.
+
+        Args:
+            call_id (Optional[int]): Of the request replied to, ``None`` for
+                an event.
+            typehint (str): Of the message, used for events.
+            received (float): When the poller thread received the message.
+            started (float): When handling started on the main thread.
+            finished (float): When handling finished.
+        """
+        if call_id is None:
+            phases = self._phases(self.events, typehint)
+        else:
+            request = self._sent.pop(call_id, None)
+            if request is None:
+                return  # A second reply, or a request we gave up on
+            request_typehint, sent = request
+            phases = self._phases(self.requests, request_typehint)
+            phases['network'].add(received - sent)
+        phases['queue'].add(started - received)
+        phases['handling'].add(finished - started)
+
+    def _phases(self, table, typehint):
+        phases = table.get(typehint)
+        if phases is None:
+            phases = table[typehint] = dict((phase, Histogram()) for phase in self.PHASES)
+        return phases
+
+    def report(self):
+        """Lines of a table of p50/p95/p99 milliseconds per type and phase."""
+        lines = ["{:<28} {:>6}  {:<22} {:<22} {:<22}".format(
+            'type', 'count', 'network p50/p95/p99', 'queue p50/p95/p99',
+            'handling p50/p95/p99')]
+        for title, table in (('requests', self.requests), ('events', self.events)):
+            if table:
+                lines.append('{}:'.format(title))
+            for typehint in sorted(table):
+                phases = table[typehint]
+                columns = [self._percentiles(phases[phase]) for phase in self.PHASES]
+                lines.append("{:<28} {:>6}  {:<22} {:<22} {:<22}".format(
+                    typehint, phases['handling'].count, *columns))
+        return lines
+
+    @staticmethod
+    def _percentiles(histogram):
+        if not histogram.count:
+            return '-'
+        return '/'.join('{:.1f}'.format(histogram.percentile(p) * 1000) for p in (50, 95, 99))
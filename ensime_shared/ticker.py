@@ -1,36 +1,101 @@
-REFRESH_TIMER = 1000
+import threading
+
+# Tick intervals in milliseconds. While there are calls in flight or messages
+# waiting to be handled we tick fast; when idle we back off exponentially.
+TICK_BUSY = 20
+TICK_IDLE_MIN = 250
+TICK_IDLE_MAX = 4000
+# Under Vim, messages arriving while idle can't bring the next tick forward,
+# so they may wait this long
+TICK_IDLE_MAX_VIM = 1000
 
 
 class Ticker(object):
+    """Drives periodic ``EnTick`` calls with an adaptive interval.
+
+    Rather than firing at a fixed rate forever, each tick schedules the next
+    one with a one-shot timer: fast while any client is busy, backing off
+    towards ``TICK_IDLE_MAX`` while everything is quiet. :meth:`wakeup` lets
+    client threads request a prompt tick when something arrives.
+    """
 
     def __init__(self, _vim):
         self._vim = _vim
+        self._main_thread = threading.current_thread()
         self.has_timers = bool(int(self._vim.eval("has('timers')")))
+        self.isneovim = bool(int(self._vim.eval("has('nvim')")))
+        self.interval = TICK_IDLE_MIN
 
         if self.has_timers:
             self._timer = None
             self._start_refresh_timer()
 
     def tick(self, client):
+        """Tick a client, displaying its messages only in Scala and Java buffers.
+
+        Returns:
+            bool: Whether the client's messages were displayed, otherwise they
+            are left queued for a later tick.
+        """
         filename = client.editor.path()
+        display = client.editor.is_buffer_ensime_compatible()
+        client.tick(filename, display=display)
+        return display
 
-        # XXX is this necessary ?
-        if not client.editor.is_buffer_ensime_compatible():
-            return
+    def reschedule(self, busy):
+        """Schedule the next tick, given whether any client is still busy."""
+        if busy:
+            self.interval = TICK_BUSY
+        else:
+            idle_max = TICK_IDLE_MAX if self.isneovim else TICK_IDLE_MAX_VIM
+            self.interval = min(max(self.interval * 2, TICK_IDLE_MIN), idle_max)
 
-        client.tick(filename)
+        if self.has_timers:
+            self._start_refresh_timer()
+        else:
+            self._repeat_cursor_hold(busy)
 
+    def unscheduled(self, busy):
+        """Account for a tick outside the schedule, such as on cursor moves.
+
+        A pending timer is left alone, so that frequent events don't restart
+        it nor back off the interval, unless it's too slow for busy clients.
+        Without timers the cursor events are the schedule.
+        """
         if not self.has_timers:
-            self._repeat_cursor_hold()
+            self.reschedule(busy)
+        elif busy:
+            self._wakeup()
+
+    def wakeup(self):
+        """Request a prompt tick. Safe to call from any thread.
+
+        Vim's Python API must only be used from the main thread, so from other
+        threads under Vim this can't interrupt a pending timer -- the next tick
+        will notice the pending work and speed up from there.
+        """
+        if self.isneovim:
+            self._vim.async_call(self._wakeup)
+        elif threading.current_thread() is self._main_thread:
+            self._wakeup()
+
+    def _wakeup(self):
+        if self.interval > TICK_BUSY:
+            self.interval = TICK_BUSY
+            if self.has_timers:
+                self._start_refresh_timer()
 
-    def _repeat_cursor_hold(self):
-        self._vim.options['updatetime'] = REFRESH_TIMER
-        self._vim.command('call feedkeys("f\e")')
+    def _repeat_cursor_hold(self, busy):
+        self._vim.options['updatetime'] = self.interval
+        # Only simulate CursorHold while there's work to do, when idle the
+        # natural CursorHold/CursorMoved events are frequent enough.
+        if busy:
+            self._vim.command('call feedkeys("f\e")')
 
     def _start_refresh_timer(self):
-        """Start the Vim timer. """
-        if not self._timer:
-            self._timer = self._vim.eval(
-                "timer_start({}, 'EnTick', {{'repeat': -1}})"
-                .format(REFRESH_TIMER)
-            )
+        """(Re)start the one-shot Vim timer for the next tick."""
+        if self._timer:
+            self._vim.eval('timer_stop({})'.format(self._timer))
+        self._timer = self._vim.eval(
+            "timer_start({}, 'EnTick')".format(self.interval)
+        )
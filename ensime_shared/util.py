@@ -1,8 +1,15 @@
 # coding: utf-8
 
+import hashlib
+import json
 import os
 from contextlib import contextmanager
-from pprint import pformat
+
+MAX_MESSAGE = 4096
+"""Characters of a logged message kept by default, the rest is cut."""
+
+LOG_MAX_MESSAGE = None if os.environ.get('ENSIME_VIM_DEBUG') == 'full' else MAX_MESSAGE
+"""Characters of a logged message kept, all of them with ``ENSIME_VIM_DEBUG=full``."""
 
 
 class Util:
@@ -51,15 +58,39 @@ def catch(exception, handler=lambda e: None):
         handler(str(e))
 
 
+def truncate(message, limit):
+    """Cut ``message`` to ``limit`` characters, noting what was cut.
+
+    The note has a hash of the whole message, so that identical messages can
+    still be matched up.
+    """
+    digest = hashlib.sha1(message.encode('utf-8', 'replace')).hexdigest()[:12]
+    return '{}... [{} more characters, sha1 {}]'.format(
+        message[:limit], len(message) - limit, digest)
+
+
 class Pretty(object):
     """Wrapper to pretty-format object's string representation.
 
     Reduces boilerplate for logging statements where we don't want to eagerly
     :func:`pprint.pformat` when the logging level isn't enabled.
+
+    Data longer than ``max_length`` characters as JSON isn't pretty-formatted,
+    which is slow for large payloads, but cut as with :func:`truncate`.
     """
 
+    max_length = LOG_MAX_MESSAGE
+
     def __init__(self, data):
         self._data = data
 
     def __str__(self):
+        if self.max_length:
+            try:
+                text = json.dumps(self._data)
+            except (TypeError, ValueError):
+                text = ''
+            if len(text) > self.max_length:
+                return '\n' + truncate(text, self.max_length)
+        from pprint import pformat  # Imports inspect on recent Pythons, slow
         return '\n' + pformat(self._data)
@@ -0,0 +1,247 @@
+# coding: utf-8
+
+"""
+Watching files in a directory for being written or removed.
+
+On Linux this uses inotify, so a waiting thread wakes up as soon as a file is
+written. Elsewhere, or if inotify is unavailable, it falls back to polling.
+"""
+
+import ctypes
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from abc import ABCMeta, abstractmethod
+
+from ensime_shared.util import catch
+
+# From <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+# struct inotify_event { int wd; uint32_t mask, cookie, len; char name[]; }
+_EVENT = struct.Struct('iIII')
+
+
+def watch(directory, names):
+    """Create the best available watcher for files in a directory.
+
+    Args:
+        directory (str): Directory containing the files.
+        names (Iterable[str]): Names of the files to watch.
+
+    Returns:
+        DirectoryWatcher: An :class:`InotifyWatcher` if possible, otherwise a
+        :class:`PollingWatcher`.
+    """
+    if sys.platform.startswith('linux'):
+        # AttributeError: a libc without inotify
+        with catch((AttributeError, OSError)):
+            return InotifyWatcher(directory, names)
+    return PollingWatcher(directory, names)
+
+
+class DirectoryWatcher(object):
+    """Tracks changes to some files of a directory.
+
+    Each change seen to a file bumps its version, so several consumers can
+    each tell whether a file changed since they last looked without taking
+    events away from one another. Safe to use from multiple threads.
+
+    Args:
+        directory (str): Directory containing the files.
+        names (Iterable[str]): Names of the files to watch.
+    """
+    __metaclass__ = ABCMeta
+
+    def __init__(self, directory, names):
+        self.directory = directory
+        self.names = frozenset(names)
+        self._versions = dict.fromkeys(self.names, 0)
+        self._lock = threading.Lock()
+
+    def version(self, name):
+        """int: Count of the changes seen so far to the file ``name``."""
+        self.poll()
+        return self._versions[name]
+
+    def wait(self, timeout):
+        """Block until a watched file changes or ``timeout`` seconds pass.
+
+        Returns:
+            bool: Whether any watched file changed.
+        """
+        deadline = time.time() + timeout
+        while not self.poll():
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+            self._block(remaining)
+        return True
+
+    @abstractmethod
+    def poll(self):
+        """Take in changes without blocking.
+
+        Returns:
+            bool: Whether any watched file changed.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def _block(self, timeout):
+        """Sleep until there may be changes, for ``timeout`` seconds at most."""
+        raise NotImplementedError
+
+    def close(self):
+        """Stop watching, releasing any resources."""
+        pass
+
+    def _bump(self, names):
+        changed = self.names.intersection(names)
+        with self._lock:
+            for name in changed:
+                self._versions[name] += 1
+        return bool(changed)
+
+
+class InotifyWatcher(DirectoryWatcher):
+    """Watcher notified by the Linux kernel through inotify.
+
+    It may be closed while another thread waits on it: that thread is woken
+    through a pipe, and the descriptors are closed by the last thread using
+    them, so none can be read once its number is reused.
+
+    Raises:
+        AttributeError: If the C library lacks inotify.
+        OSError: If the directory can't be watched, e.g. it doesn't exist.
+    """
+    MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE
+
+    def __init__(self, directory, names):
+        super(InotifyWatcher, self).__init__(directory, names)
+        libc = ctypes.CDLL(None, use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            raise self._error()
+
+        path = directory.encode(sys.getfilesystemencoding())
+        if libc.inotify_add_watch(fd, path, self.MASK) < 0:
+            error = self._error(directory)
+            os.close(fd)
+            raise error
+        self._fd = fd
+        self._wake_r, self._wake_w = os.pipe()
+        # Guards the descriptors: threads using them, and whether closed
+        self._fd_lock = threading.Lock()
+        self._users = 0
+        self._closed = False
+
+    @staticmethod
+    def _error(path=None):
+        code = ctypes.get_errno()
+        return OSError(code, os.strerror(code), path)
+
+    def poll(self):
+        if not self._use_fds():
+            return False
+
+        names = []
+        try:
+            while True:
+                try:
+                    data = os.read(self._fd, 4096)
+                except OSError as e:
+                    if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                        break
+                    raise
+                names.extend(self._event_names(data))
+        finally:
+            self._release_fds()
+        return self._bump(names)
+
+    def _block(self, timeout):
+        if not self._use_fds():
+            time.sleep(timeout)
+            return
+        try:
+            # select.error: interrupted by a signal, polling again is harmless
+            with catch(select.error):
+                select.select([self._fd, self._wake_r], [], [], timeout)
+        finally:
+            self._release_fds()
+
+    def _use_fds(self):
+        with self._fd_lock:
+            if self._closed:
+                return False
+            self._users += 1
+            return True
+
+    def _release_fds(self):
+        with self._fd_lock:
+            self._users -= 1
+            if self._closed and not self._users:
+                self._close_fds()
+
+    @staticmethod
+    def _event_names(data):
+        encoding = sys.getfilesystemencoding()
+        offset = 0
+        while offset < len(data):
+            length = _EVENT.unpack_from(data, offset)[3]
+            offset += _EVENT.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            yield name.decode(encoding, 'replace')
+
+    def close(self):
+        with self._fd_lock:
+            if self._closed:
+                return
+            self._closed = True
+            if self._users:
+                # Closed by the woken thread as it's done
+                os.write(self._wake_w, b'x')
+            else:
+                self._close_fds()
+
+    def _close_fds(self):
+        for fd in (self._fd, self._wake_r, self._wake_w):
+            os.close(fd)
+
+
+class PollingWatcher(DirectoryWatcher):
+    """Watcher comparing the files' status every ``interval`` seconds."""
+    interval = 0.1
+
+    def __init__(self, directory, names):
+        super(PollingWatcher, self).__init__(directory, names)
+        self._stats = self._snapshot()
+
+    def _snapshot(self):
+        stats = {}
+        for name in self.names:
+            try:
+                st = os.stat(os.path.join(self.directory, name))
+                stats[name] = (st.st_ino, st.st_size, st.st_mtime)
+            except OSError:
+                stats[name] = None
+        return stats
+
+    def poll(self):
+        with self._lock:
+            previous = self._stats
+            self._stats = current = self._snapshot()
+        return self._bump(n for n in self.names if current[n] != previous[n])
+
+    def _block(self, timeout):
+        time.sleep(min(self.interval, timeout))
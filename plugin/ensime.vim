@@ -25,23 +25,18 @@ import vim
 # TODO: officially drop Vim < 7.4 support, inform users and don't load plugin
 VIM74 = hasattr(vim, 'vars')
 
-try:
-    import sexpdata
-    import websocket
-
-    if VIM74:
-        vim.vars['ensime_deps_valid'] = True
-    else:
-        vim.command('let g:ensime_deps_valid = 1')
-
-    del sexpdata # Clean up the shared interpreter namespace
-    del websocket
-except ImportError:
-    if VIM74:
-        vim.vars['ensime_deps_valid'] = False
-    else:
-        vim.command('let g:ensime_deps_valid = 0')
-
+# Only look the modules up: importing them is slow, and the plugin defers it
+# until there's a project to work on
+from importlib.util import find_spec
+deps_valid = all(find_spec(name) for name in ('sexpdata', 'websocket'))
+del find_spec  # Clean up the shared interpreter namespace
+
+if VIM74:
+    vim.vars['ensime_deps_valid'] = deps_valid
+else:
+    vim.command('let g:ensime_deps_valid = {}'.format(int(deps_valid)))
+
+del deps_valid
 del VIM74
 PY
 
@@ -95,6 +90,9 @@ command! -nargs=* -range EnDebugStep call ensime#com_en_debug_step([<f-args>], '
 command! -nargs=* -range EnDebugStepOut call ensime#com_en_debug_step_out([<f-args>], '')
 command! -nargs=* -range EnDebugNext call ensime#com_en_debug_next([<f-args>], '')
 command! -nargs=0 -range EnClients call ensime#com_en_clients([<f-args>], '')
+command! -nargs=0 -range EnStats call ensime#com_en_stats([<f-args>], '')
+command! -nargs=? -range EnRpcProfile call ensime#com_en_rpc_profile([<f-args>], '')
+command! -nargs=? -range EnMemProfile call ensime#com_en_mem_profile([<f-args>], '')
 command! -nargs=* -range EnToggleFullType call ensime#com_en_toggle_fulltype([<f-args>], '')
 command! -nargs=* -range EnOrganizeImports call ensime#com_en_organize_imports([<f-args>], '')
 command! -nargs=* -range EnAddImport call ensime#com_en_add_import([<f-args>], '')
@@ -103,6 +101,10 @@ function! EnPackageDecl() abort
     return ensime#fun_en_package_decl()
 endfunction
 
+function! EnPackageToggle() abort
+    return ensime#fun_en_package_toggle()
+endfunction
+
 function! EnCompleteFunc(a, b) abort
     return ensime#fun_en_complete_func(a:a, a:b)
 endfunction
@@ -1,6 +1,5 @@
 # coding: utf-8
 
-import inspect
 import os
 import sys
 
@@ -8,7 +7,8 @@ import neovim
 
 
 def ensime_init_path():
-    path = os.path.abspath(inspect.getfile(inspect.currentframe()))
+    # Not inspect.getfile(), importing inspect takes longer than the rest
+    path = os.path.abspath(sys._getframe().f_code.co_filename)
     expected_nvim_path_end = os.path.join('rplugin', 'python3', 'ensime.py')
     expected_vim_path_end = os.path.join('autoload', 'ensime.vim.py')
     if path.endswith(expected_nvim_path_end):  # nvim rplugin
@@ -149,6 +149,10 @@ class NeovimEnsime(Ensime):
     def fun_en_package_decl(self, *args, **kwargs):
         super(NeovimEnsime, self).fun_en_package_decl(*args, **kwargs)
 
+    @neovim.function('EnPackageToggle', sync=True)
+    def fun_en_package_toggle(self, *args, **kwargs):
+        super(NeovimEnsime, self).fun_en_package_toggle(*args, **kwargs)
+
     @neovim.command('EnInline', **command_params)
     def com_en_inline(self, *args, **kwargs):
         super(NeovimEnsime, self).com_en_inline(*args, **kwargs)
@@ -165,6 +169,18 @@ class NeovimEnsime(Ensime):
     def com_en_clients(self, *args, **kwargs):
         super(NeovimEnsime, self).com_en_clients(*args, **kwargs)
 
+    @neovim.command('EnStats', range='', nargs='0', sync=True)
+    def com_en_stats(self, *args, **kwargs):
+        super(NeovimEnsime, self).com_en_stats(*args, **kwargs)
+
+    @neovim.command('EnRpcProfile', range='', nargs='?', sync=True)
+    def com_en_rpc_profile(self, *args, **kwargs):
+        super(NeovimEnsime, self).com_en_rpc_profile(*args, **kwargs)
+
+    @neovim.command('EnMemProfile', range='', nargs='?', sync=True)
+    def com_en_mem_profile(self, *args, **kwargs):
+        super(NeovimEnsime, self).com_en_mem_profile(*args, **kwargs)
+
     @neovim.autocmd('VimEnter', **autocmd_params)
     def au_vim_enter(self, *args, **kwargs):
         super(NeovimEnsime, self).au_vim_enter(*args, **kwargs)
@@ -0,0 +1,274 @@
+# coding: utf-8
+
+import json
+import time
+
+import pytest
+from mock import Mock, patch
+
+from ensime_shared.client import EnsimeClientV2
+from ensime_shared.monitor import MIB
+
+
+@pytest.fixture
+def client(request, tmpdir):
+    launcher = Mock(name='launcher')
+    launcher.config = {
+        'root-dir': tmpdir.strpath,
+        'cache-dir': tmpdir.join('.ensime_cache').strpath,
+        'name': 'testing',
+    }
+    client = EnsimeClientV2(Mock(name='editor'), launcher)
+    client.handle_incoming_response = Mock(name='handle_incoming_response')
+    request.addfinalizer(client.teardown)
+    return client
+
+
+def server():
+    """A stub EnsimeProcess."""
+    return Mock(name='ensime', pid=None, log_path=None, shared=False, exit_timeout=0,
+                **{'rss.return_value': None})
+
+
+def quiet_ws():
+    """A stub websocket, on which receiving blocks as with a quiet server."""
+    ws = Mock(name='ws')
+    ws.recv.side_effect = lambda: time.sleep(0.5) or ''
+    return ws
+
+
+def frame(typehint, call_id=None):
+    """A message queued as received by the poller thread."""
+    message = {'payload': {'typehint': typehint}}
+    if call_id is not None:
+        message['callId'] = call_id
+    return time.time(), json.dumps(message)
+
+
+class TestUnqueue:
+    def test_handles_replies_before_events(self, client):
+        client.queue.put(frame('NewScalaNotesEvent'))
+        client.queue.put(frame('CompletionInfoList', call_id=3))
+        client.unqueue()
+
+        handled = [c[0] for c in client.handle_incoming_response.call_args_list]
+        assert handled == [(3, {'typehint': 'CompletionInfoList'}),
+                           (None, {'typehint': 'NewScalaNotesEvent'})]
+
+    def test_defers_messages_when_budget_is_spent(self, client):
+        for _ in range(5):
+            client.queue.put(frame('NewScalaNotesEvent'))
+
+        client.unqueue(budget=0)
+        assert client.handle_incoming_response.call_count == 1
+        assert client.is_busy()
+
+        client.unqueue()
+        assert client.handle_incoming_response.call_count == 5
+        assert not client.is_busy()
+
+    def test_runs_main_thread_calls_without_displaying(self, client):
+        client.queue.put(frame('NewScalaNotesEvent'))
+        done = []
+        client.call_on_main_thread(done.append, True)
+        assert client.is_busy(displaying=False)
+
+        client.tick('notes.txt', display=False)
+        assert done == [True]
+        assert not client.handle_incoming_response.called
+        assert not client.is_busy(displaying=False)
+        assert client.is_busy()
+
+    def test_reply_settles_pending_call(self, client):
+        client.pending_calls[7] = 0.0
+        client.pending_call_timeout = float('inf')
+        assert client.is_busy()
+
+        client.queue.put(frame('SymbolInfo', call_id=7))
+        client.unqueue(should_wait=True, timeout=1)
+        assert not client.pending_calls
+
+
+class TestConnector:
+    def test_connects_once_server_is_ready(self, client):
+        client.ensime = server()
+        client.ensime.wait_ready.return_value = True
+        client.ensime.http_port.return_value = 1234
+        ws = quiet_ws()
+
+        with patch('websocket.create_connection', return_value=ws):
+            client._connect_when_ready()
+        assert client.ws is ws
+        # The request is left for the main thread
+        assert not ws.send.called
+        assert client.is_busy()
+
+        client.tick('Foo.scala')
+        assert 'ConnectionInfoReq' in ws.send.call_args[0][0]
+
+    def test_tells_editor_when_server_not_ready(self, client):
+        client.ensime = server()
+        client.ensime.wait_ready.return_value = False
+
+        client._connect_when_ready()
+        assert not client.editor.message.called
+
+        client.tick('Foo.scala')
+        client.editor.message.assert_called_once_with('server_not_ready')
+        assert client.ws is None
+
+    def test_keeps_waiting_for_slow_server(self, client):
+        client.ensime = server()
+        client.ensime.wait_ready.side_effect = [False, True]
+        client.ensime.http_port.return_value = 1234
+        ws = quiet_ws()
+
+        with patch('websocket.create_connection', return_value=ws):
+            client._connect_when_ready()
+        client.tick('Foo.scala')
+        client.editor.message.assert_called_once_with('server_not_ready')
+        assert client.ws is ws
+
+
+class TestInstall:
+    def test_resumes_setup_after_install(self, client):
+        client.launcher.strategy.isinstalled.return_value = False
+        client.launcher.attach.return_value = None
+        job = Mock(name='job', running=True)
+        client.launcher.strategy.start_install.return_value = job
+
+        assert not client.setup(bootstrap_server=True)
+        on_output, on_exit = client.launcher.strategy.start_install.call_args[0]
+        assert client.install_job is job
+
+        # From the job's thread
+        on_output('Resolving org.ensime#ensime_2.11;1.0.1 ...')
+        on_exit(True)
+
+        client.launcher.strategy.isinstalled.return_value = True
+        with patch.object(client, 'setup') as setup:
+            client.tick('Foo.scala')
+        client.editor.raw_message.assert_called_once_with(
+            'Resolving org.ensime#ensime_2.11;1.0.1 ...')
+        client.editor.message.assert_called_with('install_finished')
+        assert setup.called
+        assert client.install_job is None
+
+    def test_cancel(self, client):
+        client.install_job = job = Mock(name='job', running=True)
+        client.en_install(['cancel'])
+        assert job.cancel.called
+
+
+class TestServerHealth:
+    @pytest.fixture
+    def bloated(self, client):
+        client.ensime = server()
+        client.ensime.rss.return_value = 2048 * MIB
+        client.server_memory_limit = 1024
+        return client
+
+    def test_warns_once(self, bloated):
+        bloated._check_server_health()
+        bloated.monitor._next_sample = 0
+        bloated._check_server_health()
+        bloated.editor.message.assert_called_once_with('server_unhealthy')
+
+    def test_restarts_when_idle_and_restores_session(self, bloated):
+        bloated.server_auto_restart = True
+        old = bloated.ensime
+        bloated.breakpoints.append(('/src/Foo.scala', 12))
+        bloated.typechecked_files.add(__file__)
+
+        with patch.object(bloated, 'setup') as setup:
+            bloated.tick('Foo.scala')
+            assert bloated.ensime is None
+            bloated._server_stopper.join(1)
+            assert not setup.called
+            bloated.tick('Foo.scala')
+        assert old.stop.called
+        assert old.wait.called and not old.kill.called
+        assert bloated.launcher.remove_server_files.called
+        assert setup.called
+        assert bloated._server_stopper is None
+
+        bloated.ensime = server()
+        with patch.object(bloated, 'send_request') as send:
+            bloated.handle_analyzer_ready(None, {})
+            bloated.handle_analyzer_ready(None, {})
+        requests = [c[0][0] for c in send.call_args_list]
+        assert requests == [
+            {'typehint': 'DebugSetBreakReq', 'file': '/src/Foo.scala', 'line': 12,
+             'maxResults': 10},
+            {'typehint': 'TypecheckFilesReq', 'files': [__file__]},
+        ]
+
+    def test_restart_kills_server_that_wont_exit(self, bloated):
+        old = bloated.ensime
+        old.wait.return_value = False
+        bloated.restart_server()
+        bloated._server_stopper.join(1)
+        assert old.kill.called
+        assert bloated.launcher.remove_server_files.called
+
+
+class TestRequestStats:
+    def test_times_requests_by_type(self, client):
+        call_id = client.send_request({'typehint': 'CompletionsReq'})
+        client.queue.put(frame('CompletionInfoList', call_id=call_id))
+        client.queue.put(frame('NewScalaNotesEvent'))
+        client.unqueue()
+
+        stats = client.request_stats
+        assert set(stats.requests) == {'CompletionsReq'}
+        assert set(stats.events) == {'NewScalaNotesEvent'}
+        phases = stats.requests['CompletionsReq']
+        assert [phases[p].count for p in stats.PHASES] == [1, 1, 1]
+        assert stats.events['NewScalaNotesEvent']['network'].count == 0
+
+        report = '\n'.join(stats.report())
+        assert 'CompletionsReq' in report
+        assert 'NewScalaNotesEvent' in report
+
+
+class TestPackageInspector:
+    @staticmethod
+    def package(name):
+        member = {'typehint': 'BasicTypeInfo', 'name': 'Foo', 'declAs': {'typehint': 'Class'},
+                  'members': [{'typehint': 'BasicTypeInfo', 'name': 'Bar',
+                               'declAs': {'typehint': 'Class'}, 'members': []}]}
+        return {'typehint': 'PackageInfo', 'name': name, 'fullName': name,
+                'members': [{'typehint': 'BasicTypeInfo', 'name': 'Baz',
+                             'declAs': {'typehint': 'Class'}, 'members': [member]}]}
+
+    def test_toggles_the_tree_of_the_current_inspector(self, client):
+        editor = client.editor
+        editor.bufnr.return_value = 3
+        client.handle_package_info(None, self.package('com.first'))
+        editor.bufnr.return_value = 5
+        client.handle_package_info(None, self.package('com.second'))
+
+        editor.bufnr.return_value = 3
+        editor.cursor.return_value = (3, 0)
+        client.toggle_inspector_member()
+        editor.set_lines.assert_called_with(['    - Class: Foo', '      Class: Bar'], 2, 3)
+        assert sorted(client.package_trees) == [3, 5]
+
+    def test_forgets_trees_of_wiped_inspectors(self, client):
+        client.editor.bufnr.return_value = 3
+        client.handle_package_info(None, self.package('com.first'))
+        client.editor.buffer_exists.return_value = False
+        client.editor.bufnr.return_value = 5
+        client.handle_package_info(None, self.package('com.second'))
+
+        assert list(client.package_trees) == [5]
+
+
+class TestContainerSizes:
+    def test_reports_the_client_and_its_editor(self, client):
+        client.editor.container_sizes.return_value = [('errors', 2)]
+        client.call_options[1] = {}
+        sizes = dict(client.container_sizes())
+
+        assert sizes['call_options'] == 1
+        assert sizes['editor errors'] == 2
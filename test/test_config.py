@@ -1,10 +1,14 @@
 # coding: utf-8
 
+import time
+
+import pytest
 import sexpdata
+from mock import patch
 from py import path
 from pytest import raises
 
-from ensime_shared.config import ProjectConfig
+from ensime_shared.config import _find_cache, PARSED_CACHE_FILE, ProjectConfig
 
 confpath = path.local(__file__).dirpath() / 'resources' / 'test.conf'
 config = ProjectConfig(confpath.strpath)
@@ -51,3 +55,93 @@ def test_finds_nearest_dot_ensime(tmpdir):
 
     project_file = subdir.ensure('app.scala')
     assert ProjectConfig.find_from(project_file.strpath) == dotensime
+
+
+def test_memoizes_dot_ensime_lookups(tmpdir):
+    project_file = tmpdir.ensure('src/main/scala/app.scala')
+    assert ProjectConfig.find_from(project_file.strpath) is None
+
+    # A miss is remembered until it expires
+    dotensime = tmpdir.ensure('.ensime').realpath()
+    assert ProjectConfig.find_from(project_file.strpath) is None
+
+    later = time.time() + 60
+    with patch('time.time', return_value=later):
+        assert ProjectConfig.find_from(project_file.strpath) == dotensime
+
+    with patch('os.path.isfile') as isfile:
+        assert ProjectConfig.find_from(project_file.strpath) == dotensime
+    assert not isfile.called
+
+
+def test_expired_lookups_notice_configs_up_the_tree(tmpdir):
+    project_file = tmpdir.ensure('src/main/scala/app.scala')
+    outer = tmpdir.ensure('.ensime').realpath()
+    assert ProjectConfig.find_from(project_file.strpath) == outer
+
+    # Doesn't touch the directory the search starts from
+    inner = tmpdir.ensure('src/.ensime').realpath()
+    with patch('time.time', return_value=time.time() + 60):
+        assert ProjectConfig.find_from(project_file.strpath) == inner
+
+
+def test_bounds_dot_ensime_lookups(tmpdir, monkeypatch):
+    monkeypatch.setattr('ensime_shared.config.FIND_CACHE_SIZE', 2)
+    for name in ('a', 'b', 'c'):
+        ProjectConfig.find_from(tmpdir.join(name).strpath)
+
+    assert list(_find_cache) == [tmpdir.join(name).strpath for name in ('b', 'c')]
+
+
+def test_caches_parsed_config_in_cache_dir(tmpdir):
+    cache_dir = tmpdir / '.ensime_cache'
+    dotensime = tmpdir.join('.ensime')
+    dotensime.write('(:name "cached" :cache-dir "{}")'.format(cache_dir.strpath))
+
+    assert ProjectConfig(dotensime.strpath)['name'] == 'cached'
+    assert cache_dir.join(PARSED_CACHE_FILE).check(file=True)
+
+    with patch.object(ProjectConfig, 'parse') as parse:
+        assert ProjectConfig(dotensime.strpath)['name'] == 'cached'
+    assert not parse.called
+
+    # Same size, different content
+    dotensime.write('(:name "changd" :cache-dir "{}")'.format(cache_dir.strpath))
+    assert ProjectConfig(dotensime.strpath)['name'] == 'changd'
+
+
+class TestParse:
+    @pytest.fixture
+    def dotensime(self, tmpdir):
+        dotensime = tmpdir.join('.ensime')
+        dotensime.write(r'''
+            ; Comments are ignored
+            (:name "esc\"aped\\path"
+             :subprojects ((:name "a" :reference-source-roots ("x" "y") :depends ())
+                           (:name "b" :reference-source-roots ("z")))
+             :flags (1 2.5 t nil)
+             :scala-version "2.11.8")''')
+        return dotensime.strpath
+
+    def test_converts_values(self, dotensime):
+        config = ProjectConfig.parse(dotensime)
+        assert config['name'] == r'esc"aped\path'
+        assert config['flags'] == [1, 2.5, True, []]
+        assert config['subprojects'][0] == {
+            'name': 'a', 'reference-source-roots': ['x', 'y'], 'depends': []}
+
+    def test_skips_keys_at_any_depth(self, dotensime):
+        config = ProjectConfig.parse(dotensime, skip_keys=['reference-source-roots'])
+        assert config['subprojects'] == [{'name': 'a', 'depends': []}, {'name': 'b'}]
+
+    def test_fails_on_unterminated_string(self, tmpdir):
+        dotensime = tmpdir.join('.ensime')
+        dotensime.write('(:name "early" :scala-version "2.11.8" :broken ("')
+        with raises(sexpdata.ExpectClosingBracket):
+            ProjectConfig.parse(dotensime.strpath)
+
+    def test_fails_on_trailing_data(self, tmpdir):
+        dotensime = tmpdir.join('.ensime')
+        dotensime.write('(:name "x") (:name "y")')
+        with raises(sexpdata.ExpectNothing):
+            ProjectConfig.parse(dotensime.strpath)
@@ -1,9 +1,10 @@
 # coding: utf-8
 
 import pytest
-from mock import call, sentinel
+from mock import call, Mock, sentinel
 
 from ensime_shared.editor import Editor
+from ensime_shared.errors import Error
 
 
 @pytest.fixture
@@ -46,6 +47,29 @@ def test_edit(editor, vim):
     vim.command.assert_called_with('edit foo.scala')
 
 
+class Buffer(list):
+    def __init__(self, lines, modifiable):
+        super(Buffer, self).__init__(lines)
+        self.options = {'modifiable': modifiable}
+
+
+def test_set_lines(editor, vim):
+    vim.current.buffer = Buffer(['line 1', 'line 2', 'line 3'], modifiable=True)
+    editor.set_lines(['new 2', 'new 3'], 1, 2)
+    assert vim.current.buffer == ['line 1', 'new 2', 'new 3', 'line 3']
+
+    editor.set_lines(['all'])
+    assert vim.current.buffer == ['all']
+    assert vim.current.buffer.options['modifiable']
+
+
+def test_set_lines_of_nomodifiable_buffer(editor, vim):
+    vim.current.buffer = Buffer(['line 1'], modifiable=False)
+    editor.set_lines(['new 1', 'new 2'])
+    assert vim.current.buffer == ['new 1', 'new 2']
+    assert not vim.current.buffer.options['modifiable']
+
+
 def test_getlines(editor, vim):
     # The buffer objects behave like sequences
     lines = ['line 1', 'line2', 'line3']
@@ -84,13 +108,94 @@ def test_set_filetype(editor, vim):
 
 
 def test_set_buffer_options(editor, vim):
-    # Stub Buffer object's mapping API for options, see `:h python-buffer`
-    setlocal = {}
-    vim.current.buffer.options = setlocal
+    editor.set_buffer_options({'buftype': 'nofile'})
+    editor.set_buffer_options({'buflisted': False}, 3)
+
+    assert vim.mock_calls == [
+        call.command("call setbufvar('%', '&buftype', 'nofile')"),
+        call.command("call setbufvar(3, '&buflisted', 0)"),
+    ]
+
+
+class TestBatch:
+    def test_sends_commands_in_one_execute(self, editor, vim):
+        vim.eval.side_effect = lambda expr: '1' if expr.startswith('exists') else ''
+        with editor.batch():
+            editor.doautocmd('BufLeave')
+            editor.edit("it's.scala")
+
+        assert vim.mock_calls == [
+            call.eval("exists('*execute')"),
+            call.eval("execute(['doautocmd BufLeave', 'edit it''s.scala'])"),
+        ]
 
-    opts = {'buftype': 'nofile', 'buflisted': False}
-    editor.set_buffer_options(opts)
-    assert setlocal == opts
+    def test_echoes_messages_of_commands(self, editor, vim):
+        output = '\n"it\'s.scala" 3L, 40B\nDone'
+        vim.eval.side_effect = lambda expr: '1' if expr.startswith('exists') else output
+        with editor.batch():
+            editor.edit("it's.scala")
+            editor.write()
+
+        vim.command.assert_called_once_with(
+            'echo join([\'"it\'\'s.scala" 3L, 40B\', \'Done\'], "\\n")')
+
+    def test_checks_for_execute_once(self, editor, vim):
+        vim.eval.side_effect = None
+        vim.eval.return_value = '0'
+        for _ in range(2):
+            with editor.batch():
+                editor.edit('foo.scala')
+                editor.write()
+
+        assert vim.mock_calls == [
+            call.eval("exists('*execute')"),
+            call.command('edit foo.scala'),
+            call.command('write'),
+            call.command('edit foo.scala'),
+            call.command('write'),
+        ]
+
+    def test_sends_calls_atomically_to_neovim(self, vim):
+        vim.eval.side_effect = None
+        vim.eval.return_value = 1
+        editor = Editor(vim)
+        vim.reset_mock()
+        vim.api.call_atomic.return_value = [[None, 12], None]
+
+        with editor.batch():
+            editor.edit('foo.scala')
+            # Sends the edit along, the value is needed for the next expression
+            assert editor.point2pos(40) == (12, 1)
+            editor.set_cursor(12, 1)
+            editor.write()
+
+        assert vim.mock_calls == [
+            call.api.call_atomic([['nvim_command', ['edit foo.scala']],
+                                  ['nvim_eval', ['byte2line(40)']]]),
+            call.eval('40 - line2byte(12)'),
+            call.api.call_atomic([['nvim_command', ['call cursor(12, 2)']],
+                                  ['nvim_command', ['write']]]),
+        ]
+
+    def test_neovim_errors_are_raised(self, vim):
+        vim.eval.side_effect = None
+        vim.eval.return_value = 1
+        editor = Editor(vim)
+        vim.error = RuntimeError
+        vim.api.call_atomic.return_value = [[], [0, 0, 'E37: No write since last change']]
+
+        with pytest.raises(RuntimeError) as excinfo:
+            with editor.batch():
+                editor.edit('foo.scala')
+                editor.edit('bar.scala')
+        assert 'edit foo.scala: E37' in str(excinfo.value)
+
+    def test_nested_batches_send_once(self, editor, vim):
+        with editor.batch():
+            with editor.batch():
+                editor.edit('foo.scala')
+            assert vim.mock_calls == []
+        assert vim.mock_calls == [call.command('edit foo.scala')]
 
 
 class TestSplitWindow:
@@ -129,3 +234,37 @@ def test_write(editor, vim):
         call.command('write'),
         call.command('noautocmd write'),
     ]
+
+
+class TestLazyDisplayError:
+    @pytest.fixture
+    def error(self, editor, vim):
+        vim.eval.return_value = '/src/foo.scala'
+        vim.current.window.width = 80
+        error = Error('/src/foo.scala', 'type mismatch', 3, 4, 10)
+        editor._errors = [error]
+        editor._notes_generation += 1
+        return error
+
+    def test_does_nothing_without_errors(self, editor, vim):
+        editor.lazy_display_error('/src/foo.scala')
+        assert vim.mock_calls == []
+
+    def test_echoes_only_when_moving_onto_an_error(self, editor, vim, error):
+        editor.raw_message = Mock()
+        for column in (0, 5, 6, 5, 12, 7):
+            vim.current.window.cursor = (3, column)
+            editor.lazy_display_error('/src/foo.scala')
+
+        assert editor.raw_message.mock_calls == [call('type mismatch'),
+                                                 call('type mismatch')]
+
+    def test_skips_lookup_when_nothing_changed(self, editor, vim, error):
+        vim.current.window.cursor = (3, 5)
+        editor.lazy_display_error('/src/foo.scala')
+        vim.reset_mock()
+
+        editor.get_error_at = Mock()
+        editor.lazy_display_error('/src/foo.scala')
+        assert not editor.get_error_at.called
+        assert vim.command.mock_calls == []
@@ -0,0 +1,99 @@
+# coding: utf-8
+
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+from mock import Mock
+
+from ensime_shared.ensime import Ensime
+from ensime_shared.launcher import EnsimeProcess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules only needed once there's a project to work on
+DEFERRED = ('ensime_shared.client', 'ensime_shared.launcher', 'ensime_shared.protocol',
+            'websocket', 'webbrowser', 'inspect')
+
+# A server that's slow to exit, ignoring SIGTERM
+STUBBORN = 'import signal, time; signal.signal(signal.SIGTERM, signal.SIG_IGN); ' \
+           'print("up"); time.sleep(60)'
+
+
+def server(tmpdir, n):
+    process = subprocess.Popen([sys.executable, '-c', STUBBORN], stdout=subprocess.PIPE)
+    process.stdout.readline()  # Signal handler is set
+    pid_file = tmpdir.join('server-{}.pid'.format(n))
+    pid_file.write(str(process.pid))
+    return EnsimeProcess(tmpdir.strpath, process, None, pid_file.remove)
+
+
+def client(tmpdir, n):
+    client = Mock(name='client', toggle_teardown=True)
+    client.ensime = server(tmpdir, n)
+    client.teardown.side_effect = client.ensime.stop
+    return client
+
+
+@pytest.fixture
+def ensime(vim):
+    return Ensime(vim)
+
+
+def test_teardown_kills_stragglers_within_deadline(ensime, tmpdir):
+    clients = [client(tmpdir, n) for n in range(5)]
+    for n, c in enumerate(clients):
+        ensime.clients.add('/project{}/.ensime'.format(n), c)
+
+    start = time.time()
+    ensime.teardown(timeout=0.5)
+    assert time.time() - start < 1
+
+    for c in clients:
+        assert c.teardown.called
+        assert c.ensime.process.poll() is not None
+    assert not tmpdir.listdir('*.pid')
+
+
+def test_teardown_spares_servers_kept_alive(ensime, tmpdir):
+    kept = client(tmpdir, 0)
+    kept.toggle_teardown = False
+    kept.teardown.side_effect = None
+    ensime.clients.add('/project/.ensime', kept)
+    try:
+        ensime.teardown(timeout=0.1)
+        assert kept.ensime.process.poll() is None
+    finally:
+        kept.ensime.kill()
+
+
+def test_buffer_config_is_dropped_with_its_client(ensime, vim, tmpdir, monkeypatch):
+    monkeypatch.setattr('ensime_shared.config.FIND_CACHE_TTL', 0)
+    config = tmpdir.join('.ensime')
+    config.write('')
+    vim.current.buffer.name = tmpdir.join('Foo.scala').strpath
+    project = Mock(name='client')
+    ensime.clients.add(config.strpath, project)
+
+    assert ensime.current_client(False, False, False) is project
+    assert ensime._buffer_configs == {vim.current.buffer.name: config.strpath}
+
+    ensime.clients.clear()
+    config.remove()
+    assert ensime.current_client(False, False, False) is None
+    assert not ensime._buffer_configs
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason='-X importtime is new in Python 3.7')
+def test_plugin_import_defers_client_modules():
+    output = subprocess.check_output(
+        [sys.executable, '-X', 'importtime', '-c', 'import ensime_shared.ensime'],
+        cwd=ROOT, stderr=subprocess.STDOUT, universal_newlines=True)
+    # Lines are "import time: <self us> | <cumulative us> | <indented module>"
+    imported = set(line.rsplit('|', 1)[1].strip() for line in output.splitlines()
+                   if line.startswith('import time:') and line.count('|') == 2)
+
+    assert 'ensime_shared.ensime' in imported
+    assert not imported.intersection(DEFERRED)
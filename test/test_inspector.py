@@ -0,0 +1,54 @@
+# coding: utf-8
+
+import pytest
+
+from ensime_shared.inspector import PackageTree
+
+
+def member(name, *members):
+    return {'typehint': 'BasicTypeInfo', 'name': name,
+            'declAs': {'typehint': 'Class'}, 'members': list(members)}
+
+
+@pytest.fixture
+def tree():
+    return PackageTree({
+        'typehint': 'PackageInfo', 'name': 'bench', 'fullName': 'com.example.bench',
+        'members': [
+            member('Foo', member('Bar', member('Baz')), member('Qux')),
+            member('Quux'),
+        ],
+    })
+
+
+def test_expands_the_package_members(tree):
+    assert tree.lines() == [
+        'com.example.bench',
+        '  - Class: Foo',
+        '    + Class: Bar',
+        '    Class: Qux',
+        '  Class: Quux',
+    ]
+
+
+def test_expanding_patches_the_member_line_only(tree):
+    assert tree.toggle(2) == (2, 3, ['    - Class: Bar', '      Class: Baz'])
+    assert tree.lines()[2:4] == ['    - Class: Bar', '      Class: Baz']
+
+
+def test_collapsing_removes_all_descendants(tree):
+    tree.toggle(2)
+    assert tree.toggle(1) == (1, 5, ['  + Class: Foo'])
+    assert tree.lines() == ['com.example.bench', '  + Class: Foo', '  Class: Quux']
+
+
+def test_expanding_again_restores_expanded_descendants(tree):
+    tree.toggle(2)
+    tree.toggle(1)
+    assert tree.toggle(1) == (1, 2, ['  - Class: Foo', '    - Class: Bar',
+                                     '      Class: Baz', '    Class: Qux'])
+
+
+@pytest.mark.parametrize('index', [0, 3, 5])
+def test_ignores_lines_without_members(tree, index):
+    assert tree.toggle(index) is None
@@ -1,13 +1,22 @@
 # coding: utf-8
 
+import os
+import socket
+import subprocess
+import sys
+
 import pytest
-from mock import patch
+from mock import Mock, patch
 from py import path
 
 from ensime_shared.config import ProjectConfig
 from ensime_shared.errors import LaunchError
-from ensime_shared.launcher import (AssemblyJar, DotEnsimeLauncher,
-                                    EnsimeLauncher, SbtBootstrap)
+from ensime_shared.launcher import (AssemblyJar, class_data_sharing_flags,
+                                    ClasspathManifest, DotEnsimeLauncher,
+                                    EnsimeLauncher, EnsimeProcess,
+                                    finish_archive_dump, InstallJob,
+                                    java_major_version,
+                                    SbtBootstrap)
 
 CONFROOT = path.local(__file__).dirpath() / 'resources'
 
@@ -77,7 +86,7 @@ class TestDotEnsimeStrategy:
     def test_isinstalled_if_jars_present(self, strategy):
         assert not strategy.isinstalled()
         # Stub the existence of the server+compiler jars
-        with patch('os.path.exists', return_value=True):
+        with patch('os.stat', return_value=Mock(st_size=1, st_mtime=0)):
             assert strategy.isinstalled()
 
     def test_launch_constructs_classpath(self, strategy):
@@ -130,3 +139,222 @@ def create_stub_assembly_jar(indir, projectconfig):
     scala_minor = projectconfig['scala-version'][:4]
     name = 'ensime_{}-assembly.jar'.format(scala_minor)
     return path.local(indir).ensure(name).realpath
+
+
+class TestAttach:
+    @pytest.fixture
+    def launcher(self, tmpdir, vim):
+        conf = config('test-server-jars.conf')
+        launcher = EnsimeLauncher(vim, conf, tmpdir.strpath)
+        launcher.config = {'cache-dir': tmpdir.strpath}
+        return launcher
+
+    def test_attaches_to_live_server(self, launcher, tmpdir):
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.bind(('127.0.0.1', 0))
+        server.listen(1)
+        try:
+            tmpdir.join('http').write(str(server.getsockname()[1]))
+            tmpdir.join('server.pid').write(str(os.getpid()))
+
+            process = launcher.attach()
+            assert process.shared
+            assert process.pid == os.getpid()
+            assert process.is_ready()
+
+            # Shared servers are left running
+            with patch('os.kill') as kill:
+                process.stop()
+            assert not kill.called
+        finally:
+            server.close()
+
+    def test_removes_files_of_dead_server(self, launcher, tmpdir):
+        dead = subprocess.Popen(['true'])
+        dead.wait()
+        tmpdir.join('http').write('12345')
+        tmpdir.join('server.pid').write(str(dead.pid))
+
+        assert launcher.attach() is None
+        assert not tmpdir.join('http').check()
+        assert not tmpdir.join('server.pid').check()
+
+    def test_no_server(self, launcher):
+        assert launcher.attach() is None
+
+
+class TestWaitReady:
+    @pytest.fixture
+    def process(self, tmpdir):
+        return EnsimeProcess(tmpdir.strpath, None, None, None, pid=os.getpid())
+
+    def test_returns_once_port_accepts(self, process, tmpdir):
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.bind(('127.0.0.1', 0))
+        server.listen(1)
+        try:
+            tmpdir.join('http').write(str(server.getsockname()[1]))
+            assert process.wait_ready(timeout=5)
+        finally:
+            server.close()
+
+    def test_times_out(self, process):
+        assert not process.wait_ready(timeout=0.1)
+
+    def test_cancellable(self, process):
+        with patch('time.sleep') as sleep:
+            assert not process.wait_ready(timeout=5, cancelled=lambda: True)
+        assert not sleep.called
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason='reads /proc')
+def test_process_rss(tmpdir):
+    process = EnsimeProcess(tmpdir.strpath, None, None, None, pid=os.getpid())
+    assert process.rss() > 0
+    process.pid = None
+    assert process.rss() is None
+    process.stop()
+
+
+def test_process_reports_exit_status_once(tmpdir):
+    on_exit = Mock(name='on_exit')
+    popen = subprocess.Popen([sys.executable, '-c', 'import sys; sys.exit(3)'])
+    process = EnsimeProcess(tmpdir.strpath, popen, None, lambda: None, on_exit=on_exit)
+    assert process.wait(timeout=10)
+    process.stop()
+    process.kill()
+    on_exit.assert_called_once_with(3)
+
+
+class TestClassDataSharing:
+    @pytest.fixture
+    def jdk(self, tmpdir):
+        jdk = tmpdir.mkdir('jdk')
+        jdk.join('release').write('IMPLEMENTOR="Eclipse Adoptium"\nJAVA_VERSION="17.0.2"\n')
+        return jdk
+
+    @pytest.fixture
+    def jar(self, tmpdir):
+        jar = tmpdir.join('server.jar')
+        jar.write('jar')
+        return jar
+
+    @pytest.fixture
+    def manifest(self, jar):
+        return ClasspathManifest([jar.strpath])
+
+    def test_reads_java_major_version(self, jdk):
+        assert java_major_version(jdk.strpath) == 17
+        jdk.join('release').write('JAVA_VERSION="1.8.0_292"\n')
+        assert java_major_version(jdk.strpath) == 8
+        jdk.join('release').remove()
+        assert java_major_version(jdk.strpath) is None
+
+    def test_no_flags_for_old_jdk(self, jdk, tmpdir, manifest):
+        jdk.join('release').write('JAVA_VERSION="11.0.12"\n')
+        assert class_data_sharing_flags(jdk.strpath, tmpdir.strpath, manifest) == []
+
+    def test_dumps_then_reuses_archive(self, jdk, tmpdir, manifest):
+        flags = class_data_sharing_flags(jdk.strpath, tmpdir.strpath, manifest)
+        dump = flags[0].split('=', 1)[1]
+        assert flags == ['-XX:ArchiveClassesAtExit=' + dump]
+        assert dump.endswith('.dumping')
+
+        # Written by the JVM on exit
+        path.local(dump).write('archive')
+        finish_archive_dump(dump, 143)
+        archive = dump[:-len('.dumping')]
+        flags = class_data_sharing_flags(jdk.strpath, tmpdir.strpath, manifest)
+        assert flags == ['-XX:SharedArchiveFile=' + archive]
+
+    def test_discards_archive_of_killed_server(self, jdk, tmpdir, manifest):
+        flags = class_data_sharing_flags(jdk.strpath, tmpdir.strpath, manifest)
+        dump = path.local(flags[0].split('=', 1)[1])
+        dump.write('trunc')
+
+        finish_archive_dump(dump.strpath, -9)
+        assert not dump.check()
+        flags = class_data_sharing_flags(jdk.strpath, tmpdir.strpath, manifest)
+        assert flags[0].startswith('-XX:ArchiveClassesAtExit=')
+
+    def test_regenerates_when_jars_change(self, jdk, tmpdir, jar):
+        flags = class_data_sharing_flags(jdk.strpath, tmpdir.strpath,
+                                         ClasspathManifest([jar.strpath]))
+        old_dump = flags[0].split('=', 1)[1]
+        path.local(old_dump).write('archive')
+        finish_archive_dump(old_dump, 0)
+        old_archive = path.local(old_dump[:-len('.dumping')])
+
+        jar.write('rebuilt jar')
+        flags = class_data_sharing_flags(jdk.strpath, tmpdir.strpath,
+                                         ClasspathManifest([jar.strpath]))
+        assert flags[0].startswith('-XX:ArchiveClassesAtExit=')
+        assert flags[0].split('=', 1)[1] != old_archive.strpath
+        assert not old_archive.check()
+
+
+class TestClasspathManifest:
+    @pytest.fixture
+    def jars(self, tmpdir):
+        jars = [tmpdir.join('lib', '{}.jar'.format(n)) for n in range(3)]
+        for jar in jars:
+            jar.write('jar', ensure=True)
+        return [jar.strpath for jar in jars]
+
+    def test_verifies_all_entries_exist(self, jars, tmpdir):
+        assert ClasspathManifest(jars).verify()
+        missing = jars + [tmpdir.join('missing.jar').strpath]
+        assert not ClasspathManifest(missing).verify()
+
+    def test_trusts_recent_verification(self, jars):
+        manifest = ClasspathManifest(jars)
+        assert manifest.verify()
+        with patch('os.stat') as stat:
+            assert manifest.verify()
+        assert not stat.called
+
+    def test_digest_changes_with_jars(self, jars, tmpdir):
+        manifest = ClasspathManifest(jars)
+        assert manifest.verify()
+
+        tmpdir.join('lib', '0.jar').write('rebuilt jar')
+        rebuilt = ClasspathManifest(jars)
+        assert rebuilt.verify()
+        assert rebuilt.digest != manifest.digest
+
+
+class TestInstallJob:
+    def run(self, code, finish=lambda: True):
+        output, exits = [], []
+        job = InstallJob([sys.executable, '-c', code], None,
+                         output.append, exits.append, finish).start()
+        return job, output, exits
+
+    def test_streams_output_and_reports_success(self):
+        finish = Mock(return_value=True)
+        job, output, exits = self.run('print("resolving"); print("done")', finish)
+        job.wait(10)
+
+        assert output == ['resolving', 'done']
+        assert exits == [True]
+        assert job.succeeded
+        assert finish.called
+
+    def test_reports_failure(self):
+        finish = Mock(return_value=True)
+        job, output, exits = self.run('import sys; sys.exit(3)', finish)
+        job.wait(10)
+
+        assert exits == [False]
+        assert 'exited with status 3' in output[-1]
+        assert not finish.called
+
+    def test_cancel(self):
+        job, output, exits = self.run('import time; time.sleep(60)')
+        assert job.running
+        job.cancel()
+        job.wait(10)
+
+        assert not job.running
+        assert exits == [False]
+        assert job.cancelled
@@ -0,0 +1,70 @@
+# coding: utf-8
+
+import logging
+
+from ensime_shared.logs import FileLog
+from ensime_shared.util import Pretty, truncate
+
+
+def test_truncate():
+    message = truncate('x' * 100, 10)
+    assert message.startswith('x' * 10 + '... [90 more characters, sha1 ')
+    assert truncate('x' * 100, 10) == message
+    assert truncate('y' * 100, 10) != message.replace('x', 'y')
+
+
+def test_pretty_cuts_large_data():
+    assert str(Pretty({'a': 1})) == "\n{'a': 1}"
+    assert str(Pretty(['x' * 10] * 1000)).startswith('\n["xxxxxxxxxx", ')
+    assert 'more characters, sha1' in str(Pretty(['x' * 10] * 1000))
+
+
+class TestFileLog:
+    def test_writes_truncated_messages(self, tmpdir):
+        path = tmpdir.join('ensime-vim.log')
+        logger = logging.getLogger('test_logs.truncated')
+        logger.setLevel(logging.DEBUG)
+
+        log = FileLog(logger, path.strpath, max_message=20)
+        logger.debug('short %s', 'message')
+        logger.debug('request: %s', 'contents ' * 100)
+        log.close()
+        logger.warning('after close')
+
+        lines = path.read().splitlines()
+        assert lines[0].endswith(' - short message')
+        assert 'request: contents co... [' in lines[1]
+        assert len(lines) == 2
+
+    def test_keeps_previous_session(self, tmpdir):
+        path = tmpdir.join('ensime-vim.log')
+        path.write('previous session\n')
+        logger = logging.getLogger('test_logs.rotated')
+
+        log = FileLog(logger, path.strpath)
+        logger.warning('this session')
+        log.close()
+
+        assert 'this session' in path.read()
+        assert tmpdir.join('ensime-vim.log.1').read() == 'previous session\n'
+
+    def test_logs_mutable_arguments_as_they_were(self, tmpdir):
+        path = tmpdir.join('ensime-vim.log')
+        logger = logging.getLogger('test_logs.mutated')
+        logger.setLevel(logging.DEBUG)
+
+        log = FileLog(logger, path.strpath)
+        payload = {'typehint': 'Before'}
+        logger.debug('payload: %s %s', Pretty(payload), 1)
+        payload['typehint'] = 'After'
+        log.close()
+
+        assert 'Before' in path.read()
+        assert 'After' not in path.read()
+
+    def test_close_leaves_one_null_handler(self, tmpdir):
+        logger = logging.getLogger('test_logs.reopened')
+        for _ in range(3):
+            FileLog(logger, tmpdir.join('ensime-vim.log').strpath).close()
+
+        assert [type(h) for h in logger.handlers] == [logging.NullHandler]
@@ -0,0 +1,65 @@
+# coding: utf-8
+
+import pytest
+from mock import Mock
+
+from ensime_shared.manager import ClientManager, MIB
+
+
+def client(name, busy=False, rss=0):
+    client = Mock(name=name, install_job=None, debug_thread_id=None)
+    client.is_busy.return_value = busy
+    client.ensime.rss.return_value = rss
+    return client
+
+
+@pytest.fixture
+def manager():
+    return ClientManager(max_servers=2)
+
+
+def test_evicts_least_recently_used(manager):
+    a, b, c = client('a'), client('b'), client('c')
+    manager.add('a', a)
+    manager.add('b', b)
+    manager.use('a')
+    manager.add('c', c)
+
+    assert 'b' not in manager
+    assert b.teardown.called
+    assert [path for path, _ in manager.items()] == ['a', 'c']
+    assert manager.evictions == 1
+
+
+def test_spares_busy_clients(manager):
+    a, b, c = client('a', busy=True), client('b'), client('c')
+    for path, c_ in [('a', a), ('b', b), ('c', c)]:
+        manager.add(path, c_)
+
+    assert 'a' in manager
+    assert 'b' not in manager
+
+
+def test_never_evicts_most_recent(manager):
+    manager.max_servers = 1
+    manager.add('a', client('a', busy=True))
+    manager.add('b', client('b'))
+    assert len(manager) == 2
+
+
+def test_memory_limit():
+    manager = ClientManager(max_rss=1000)
+    manager.add('a', client('a', rss=600 * MIB))
+    manager.add('b', client('b', rss=600 * MIB))
+    assert 'a' not in manager
+    assert 'b' in manager
+
+
+def test_counts_relaunches(manager):
+    manager.add('a', client('a'))
+    manager.add('b', client('b'))
+    manager.add('c', client('c'))
+    manager.add('a', client('a'))
+    assert manager.evictions == 2
+    assert manager.relaunches == 1
+    assert 'evictions: 2, relaunches: 1' in manager.stats()
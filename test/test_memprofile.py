@@ -0,0 +1,46 @@
+# coding: utf-8
+
+import pytest
+
+from ensime_shared.memprofile import container_report, MemoryProfiler
+
+profiler = MemoryProfiler()
+
+pytestmark = pytest.mark.skipif(not profiler.available, reason='tracemalloc is new in Python 3.4')
+
+
+@pytest.fixture
+def tracing(request):
+    profiler.start()
+    request.addfinalizer(profiler.stop)
+    return profiler
+
+
+def allocate():
+    return [str(n) * 10 for n in range(20000)]
+
+
+def test_diff_shows_sites_that_grew(tracing):
+    tracing.snapshot()
+    kept = allocate()  # noqa: F841
+    lines = tracing.diff()
+
+    assert lines[0].split() == ['+KiB', '+blocks', 'allocation', 'site']
+    assert 'test/test_memprofile.py:' in lines[1]
+
+
+def test_diff_without_baseline_is_a_snapshot(tracing):
+    assert tracing.diff()[0].split() == ['size', 'KiB', 'blocks', 'allocation', 'site']
+
+
+def test_stop_ends_tracing(tracing):
+    tracing.stop()
+    assert not tracing.tracing
+
+
+def test_container_report():
+    assert container_report('/project/.ensime', [('call_options', 3), ('queue', 0)]) == [
+        '/project/.ensime',
+        '  call_options                            3',
+        '  queue                                   0',
+    ]
@@ -0,0 +1,56 @@
+# coding: utf-8
+
+import os
+import sys
+
+import pytest
+from mock import Mock
+
+from ensime_shared.monitor import GC_THRASH_MARKER, OOM_MARKER, ResourceMonitor
+
+
+@pytest.fixture
+def log(tmpdir):
+    log = tmpdir.join('server.log')
+    log.write('INFO  Starting\n{}: Java heap space\n'.format(OOM_MARKER))
+    return log
+
+
+@pytest.fixture
+def process(log):
+    process = Mock(name='process', pid=os.getpid(), log_path=log.strpath)
+    process.rss.return_value = 2048
+    return process
+
+
+def test_counts_new_log_markers_only(process, log):
+    monitor = ResourceMonitor(process)
+    assert monitor.sample().oom_errors == 0
+
+    log.write('{}\n{}\n'.format(OOM_MARKER, GC_THRASH_MARKER), mode='a')
+    sample = monitor.sample()
+    assert (sample.oom_errors, sample.gc_thrash) == (1, 1)
+    assert monitor.sample().oom_errors == 0
+    assert monitor.oom_errors == 1
+
+
+def test_rescans_truncated_log(process, log):
+    monitor = ResourceMonitor(process)
+    log.write('{}\n'.format(OOM_MARKER))
+    assert monitor.sample().oom_errors == 1
+
+
+def test_poll_respects_interval(process):
+    monitor = ResourceMonitor(process, interval=60)
+    assert monitor.poll()
+    assert monitor.poll() is None
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason='reads /proc')
+def test_measures_cpu(process):
+    monitor = ResourceMonitor(process)
+    sum(range(10 ** 6))
+    sample = monitor.sample()
+    assert sample.cpu >= 0
+    assert sample.rss == monitor.peak_rss == 2048
+    assert 'cpu=' in str(monitor)
@@ -0,0 +1,49 @@
+# coding: utf-8
+
+import json
+import time
+
+import pytest
+from mock import Mock
+
+from ensime_shared.client import EnsimeClientV2
+from ensime_shared.recorder import read_recording, TrafficRecorder
+
+
+def test_records_both_directions(tmpdir):
+    path = tmpdir.join('traffic.jsonl').strpath
+    recorder = TrafficRecorder(path, 'v2')
+    recorder.sent('{"callId": 0}')
+    recorder.received('{"callId": 0, "payload": {}}')
+    recorder.close()
+    recorder.received('after close')
+
+    header, messages = read_recording(path)
+    assert header['protocol'] == 'v2'
+    assert [(m['dir'], m['data']) for m in messages] == [
+        ('out', '{"callId": 0}'), ('in', '{"callId": 0, "payload": {}}')]
+    assert 0 <= messages[0]['t'] <= messages[1]['t']
+
+
+def test_rejects_other_files(tmpdir):
+    path = tmpdir.join('ensime-vim.log')
+    path.write('{"level": "INFO"}\n')
+    with pytest.raises(ValueError):
+        read_recording(path.strpath)
+
+
+def test_client_records_requests(tmpdir):
+    cache_dir = tmpdir.mkdir('.ensime_cache')
+    launcher = Mock(name='launcher')
+    launcher.config = {'root-dir': tmpdir.strpath, 'cache-dir': cache_dir.strpath}
+    client = EnsimeClientV2(Mock(name='editor'), launcher)
+    client.ws = Mock(name='ws', **{'recv.side_effect': lambda: time.sleep(0.5) or ''})
+
+    client.record_traffic()
+    client.send_request({'typehint': 'ConnectionInfoReq'})
+    client.teardown()
+
+    recording, = cache_dir.listdir('traffic-*.jsonl')
+    header, messages = read_recording(recording.strpath)
+    assert header['protocol'] == 'v2'
+    assert json.loads(messages[0]['data'])['req'] == {'typehint': 'ConnectionInfoReq'}
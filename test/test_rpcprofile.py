@@ -0,0 +1,69 @@
+# coding: utf-8
+
+from mock import Mock
+
+from ensime_shared.ensime import Ensime
+from ensime_shared.rpcprofile import NO_ENTRY, ProfilingProxy, RpcProfiler
+
+
+class Buffer(list):
+    name = 'Foo.scala'
+
+
+class Window(object):
+    cursor = (1, 0)
+
+
+class Vim(object):
+    """Just enough of the vim module."""
+
+    def __init__(self):
+        self.current = Mock(buffer=Buffer(['line 1', 'line 2']), window=Window())
+
+    def eval(self, expr):
+        return '0'
+
+
+def test_counts_calls_per_entry_point():
+    profiler = RpcProfiler()
+    vim = ProfilingProxy(Vim(), profiler)
+
+    with profiler.entry('com_en_type'):
+        with profiler.entry('tick_clients'):
+            vim.eval("has('nvim')")
+            lines = vim.current.buffer[:]
+            vim.current.window.cursor = (2, 0)
+    vim.eval('1')
+
+    assert lines == ['line 1', 'line 2']
+    counts = dict((key, stats[0]) for key, stats in profiler.calls.items())
+    assert counts == {
+        ('com_en_type', 'vim.eval()'): 1,
+        ('com_en_type', 'vim.current'): 2,
+        ('com_en_type', 'vim.current.buffer'): 1,
+        ('com_en_type', 'vim.current.buffer[]'): 1,
+        ('com_en_type', 'vim.current.window'): 1,
+        ('com_en_type', 'vim.current.window.cursor ='): 1,
+        (NO_ENTRY, 'vim.eval()'): 1,
+    }
+
+    report = profiler.report()
+    assert report[1].split()[:2] == ['com_en_type', '7']
+
+    profiler.reset()
+    assert profiler.report() == ['No Vim API calls recorded']
+
+
+def test_ensime_swaps_drivers(vim):
+    ensime = Ensime(vim)
+    client = Mock(name='client')
+    client.editor.driver = vim
+    ensime.clients.add('/project/.ensime', client)
+
+    ensime.start_rpc_profile()
+    assert isinstance(client.editor.driver, ProfilingProxy)
+    ensime.get_setting('server_v2', 1)
+    assert ensime.rpc_profiler.calls
+
+    ensime.stop_rpc_profile()
+    assert client.editor.driver is vim
@@ -0,0 +1,37 @@
+# coding: utf-8
+
+import pytest
+
+from ensime_shared.stats import Histogram, RunningStats
+
+
+def test_running_stats():
+    stats = RunningStats()
+    for value in (0.001, 0.003):
+        stats.add(value)
+    assert stats.count == 2
+    assert stats.mean == pytest.approx(0.002)
+    assert stats.max == 0.003
+    assert str(stats) == 'n=2 mean=2.0ms max=3.0ms last=3.0ms'
+
+
+class TestHistogram:
+    def test_percentiles_within_precision(self):
+        histogram = Histogram()
+        for ms in range(1, 1001):
+            histogram.add(ms / 1000.0)
+
+        for percent in (50, 95, 99):
+            exact = percent / 100.0
+            assert exact <= histogram.percentile(percent) <= exact * 1.05
+
+    def test_caps_at_max(self):
+        histogram = Histogram()
+        histogram.add(0.0123)
+        assert histogram.percentile(99) == 0.0123
+
+    def test_tiny_and_empty(self):
+        histogram = Histogram()
+        assert histogram.percentile(50) == 0
+        histogram.add(0)
+        assert histogram.percentile(50) == 0
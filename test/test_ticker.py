@@ -0,0 +1,73 @@
+# coding: utf-8
+
+import pytest
+from mock import call, Mock
+
+from ensime_shared.ticker import (TICK_BUSY, TICK_IDLE_MAX, TICK_IDLE_MAX_VIM, TICK_IDLE_MIN,
+                                  Ticker)
+
+
+@pytest.fixture
+def ticker(vim):
+    features = {"has('timers')": 1, "has('nvim')": 0}
+    vim.eval.side_effect = lambda expr: features.get(expr, 42)
+    ticker = Ticker(vim)
+    vim.reset_mock()
+    return ticker
+
+
+def test_ticks_fast_while_busy(ticker, vim):
+    ticker.reschedule(busy=True)
+    assert ticker.interval == TICK_BUSY
+    assert vim.eval.call_args == call("timer_start({}, 'EnTick')".format(TICK_BUSY))
+
+
+@pytest.mark.parametrize('isneovim, idle_max', [(False, TICK_IDLE_MAX_VIM),
+                                                (True, TICK_IDLE_MAX)])
+def test_backs_off_while_idle(ticker, isneovim, idle_max):
+    ticker.isneovim = isneovim
+    ticker.reschedule(busy=True)
+    intervals = []
+    for _ in range(10):
+        ticker.reschedule(busy=False)
+        intervals.append(ticker.interval)
+
+    assert intervals[0] == TICK_IDLE_MIN
+    assert intervals == sorted(intervals)
+    assert intervals[-1] == idle_max
+
+
+def test_leaves_messages_queued_outside_scala_buffers(ticker):
+    client = Mock(name='client')
+    client.editor.is_buffer_ensime_compatible.return_value = False
+    assert not ticker.tick(client)
+    client.tick.assert_called_once_with(client.editor.path(), display=False)
+
+
+def test_wakeup_restarts_pending_timer(ticker, vim):
+    ticker.reschedule(busy=False)
+    vim.reset_mock()
+
+    ticker.wakeup()
+    assert ticker.interval == TICK_BUSY
+    assert vim.eval.mock_calls == [
+        call('timer_stop(42)'),
+        call("timer_start({}, 'EnTick')".format(TICK_BUSY)),
+    ]
+
+
+def test_unscheduled_tick_leaves_pending_timer(ticker, vim):
+    ticker.reschedule(busy=False)
+    interval = ticker.interval
+    vim.reset_mock()
+
+    ticker.unscheduled(busy=False)
+    assert ticker.interval == interval
+    assert not vim.eval.called
+
+
+def test_unscheduled_tick_hurries_for_busy_clients(ticker, vim):
+    ticker.reschedule(busy=False)
+    ticker.unscheduled(busy=True)
+    assert ticker.interval == TICK_BUSY
+    assert vim.eval.call_args == call("timer_start({}, 'EnTick')".format(TICK_BUSY))
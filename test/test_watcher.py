@@ -0,0 +1,91 @@
+# coding: utf-8
+
+import os
+import threading
+import time
+
+import pytest
+from mock import patch
+
+from ensime_shared.launcher import EnsimeProcess
+from ensime_shared.watcher import InotifyWatcher, PollingWatcher, watch
+
+
+@pytest.fixture(params=[InotifyWatcher, PollingWatcher])
+def watcher(request, tmpdir):
+    watcher = request.param(tmpdir.strpath, ['http'])
+    request.addfinalizer(watcher.close)
+    return watcher
+
+
+def test_prefers_inotify(tmpdir):
+    watcher = watch(tmpdir.strpath, ['http'])
+    assert isinstance(watcher, InotifyWatcher)
+    watcher.close()
+
+
+def test_falls_back_to_polling_for_missing_directory(tmpdir):
+    watcher = watch(tmpdir.join('missing').strpath, ['http'])
+    assert isinstance(watcher, PollingWatcher)
+
+
+def test_counts_writes_and_removals(watcher, tmpdir):
+    assert watcher.version('http') == 0
+
+    tmpdir.join('http').write('1234')
+    assert watcher.wait(timeout=1)
+    assert watcher.version('http') == 1
+
+    tmpdir.join('http').remove()
+    assert watcher.wait(timeout=1)
+    assert watcher.version('http') == 2
+
+
+def test_ignores_other_files(watcher, tmpdir):
+    tmpdir.join('server.log').write('Starting')
+    assert not watcher.wait(timeout=0.2)
+    assert watcher.version('http') == 0
+
+
+def test_wait_wakes_up_on_write(watcher, tmpdir):
+    writer = threading.Timer(0.05, tmpdir.join('http').write, ['1234'])
+    writer.start()
+    try:
+        assert watcher.wait(timeout=5)
+    finally:
+        writer.join()
+
+
+def test_close_wakes_waiting_thread(tmpdir):
+    watcher = InotifyWatcher(tmpdir.strpath, ['http'])
+    waiter = threading.Thread(target=watcher.wait, args=(1,))
+    waiter.start()
+    time.sleep(0.05)
+
+    with patch('os.close', wraps=os.close) as close:
+        watcher.close()
+        # By the woken thread, long before its wait is over
+        time.sleep(0.1)
+        assert close.call_count == 3
+    assert not watcher.poll()
+    waiter.join(2)
+
+
+def test_process_rereads_port_only_when_unreachable(tmpdir):
+    tmpdir.join('http').write('1')
+    process = EnsimeProcess(tmpdir.strpath, None, None, None)
+    assert process.http_port() == 1
+    with patch('ensime_shared.util.Util.read_file') as read_file:
+        assert process.http_port() == 1
+    assert not read_file.called
+
+    tmpdir.join('http').write('5678')
+    assert not process.is_ready()
+    assert process.http_port() == 5678
+
+
+def test_process_watches_port_file_only_while_waiting(tmpdir):
+    process = EnsimeProcess(tmpdir.strpath, None, None, None)
+    with patch('ensime_shared.launcher.watch') as watch_dir:
+        assert not process.wait_ready(0.05)
+    watch_dir.return_value.close.assert_called_once_with()